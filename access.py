@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, NamedTuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from app.config import OWNER_ID
+
+logger = logging.getLogger(__name__)
+
+ROLE_USER, ROLE_ADMIN, ROLE_OWNER = "user", "admin", "owner"
+ROLE_RANK = {ROLE_USER: 1, ROLE_ADMIN: 2, ROLE_OWNER: 3}
+
+# Group membership policies: who inside an authorized group may use the bot
+POLICY_ALL, POLICY_ALLOWED, POLICY_ADMINS = "all", "allowed", "admins"
+POLICIES = (POLICY_ALL, POLICY_ALLOWED, POLICY_ADMINS)
+
+JOURNAL_FILE = "access_journal.jsonl"
+COMPACT_AFTER = 30          # seconds of quiet before the journal is folded into the state snapshot
+DECISION_CACHE_MAX = 4096
+
+@dataclass(slots=True)
+class Grant:
+    role: str = ROLE_USER
+    expires_at: Optional[float] = None
+    by: Optional[int] = None
+
+    def active(self, now: float) -> bool:
+        return self.expires_at is None or self.expires_at > now
+
+@dataclass(slots=True)
+class ChatGrant:
+    policy: str = POLICY_ALL
+    expires_at: Optional[float] = None
+    by: Optional[int] = None
+
+    def active(self, now: float) -> bool:
+        return self.expires_at is None or self.expires_at > now
+
+class Decision(NamedTuple):
+    allowed: bool
+    role: Optional[str]
+    reason: str
+
+USERS: Dict[int, Grant] = {}
+CHATS: Dict[int, ChatGrant] = {}
+
+_lock = threading.RLock()
+_generation = [0]
+_decisions: "OrderedDict[tuple, tuple]" = OrderedDict()
+_compact_timer: list = [None]
+
+# ---- lookups ----
+
+def user_role(user_id: int, now: float | None = None) -> Optional[str]:
+    if OWNER_ID and user_id == OWNER_ID:
+        return ROLE_OWNER
+    g = USERS.get(user_id)
+    if g and g.active(now or time.time()):
+        return g.role
+    return None
+
+def has_role(user_id: int, role: str) -> bool:
+    r = user_role(user_id)
+    return bool(r) and ROLE_RANK[r] >= ROLE_RANK[role]
+
+def _decide(user_id: int, chat_id: int | None, chat_type: str | None, now: float) -> tuple[Decision, float]:
+    """Returns the decision and the time after which it must be recomputed."""
+    role = user_role(user_id, now)
+    user_grant = USERS.get(user_id)
+    valid_until = (user_grant.expires_at if user_grant and user_grant.expires_at else float("inf"))
+    if role == ROLE_OWNER:
+        return Decision(True, role, "owner"), float("inf")
+    if chat_type in ("group", "supergroup"):
+        cg = CHATS.get(chat_id)
+        if not cg or not cg.active(now):
+            return Decision(False, role, "group not authorized"), valid_until
+        valid_until = min(valid_until, cg.expires_at or float("inf"))
+        if cg.policy == POLICY_ADMINS and not (role and ROLE_RANK[role] >= ROLE_RANK[ROLE_ADMIN]):
+            return Decision(False, role, "group limited to bot admins"), valid_until
+        if cg.policy == POLICY_ALLOWED and not role:
+            return Decision(False, role, "group limited to allowed users"), valid_until
+        return Decision(True, role, "group"), valid_until
+    if role:
+        return Decision(True, role, "grant"), valid_until
+    return Decision(False, None, "not allowed"), valid_until
+
+def decide(user_id: int, chat_id: int | None = None, chat_type: str | None = None) -> Decision:
+    key = (user_id, chat_id, chat_type)
+    now = time.time()
+    hit = _decisions.get(key)
+    if hit and hit[1] == _generation[0] and hit[2] > now:
+        return hit[0]
+    with _lock:
+        decision, valid_until = _decide(user_id, chat_id, chat_type, now)
+        _decisions[key] = (decision, _generation[0], valid_until)
+        _decisions.move_to_end(key)
+        while len(_decisions) > DECISION_CACHE_MAX:
+            _decisions.popitem(last=False)
+    return decision
+
+def decide_update(update: Update) -> Decision:
+    chat, user = update.effective_chat, update.effective_user
+    if not user:
+        return Decision(False, None, "no user")
+    return decide(user.id, chat.id if chat else None, chat.type if chat else None)
+
+async def gate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Group -1 pre-handler: decides access once per update and leaves it on the update's context."""
+    context.access_decision = decide_update(update)
+
+def decision_for(update: Update, context: ContextTypes.DEFAULT_TYPE | None = None) -> Decision:
+    """The gate's decision for this update; decided here only if the gate didn't run."""
+    decision = getattr(context, "access_decision", None)
+    return decision if decision is not None else decide_update(update)
+
+# ---- mutations (journaled) ----
+
+def _journal(op: dict):
+    try:
+        with open(JOURNAL_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(op, separators=(",", ":")) + "\n")
+    except Exception as e:
+        logger.warning(f"Access journal write failed: {e}")
+    _schedule_compaction()
+
+def _changed():
+    _generation[0] += 1
+
+def _apply_op(op: dict):
+    kind = op.get("op")
+    if kind == "grant":
+        USERS[int(op["id"])] = Grant(op.get("role") or ROLE_USER, op.get("exp"), op.get("by"))
+    elif kind == "revoke":
+        USERS.pop(int(op["id"]), None)
+    elif kind == "chat":
+        CHATS[int(op["id"])] = ChatGrant(op.get("policy") or POLICY_ALL, op.get("exp"), op.get("by"))
+    elif kind == "unchat":
+        CHATS.pop(int(op["id"]), None)
+
+def _mutate(op: dict):
+    with _lock:
+        _apply_op(op)
+        _changed()
+        _journal(op)
+
+def grant_user(user_id: int, role: str = ROLE_USER, ttl: float | None = None, by: int | None = None):
+    _mutate({"op": "grant", "id": user_id, "role": role, "exp": time.time() + ttl if ttl else None, "by": by})
+
+def revoke_user(user_id: int) -> bool:
+    if user_id not in USERS:
+        return False
+    _mutate({"op": "revoke", "id": user_id})
+    return True
+
+def authorize_chat(chat_id: int, policy: str = POLICY_ALL, ttl: float | None = None, by: int | None = None):
+    _mutate({"op": "chat", "id": chat_id, "policy": policy, "exp": time.time() + ttl if ttl else None, "by": by})
+
+def unauthorize_chat(chat_id: int) -> bool:
+    if chat_id not in CHATS:
+        return False
+    _mutate({"op": "unchat", "id": chat_id})
+    return True
+
+def purge_expired() -> int:
+    now = time.time()
+    with _lock:
+        dead_users = [u for u, g in USERS.items() if not g.active(now)]
+        dead_chats = [c for c, g in CHATS.items() if not g.active(now)]
+        for u in dead_users:
+            USERS.pop(u, None)
+        for c in dead_chats:
+            CHATS.pop(c, None)
+        if dead_users or dead_chats:
+            _changed()
+    return len(dead_users) + len(dead_chats)
+
+# ---- persistence ----
+
+def dump() -> dict:
+    with _lock:
+        return {
+            "users": {str(u): [g.role, g.expires_at, g.by] for u, g in USERS.items()},
+            "chats": {str(c): [g.policy, g.expires_at, g.by] for c, g in CHATS.items()},
+        }
+
+def load(data: dict | None, legacy_users=None, legacy_chats=None):
+    """Load the snapshot (or migrate the old allowed_users/authorized_chats lists), then replay the journal."""
+    with _lock:
+        USERS.clear(); CHATS.clear()
+        if data:
+            for u, (role, exp, by) in (data.get("users") or {}).items():
+                USERS[int(u)] = Grant(role, exp, by)
+            for c, (policy, exp, by) in (data.get("chats") or {}).items():
+                CHATS[int(c)] = ChatGrant(policy, exp, by)
+        else:
+            for u in legacy_users or []:
+                USERS[int(u)] = Grant(ROLE_USER)
+            for c in legacy_chats or []:
+                CHATS[int(c)] = ChatGrant(POLICY_ALL)
+        replayed = 0
+        try:
+            if os.path.exists(JOURNAL_FILE):
+                with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            _apply_op(json.loads(line))
+                            replayed += 1
+        except Exception as e:
+            logger.warning(f"Access journal replay failed: {e}")
+        _changed()
+    purge_expired()
+    logger.info(f"Access loaded: users={len(USERS)} groups={len(CHATS)} journal_ops={replayed}")
+
+def truncate_journal():
+    try:
+        if os.path.exists(JOURNAL_FILE):
+            os.remove(JOURNAL_FILE)
+    except Exception as e:
+        logger.warning(f"Access journal truncate failed: {e}")
+
+def _compact():
+    _compact_timer[0] = None
+    purge_expired()
+    from app.state import save_state
+    save_state()
+
+def _schedule_compaction():
+    t = _compact_timer[0]
+    if t:
+        t.cancel()
+    t = threading.Timer(COMPACT_AFTER, _compact)
+    t.daemon = True
+    _compact_timer[0] = t
+    t.start()
+
+# ---- helpers for command parsing ----
+
+def parse_duration(text: str) -> Optional[float]:
+    """'30m', '12h', '7d', '2w' -> seconds. Returns None when not a duration."""
+    m = re.fullmatch(r"(\d+)\s*([mhdw])", (text or "").strip().lower())
+    if not m:
+        return None
+    return int(m.group(1)) * {"m": 60, "h": 3600, "d": 86400, "w": 604800}[m.group(2)]
+
+def format_expiry(expires_at: Optional[float]) -> str:
+    if not expires_at:
+        return "never"
+    left = expires_at - time.time()
+    if left <= 0:
+        return "expired"
+    if left >= 86400:
+        return f"in {left / 86400:.1f}d"
+    if left >= 3600:
+        return f"in {left / 3600:.1f}h"
+    return f"in {max(1, int(left // 60))}m"
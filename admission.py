@@ -0,0 +1,123 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from app.config import (
+    ADMISSION_SOFT_JOBS, ADMISSION_HARD_JOBS, ADMISSION_SOFT_INFLIGHT_MB, ADMISSION_HARD_INFLIGHT_MB,
+)
+
+LEVEL_OK, LEVEL_DEGRADED, LEVEL_REJECT = 0, 1, 2
+LEVEL_NAMES = {LEVEL_OK: "ok", LEVEL_DEGRADED: "degraded", LEVEL_REJECT: "shedding"}
+
+# Tunable at runtime from /admin (0 disables a threshold)
+LIMITS: Dict[str, int] = {
+    "soft_jobs": ADMISSION_SOFT_JOBS,
+    "hard_jobs": ADMISSION_HARD_JOBS,
+    "soft_mb": ADMISSION_SOFT_INFLIGHT_MB,
+    "hard_mb": ADMISSION_HARD_INFLIGHT_MB,
+}
+STATS = {"admitted": 0, "degraded": 0, "rejected": 0, "probes_skipped": 0}
+
+_lock = threading.Lock()
+_jobs = [0]
+_queue: list = [None]       # the application's update queue: updates received but not yet handled
+_inflight = [0]             # bytes reserved by probes currently downloading or parsing
+_job_seconds = [15.0]        # EWMA of job duration, used for the retry-after hint
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("overloaded")
+        self.retry_after = max(5, int(retry_after + 0.999))
+
+    def user_message(self) -> str:
+        return f"🚦 The bot is busy right now.\nPlease try again in {self.retry_after}s."
+
+class Ticket:
+    __slots__ = ("degraded", "started", "released")
+
+    def __init__(self, degraded: bool):
+        self.degraded = degraded
+        self.started = time.monotonic()
+        self.released = False
+
+def _over(value: float, limit: int) -> bool:
+    return limit > 0 and value >= limit
+
+def watch(update_queue):
+    """Count the application's unhandled updates as load, so a backlog sheds even when jobs run one at a time."""
+    _queue[0] = update_queue
+
+def queued() -> int:
+    q = _queue[0]
+    return q.qsize() if q is not None else 0
+
+def _load() -> int:
+    return _jobs[0] + queued()
+
+def level() -> int:
+    jobs, mb = _load(), _inflight[0] / 1048576
+    if _over(jobs, LIMITS["hard_jobs"]) or _over(mb, LIMITS["hard_mb"]):
+        return LEVEL_REJECT
+    if _over(jobs, LIMITS["soft_jobs"]) or _over(mb, LIMITS["soft_mb"]):
+        return LEVEL_DEGRADED
+    return LEVEL_OK
+
+def degraded() -> bool:
+    return level() >= LEVEL_DEGRADED
+
+def _retry_after() -> float:
+    hard = LIMITS["hard_jobs"] or LIMITS["soft_jobs"] or 1
+    return _job_seconds[0] * (1 + max(0, _load() - hard) / hard)
+
+def admit(degradable: bool = True) -> Ticket:
+    """Admit a job at the current load level. Raises Overloaded past the hard threshold,
+    or past the soft one for jobs that have nothing to shed."""
+    with _lock:
+        lvl = level()
+        if lvl == LEVEL_REJECT or (lvl == LEVEL_DEGRADED and not degradable):
+            STATS["rejected"] += 1
+            raise Overloaded(_retry_after())
+        _jobs[0] += 1
+        STATS["admitted"] += 1
+        if lvl == LEVEL_DEGRADED:
+            STATS["degraded"] += 1
+        return Ticket(lvl == LEVEL_DEGRADED)
+
+def release(ticket: Ticket | None):
+    if ticket is None or ticket.released:
+        return
+    with _lock:
+        ticket.released = True
+        _jobs[0] = max(0, _jobs[0] - 1)
+        _job_seconds[0] = 0.8 * _job_seconds[0] + 0.2 * (time.monotonic() - ticket.started)
+
+@contextmanager
+def probing(nbytes: int):
+    """Reserve in-flight bytes for the duration of one probe (download + mediainfo)."""
+    with _lock:
+        _inflight[0] += nbytes
+    try:
+        yield
+    finally:
+        with _lock:
+            _inflight[0] = max(0, _inflight[0] - nbytes)
+
+def skipped_probe():
+    STATS["probes_skipped"] += 1
+
+def snapshot() -> dict:
+    return {
+        "level": LEVEL_NAMES[level()],
+        "jobs": _jobs[0],
+        "queued": queued(),
+        "inflight_mb": _inflight[0] / 1048576,
+        "job_seconds": _job_seconds[0],
+        **LIMITS,
+        **STATS,
+    }
+
+def adjust(name: str, delta: int) -> int:
+    if name in LIMITS:
+        LIMITS[name] = max(0, LIMITS[name] + delta)
+    return LIMITS.get(name, 0)
@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Thread-safe LRU with per-entry expiry and optional debounced JSON persistence."""
+
+    def __init__(self, ttl: float, max_entries: int, path: Optional[str] = None, flush_delay: float = 10.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.flush_delay = flush_delay
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, list]" = OrderedDict()  # key -> [expires_at, value]
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, count: bool = True) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            if count:
+                self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = [time.time() + (ttl if ttl is not None else self.ttl), value]
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        self._schedule_flush()
+
+    def pop(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is not None:
+            self._schedule_flush()
+        return entry[1] if entry else None
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        now = time.time()
+        with self._lock:
+            snapshot = [(k, e[1]) for k, e in self._data.items() if e[0] > now]
+        return iter(snapshot)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        self._schedule_flush()
+
+    # ---- persistence ----
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            now = time.time()
+            with self._lock:
+                for k, (exp, v) in raw.items():
+                    if exp > now:
+                        self._data[k] = [exp, v]
+            logger.info(f"Cache {self.path} loaded: {len(self._data)} entries")
+        except Exception as e:
+            logger.warning(f"Cache {self.path} load failed: {e}")
+
+    def flush(self):
+        if not self.path:
+            return
+        with self._lock:
+            self._timer = None
+            raw = dict(self._data)
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(raw, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"Cache {self.path} save failed: {e}")
+
+    def _schedule_flush(self):
+        if not self.path:
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total * 100) if total else 0.0,
+        }
@@ -5,6 +5,8 @@ OWNER_ID = int(os.getenv("OWNER_ID", "0") or "0")
 
 # GDFlix
 GDFLIX_API_KEY = os.getenv("GDFLIX_API_KEY", "").strip()
+# Optional pool of global keys, "key[:weight],key[:weight],…"; replaces GDFLIX_API_KEY when set
+GDFLIX_API_KEYS = os.getenv("GDFLIX_API_KEYS", "").strip()
 GDFLIX_API_BASE = os.getenv("GDFLIX_API_BASE", "https://gdflix.dev/v2").strip()
 GDFLIX_FILE_BASE = os.getenv("GDFLIX_FILE_BASE", "https://gdflix.dev/file").strip()
 
@@ -13,6 +15,8 @@ WORKERS_BASE = os.getenv("WORKERS_BASE", "").strip()
 
 # TMDB
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "").strip()
+# Optional offline title index (sqlite) built from TMDB daily ID exports; empty disables it
+TMDB_INDEX_PATH = os.getenv("TMDB_INDEX_PATH", "").strip()
 
 # Start/help UI
 DEV_LINK = os.getenv("DEV_LINK", "").strip()
@@ -27,4 +31,22 @@ FREEIMAGE_API_KEY = os.getenv("FREEIMAGE_API_KEY", "").strip()
 FREEIMAGE_UPLOAD_API = os.getenv("FREEIMAGE_UPLOAD_API", "https://freeimage.host/api/1/upload").strip()
 
 # Remote state
-STATE_REMOTE_URL = os.getenv("STATE_REMOTE_URL", "").strip()
\ No newline at end of file
+STATE_REMOTE_URL = os.getenv("STATE_REMOTE_URL", "").strip()
+
+# Per-user / per-chat / per-GDFlix-key quotas (0 disables a limit)
+QUOTA_USER_LINKS_PER_MIN = int(os.getenv("QUOTA_USER_LINKS_PER_MIN", "30") or "0")
+QUOTA_CHAT_LINKS_PER_MIN = int(os.getenv("QUOTA_CHAT_LINKS_PER_MIN", "60") or "0")
+QUOTA_KEY_LINKS_PER_MIN = int(os.getenv("QUOTA_KEY_LINKS_PER_MIN", "60") or "0")
+QUOTA_USER_PROBE_MB_PER_HOUR = int(os.getenv("QUOTA_USER_PROBE_MB_PER_HOUR", "2048") or "0")
+QUOTA_USER_CONCURRENT_JOBS = int(os.getenv("QUOTA_USER_CONCURRENT_JOBS", "2") or "0")
+
+# Per-update traces (JSONL, rotated); slow or failed traces are always kept, others sampled
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl").strip()
+TRACE_SLOW_MS = int(os.getenv("TRACE_SLOW_MS", "5000") or "0")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.02") or "0")
+
+# Admission control: past the soft thresholds /get skips mediainfo, past the hard ones new jobs are refused
+ADMISSION_SOFT_JOBS = int(os.getenv("ADMISSION_SOFT_JOBS", "6") or "0")
+ADMISSION_HARD_JOBS = int(os.getenv("ADMISSION_HARD_JOBS", "16") or "0")
+ADMISSION_SOFT_INFLIGHT_MB = int(os.getenv("ADMISSION_SOFT_INFLIGHT_MB", "300") or "0")
+ADMISSION_HARD_INFLIGHT_MB = int(os.getenv("ADMISSION_HARD_INFLIGHT_MB", "800") or "0")
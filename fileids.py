@@ -0,0 +1,20 @@
+from typing import Optional
+
+from app.cache import TTLCache
+
+# image URL -> Telegram file_id of a photo we already uploaded, so repeats are sent by reference
+FILE_IDS = TTLCache(ttl=90 * 86400, max_entries=20000, path="file_ids.json", flush_delay=30.0)
+
+def lookup(url: Optional[str]) -> Optional[str]:
+    return FILE_IDS.get(url) if url else None
+
+def remember(url: Optional[str], message) -> Optional[str]:
+    """Record the largest photo size of a sent message against its source URL."""
+    try:
+        photo = message.photo[-1] if message and message.photo else None
+    except Exception:
+        photo = None
+    if url and photo:
+        FILE_IDS.set(url, photo.file_id)
+        return photo.file_id
+    return None
@@ -1,9 +1,17 @@
+import asyncio
+import html
+import os
+import time
+from io import BytesIO
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
-from app.config import OWNER_ID
-from app.keyboards import admin_panel_kb
-from app.state import BOT_CONFIG, BOT_STATS, UCER_SETTINGS, track_user
+from app import access, admission, posts, profiling, quota, tracing, usersettings
+from app.config import OWNER_ID, TRACE_FILE
+from app.keyboards import admin_panel_kb, admin_load_kb, admin_profile_kb
+from app.ratelimit import LIMITER
+from app.services import gdflix, imagehost, workers
+from app.state import BOT_CONFIG, BOT_STATS, track_user
 
 def is_admin(user_id: int) -> bool:
     return user_id == OWNER_ID
@@ -16,6 +24,53 @@ async def admin_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     await update.message.reply_text("<b>Admin Panel</b>", parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
 
+async def traces_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/traces [n|command] · /traces <id> · /traces file"""
+    if not is_admin(update.effective_user.id):
+        return
+    arg = (context.args[0] if context.args else "").strip()
+    if arg == "file":
+        if not TRACE_FILE or not os.path.exists(TRACE_FILE):
+            await update.message.reply_text("No trace file yet."); return
+        with open(TRACE_FILE, "rb") as f:
+            await update.message.reply_document(document=f, filename=os.path.basename(TRACE_FILE))
+        return
+    if arg and not arg.isdigit() and not arg.startswith("/"):
+        t = tracing.find(arg)
+        if not t:
+            await update.message.reply_text("Trace not found (only recent kept traces are in memory; try /traces file)."); return
+        text = tracing.render(t)
+        if len(text) > 3800:
+            await update.message.reply_document(document=BytesIO(text.encode("utf-8")), filename=f"trace-{t['trace']}.txt")
+        else:
+            await update.message.reply_text(f"<pre>{html.escape(text)}</pre>", parse_mode=ParseMode.HTML)
+        return
+    n = int(arg) if arg.isdigit() else 10
+    rows = tracing.slowest(min(n, 30), kind=arg if arg.startswith("/") else None)
+    if not rows:
+        await update.message.reply_text("No traces kept yet."); return
+    lines = ["<b>🐢 SLOWEST RECENT TRACES</b>", ""]
+    for t in rows:
+        when = time.strftime("%H:%M:%S", time.localtime(t["at"]))
+        flag = " ❌" if t.get("error") else ""
+        lines.append(f"<code>{t['trace']}</code> {html.escape(t['kind'])} <b>{t['ms'] / 1000:.1f}s</b> {when}{flag}")
+    lines += ["", "Details: /traces &lt;id&gt; · raw log: /traces file"]
+    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
+async def _run_profile(context: ContextTypes.DEFAULT_TYPE, chat_id: int, kind: str, seconds: int):
+    fn = profiling.profile_cpu if kind == "cpu" else profiling.profile_memory
+    try:
+        report, folded = await asyncio.to_thread(fn, seconds)
+    except Exception as e:
+        await context.bot.send_message(chat_id, f"❌ Profile failed: <code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
+        return
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    head = "\n".join(report.splitlines()[:1])
+    await context.bot.send_document(chat_id, document=BytesIO(report.encode("utf-8")), filename=f"{kind}-{stamp}.txt",
+                                    caption=html.escape(head)[:1000])
+    await context.bot.send_document(chat_id, document=BytesIO(folded.encode("utf-8")), filename=f"{kind}-{stamp}.folded",
+                                    caption="Folded stacks: flamegraph.pl or speedscope.app")
+
 async def admin_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
@@ -23,17 +78,146 @@ async def admin_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
         try: await q.message.delete()
         except Exception: pass
         return
-    action = q.data.split(":")[1]
+    parts = q.data.split(":")
+    action = parts[1]
     if action == "close":
         await q.message.delete(); return
+    if action == "back":
+        await q.message.edit_text("<b>Admin Panel</b>", parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        return
+    if action == "load":
+        if len(parts) == 4:
+            admission.adjust(parts[2], int(parts[3]))
+        st = admission.snapshot()
+        text = (
+            "<b>🚦 LOAD &amp; ADMISSION</b>\n\n"
+            f"Level: <b>{st['level']}</b>\n"
+            f"Jobs running: <b>{st['jobs']}</b> | Updates queued: <b>{st['queued']}</b>\n"
+            f"Probe bytes in flight: <b>{st['inflight_mb']:.0f} MB</b>\n"
+            f"Avg job: <b>{st['job_seconds']:.1f}s</b>\n\n"
+            f"Admitted: <b>{st['admitted']}</b> (degraded {st['degraded']}) | Rejected: <b>{st['rejected']}</b>\n"
+            f"Probes skipped: <b>{st['probes_skipped']}</b>\n\n"
+            "<i>Jobs count running jobs plus queued updates. Soft: /get skips mediainfo. "
+            "Hard: new jobs are refused with a retry-after.</i>"
+        )
+        try:
+            await q.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=admin_load_kb(admission.LIMITS))
+        except Exception:
+            pass  # unchanged content on refresh
+        return
+    if action == "prof":
+        if len(parts) == 4:
+            if profiling.running():
+                await q.message.edit_text("<b>🔬 A profile is already running.</b>", parse_mode=ParseMode.HTML, reply_markup=admin_profile_kb())
+                return
+            kind, seconds = parts[2], int(parts[3])
+            # Runs in the background so the update queue keeps flowing while we sample it.
+            context.application.create_task(_run_profile(context, q.message.chat_id, kind, seconds))
+            await q.message.edit_text(f"<b>🔬 {kind.upper()} profile running for {seconds}s…</b>\nResults will be sent here.",
+                                      parse_mode=ParseMode.HTML, reply_markup=admin_profile_kb())
+            return
+        await q.message.edit_text(
+            "<b>🔬 PROFILING</b>\n\nCPU samples every thread's stack; Memory diffs tracemalloc snapshots.\n"
+            "Both return a report and a folded-stack file (flamegraph.pl / speedscope).",
+            parse_mode=ParseMode.HTML, reply_markup=admin_profile_kb())
+        return
     if action == "gdflix":
         BOT_CONFIG["GDFLIX_GLOBAL"] = not BOT_CONFIG["GDFLIX_GLOBAL"]
         await q.message.edit_reply_markup(reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
         return
     if action == "users":
         total = len(BOT_STATS["users"])
-        await q.message.edit_text(f"<b>👥 BOT USERS</b>\n\nTotal users used bot: <b>{total}</b>", parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        access.purge_expired()
+        admins = sum(1 for g in access.USERS.values() if g.role == access.ROLE_ADMIN)
+        timed = sum(1 for g in access.USERS.values() if g.expires_at)
+        text = (
+            f"<b>👥 BOT USERS</b>\n\nTotal users used bot: <b>{total}</b>\n"
+            f"Granted users: <b>{len(access.USERS)}</b> (admins {admins}, time-limited {timed})\n"
+            f"Authorized groups: <b>{len(access.CHATS)}</b>"
+        )
+        await q.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
         return
     if action == "ucer":
-        await q.message.edit_text(f"<b>🔑 UCER STATS</b>\n\nUsers with UCER entries: <b>{len(UCER_SETTINGS)}</b>", parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
-        return
\ No newline at end of file
+        st = usersettings.stats()
+        await q.message.edit_text(f"<b>🔑 UCER STATS</b>\n\nUsers with UCER entries: <b>{st['stored']}</b>\nIn memory: <b>{st['resident']}/{st['resident_max']}</b>", parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        return
+    if action == "queue":
+        q_stats = LIMITER.snapshot()
+        by_ep = "\n".join(f"  {ep}: {n}" for ep, n in sorted(q_stats["by_endpoint"].items())) or "  (empty)"
+        text = (
+            "<b>📮 SEND QUEUE</b>\n\n"
+            f"Queued now: <b>{q_stats['depth']}</b> (peak {q_stats['max_depth']})\n"
+            f"<code>{by_ep}</code>\n"
+            f"Sent: <b>{q_stats['sent']}</b>\n"
+            f"Edits coalesced: <b>{q_stats['coalesced']}</b>\n"
+            f"Flood waits: <b>{q_stats['flood_waits']}</b> (gave up {q_stats['gave_up']})\n"
+            f"Chats tracked: <b>{q_stats['chats_tracked']}</b> | Global tokens: <b>{q_stats['global_tokens']}</b>"
+        )
+        await q.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        return
+    if action == "usage":
+        rows = quota.usage_snapshot()
+        lines = ["<b>📊 LIVE USAGE</b>", "<i>links/min · probe MB/hour · running jobs</i>", ""]
+        for r in rows:
+            lines.append(
+                f"<code>{r['user_id']}</code>: {r['links_used']}/{r['links_cap']} · "
+                f"{r['probe_mb']:.0f}/{r['probe_cap_mb']} MB · {r['jobs']} job(s)"
+            )
+        if not rows:
+            lines.append("No activity yet.")
+        keys = quota.key_usage()
+        if keys:
+            lines += ["", "<b>GDFlix keys (links/min)</b>"] + [f"{html.escape(k)}: {n}" for k, n in keys.items()]
+        await q.message.edit_text("\n".join(lines), parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        return
+    if action == "indexes":
+        now = time.time()
+        lines = ["<b>🗄 INDEX HEALTH</b>", ""]
+        for base, st in sorted(workers.index_stats().items(), key=lambda kv: (kv[1]["ewma"] is None, kv[1]["ewma"] or 0)):
+            down = st["down_until"] - now
+            state = f"🔴 parked {down:.0f}s" if down > 0 else "🟢"
+            ewma = f"{st['ewma'] * 1000:.0f} ms" if st["ewma"] is not None else "n/a"
+            lines.append(f"{state} <code>{html.escape(base)}</code>")
+            lines.append(f"    TTFB {ewma} · {st['ok']} ok · {st['fail']} failed")
+        if len(lines) == 2:
+            lines.append("No index has been used yet.")
+        await q.message.edit_text("\n".join(lines), parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        return
+    if action == "gdkeys":
+        icons = {"healthy": "🟢", "trial": "🟡", "quarantined": "🔴"}
+        lines = ["<b>🗝 GDFLIX KEY POOL</b>", ""]
+        for i, k in enumerate(gdflix.POOL.health(), 1):
+            state = f"{k['state']} {k['retry_in']:.0f}s" if k["state"] == "quarantined" else k["state"]
+            rate = f" · {k['rate_left']} left/min" if k["rate_left"] is not None else ""
+            lines.append(f"{icons[k['state']]} <b>#{i}</b> <code>{html.escape(k['key'])}</code> (w{k['weight']}): {state}")
+            lines.append(f"    {k['calls']} calls · {k['errors']} errors{rate}")
+            if k["last_error"]:
+                lines.append(f"    <i>{html.escape(k['last_error'])}</i>")
+        if len(lines) == 2:
+            lines.append("No global keys configured.")
+        await q.message.edit_text("\n".join(lines), parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        return
+    if action == "gdcache":
+        st = gdflix.cache_stats()
+        text = (
+            "<b>🗂 GDFLIX SHARE CACHE</b>\n\n"
+            f"Cached files: <b>{st['entries']}</b>\n"
+            f"Hits: <b>{st['hits']}</b> | Misses: <b>{st['misses']}</b> ({st['hit_rate']:.0f}% hit rate)\n"
+            f"GDFlix API calls made: <b>{st['api_calls']}</b>\n"
+            f"API calls saved: <b>{st['saved']}</b>"
+        )
+        await q.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        return
+    if action == "posts":
+        pst = posts.stats()
+        ist = imagehost.stats()
+        text = (
+            "<b>🖼 POSTS &amp; IMAGES</b>\n\n"
+            f"Cached /get posts: <b>{pst['entries']}</b>\n"
+            f"Reposts: <b>{pst['hits']}</b> | Misses: <b>{pst['misses']}</b> ({pst['hit_rate']:.0f}% hit rate)\n\n"
+            f"Hosted images: <b>{ist['entries']}</b> cached URLs\n"
+            f"Uploaded: <b>{ist['uploaded']}</b> | Deduplicated: <b>{ist['deduped']}</b> | Failed: <b>{ist['failed']}</b>"
+            + ("" if imagehost.configured() else "\n<i>Image host not configured.</i>")
+        )
+        await q.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=admin_panel_kb(BOT_CONFIG["GDFLIX_GLOBAL"]))
+        return
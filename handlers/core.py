@@ -1,46 +1,62 @@
+import asyncio
 import html
+import logging
+import os
 import re
+import tempfile
+import time
+import uuid
+from collections import deque
 from io import BytesIO
 import urllib.parse
 
-from telegram import Update
+from telegram import Update, InputMediaPhoto, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from app.config import OWNER_ID, GDFLIX_FILE_BASE, WORKERS_BASE
-from app.services import gdflix
-from app.services.mediainfo import get_text_from_url_or_path, parse_audio_block
-from app.services.tmdb import extract_title_year_from_filename, strict_match, pick_language, backdrop_from_tmdb_url
-from app.state import ALLOWED_USERS, AUTHORIZED_CHATS, UCER_SETTINGS, BOT_CONFIG, track_user, save_state
+from app.services import gdflix, imagehost
+from app.services.mediainfo import PROBE_LIMIT, head_meta, probe_url, probe_audio_block, probe_has_audio_info
+from app.services.workers import probe_sources, search as search_indexes
+from app.services.tmdb import extract_title_year_from_filename, strict_match, backdrop_from_tmdb_url, album_urls
+from app import access, admission, fileids, posts, quota, releases, tracing, usersettings
+from app.cache import TTLCache
+from app.state import BOT_CONFIG, track_user
 from app.utils import (
     is_gdrive_link, is_workers_link, extract_drive_id, extract_drive_id_from_workers,
-    extract_workers_path, human_readable_size, strip_extension, get_remote_size, download_bytes
+    extract_workers_path, human_readable_size, strip_extension, download_bytes, HTTP
 )
 
+logger = logging.getLogger(__name__)
+
+MANUAL_CAPTION_MAX = 1024   # Telegram's photo caption limit
+
 def is_allowed(user_id: int) -> bool:
-    if user_id == OWNER_ID:
+    if access.user_role(user_id):
         return True
-    if not ALLOWED_USERS:
-        return True
-    return user_id in ALLOWED_USERS
+    return not access.USERS
 
 def is_allowed_user(user_id: int) -> bool:
-    if user_id == OWNER_ID:
-        return True
-    if not ALLOWED_USERS:
-        return False
-    return user_id in ALLOWED_USERS
+    return access.user_role(user_id) is not None
 
-def is_chat_authorized(update: Update) -> bool:
-    chat = update.effective_chat
-    user = update.effective_user
-    if not chat or not user:
-        return False
-    if user.id == OWNER_ID:
-        return True
-    if chat.type in ("group", "supergroup"):
-        return chat.id in AUTHORIZED_CHATS
-    return is_allowed_user(user.id)
+def is_chat_authorized(update: Update, context: ContextTypes.DEFAULT_TYPE | None = None) -> bool:
+    return access.decision_for(update, context).allowed
+
+def _parse_grant_args(args: list) -> tuple[float | None, str | None, str | None]:
+    """Optional trailing args in any order: a duration (7d/12h/30m), a role and/or a group policy."""
+    ttl, role, policy = None, None, None
+    for a in args:
+        a = a.lower()
+        d = access.parse_duration(a)
+        if d:
+            ttl = d
+        elif a in (access.ROLE_USER, access.ROLE_ADMIN):
+            role = a
+        elif a in access.POLICIES:
+            policy = a
+        else:
+            raise ValueError(a)
+    return ttl, role, policy
 
 async def authorize(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
@@ -50,35 +66,63 @@ async def authorize(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if chat.type not in ("group", "supergroup"):
         await update.message.reply_text("Use /authorize inside the group you want to authorize.")
         return
-    if OWNER_ID and user.id != OWNER_ID:
-        await update.message.reply_text("Only bot owner can authorize this group.")
+    if OWNER_ID and not access.has_role(user.id, access.ROLE_ADMIN):
+        await update.message.reply_text("Only bot owner or admins can authorize this group.")
+        return
+    try:
+        ttl, _, policy = _parse_grant_args(context.args or [])
+    except ValueError as e:
+        await update.message.reply_text(f"Unknown option: {e}\nUsage: /authorize [7d|12h] [{'|'.join(access.POLICIES)}]")
+        return
+    access.authorize_chat(chat.id, policy or access.POLICY_ALL, ttl, by=user.id)
+    exp = access.format_expiry(access.CHATS[chat.id].expires_at)
+    await update.message.reply_text(f"✅ Group authorized.\nPolicy: <b>{policy or access.POLICY_ALL}</b> | Expires: <b>{exp}</b>", parse_mode=ParseMode.HTML)
+
+async def unauthorize(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user:
+        track_user(update.effective_user.id)
+    chat = update.effective_chat
+    if not access.has_role(update.effective_user.id, access.ROLE_ADMIN):
+        return
+    if chat.type not in ("group", "supergroup"):
+        await update.message.reply_text("Use /unauthorize inside the group.")
         return
-    AUTHORIZED_CHATS.add(chat.id)
-    save_state()
-    await update.message.reply_text("✅ Group authorized.", parse_mode=ParseMode.HTML)
+    if not access.unauthorize_chat(chat.id):
+        await update.message.reply_text("This group was not authorized.")
+        return
+    await update.message.reply_text("❌ Group authorization removed.")
 
 async def allow_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
         track_user(update.effective_user.id)
-    if update.effective_user.id != OWNER_ID:
+    caller = update.effective_user.id
+    if not access.has_role(caller, access.ROLE_ADMIN):
         return
     if not context.args:
-        await update.message.reply_text("Usage: /allow <user_id>")
+        await update.message.reply_text("Usage: /allow <user_id> [7d|12h|30m] [user|admin]")
         return
     try:
         uid = int(context.args[0])
+        ttl, role, _ = _parse_grant_args(context.args[1:])
     except Exception:
-        await update.message.reply_text("Invalid user id.")
+        await update.message.reply_text("Invalid user id or option.\nUsage: /allow <user_id> [7d|12h|30m] [user|admin]")
+        return
+    role = role or access.ROLE_USER
+    if role == access.ROLE_ADMIN and access.user_role(caller) != access.ROLE_OWNER:
+        await update.message.reply_text("Only the bot owner can grant admin.")
         return
-    if uid not in ALLOWED_USERS:
-        ALLOWED_USERS.append(uid)
-        save_state()
-    await update.message.reply_text(f"<b>✅ User {uid} granted full access</b>", parse_mode=ParseMode.HTML)
+    if access.has_role(uid, access.ROLE_ADMIN) and access.user_role(caller) != access.ROLE_OWNER:
+        await update.message.reply_text("Only the bot owner can change an admin's access.")
+        return
+    access.grant_user(uid, role, ttl, by=caller)
+    exp = access.format_expiry(access.USERS[uid].expires_at)
+    await update.message.reply_text(f"<b>✅ User {uid} granted {role} access</b>\nExpires: <b>{exp}</b>", parse_mode=ParseMode.HTML)
 
 async def deny_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
         track_user(update.effective_user.id)
-    if update.effective_user.id != OWNER_ID:
+    caller = update.effective_user.id
+    if not access.has_role(caller, access.ROLE_ADMIN):
         return
     if not context.args:
         await update.message.reply_text("Usage: /deny <user_id>")
@@ -88,11 +132,15 @@ async def deny_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception:
         await update.message.reply_text("Invalid user id.")
         return
-    if uid in ALLOWED_USERS:
-        ALLOWED_USERS.remove(uid)
-        save_state()
+    if access.has_role(uid, access.ROLE_ADMIN) and access.user_role(caller) != access.ROLE_OWNER:
+        await update.message.reply_text("Only the bot owner can revoke an admin.")
+        return
+    if not access.revoke_user(uid):
+        await update.message.reply_text(f"User {uid} was not granted access.")
+        return
     await update.message.reply_text(f"<b>❌ User {uid} access revoked</b>", parse_mode=ParseMode.HTML)
 
+
 def _normalize_workers_base(index_url: str) -> str | None:
     import urllib.parse
     if not index_url: return None
@@ -121,40 +169,284 @@ def _normalize_index_start(index_url: str) -> str | None:
         return None
 
 def _get_user_indexes(user_id: int):
-    cfg = UCER_SETTINGS.setdefault(user_id, {"gdflix": None, "indexes": [], "full_name": False, "audio_format": False})
-    if "indexes" not in cfg: cfg["indexes"] = []
-    cfg["indexes"] = (cfg.get("indexes") or [])[:6]
-    return cfg["indexes"]
-
-def workers_link_from_drive_id_for_user(user_id: int, file_id: str) -> str:
-    indexes = _get_user_indexes(user_id)
-    base = _normalize_workers_base(indexes[0]) if indexes else None
-    if not base:
-        base = WORKERS_BASE
-    return f"{base}/0:findpath?id={file_id}"
+    return usersettings.get(user_id).indexes
+
+def workers_links_from_drive_id_for_user(user_id: int, file_id: str) -> list[str]:
+    bases = [b for b in (_normalize_workers_base(u) for u in _get_user_indexes(user_id)) if b]
+    if not bases and WORKERS_BASE:
+        bases = [WORKERS_BASE]
+    return [f"{b}/0:findpath?id={file_id}" for b in dict.fromkeys(bases)]
 
 def format_filename(name: str, user_id: int) -> str:
     if not name:
         return "Unknown"
-    full_on = UCER_SETTINGS.get(user_id, {}).get("full_name", False)
-    return name if full_on else strip_extension(name)
+    return name if usersettings.get(user_id).full_name else strip_extension(name)
+
+async def _get_precheck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    user = update.effective_user
+    if not is_chat_authorized(update, context):
+        await update.effective_message.reply_text("❌ Access denied.\nGroup: need /authorize\nPM: need /allow")
+        return False
+    # GDFLIX check
+    if not BOT_CONFIG.get("GDFLIX_GLOBAL", True):
+        if not usersettings.get(user.id).gdflix:
+            await update.effective_message.reply_text("❌ <b>GDFlix is disabled.</b>\n\nAdd your own GDFlix API using /ucer to continue.", parse_mode=ParseMode.HTML)
+            return False
+    return True
+
+def _gdflix_api_key(user_id: int) -> str | None:
+    return usersettings.get(user_id).gdflix if not BOT_CONFIG.get("GDFLIX_GLOBAL", True) else None
+
+def _drive_id_from_url(url: str) -> str | None:
+    if is_gdrive_link(url):
+        return extract_drive_id(url)
+    if is_workers_link(url):
+        return extract_drive_id_from_workers(url)
+    return None
+
+def _share_item(did: str, api_key: str | None, user_id: int) -> dict | None:
+    gd_res = gdflix.share_file(did, api_key)
+    if not gd_res:
+        return None
+    raw_name = gd_res.get("name") or "Unknown"
+    size = gd_res.get("size") or 0
+    return {
+        "id": did, "raw_name": raw_name, "name": format_filename(raw_name, user_id),
+        "size_str": human_readable_size(size), "size_bytes": size,
+        "link": gdflix.file_link_from_response(gd_res, did),
+    }
+
+def _post_sources(user_id: int, items: list, drive_ids: list, media_source_url: str | None):
+    """Where the /get probe reads from: an explicit direct link, else the user's indexes for the first Drive ID."""
+    index_sources = []
+    if not media_source_url:
+        first_drive_id = items[0]["id"] if items else (drive_ids[0] if drive_ids else None)
+        if first_drive_id:
+            index_sources = workers_links_from_drive_id_for_user(user_id, first_drive_id)
+            media_source_url = index_sources[0] if index_sources else None
+    return media_source_url, index_sources
+
+def _probe_post(user_id: int, media_source_url: str, index_sources: list) -> dict:
+    """Blocking: ranged download + mediainfo. Returns the probe meta (or None) with the parsed audio block."""
+    with admission.probing(PROBE_LIMIT):
+        probe = probe_sources(index_sources) if index_sources else probe_url(media_source_url)
+    if probe:
+        quota.charge_probe(user_id, probe.get("downloaded", 0))
+    audio, _ = probe_audio_block(probe, usersettings.get(user_id).audio_format)
+    return {"probe": probe, "audio": audio}
+
+GET_PROBE_CONCURRENCY = 3   # mediainfo runs in flight per /get
+GET_PROBE_DEADLINE = 20.0   # seconds before the post goes out with the slow groups marked pending
+
+def _probe_item(user_id: int, item: dict) -> dict:
+    sources = workers_links_from_drive_id_for_user(user_id, item["id"])
+    return _probe_post(user_id, sources[0], sources) if sources else {"probe": None, "audio": ""}
+
+def _pack_targets(packs: list) -> list:
+    return [it for pack in packs for it in pack.probe]
+
+def _pack_audio(packs: list, results: dict, pending: bool = False) -> str:
+    """One audio block per release group, identical blocks merged under a joint label.
+
+    results maps probed item IDs to their audio block; unprobed episodes follow their group's representative.
+    Groups still waiting on a probe get a placeholder when pending, else are left out.
+    """
+    blocks: dict = {}
+    late = []
+    for pack in packs:
+        targets = {it["id"] for it in pack.probe}
+        rep = pack.probe[0]["id"]
+        by_probe: dict = {}
+        for it in pack.items:
+            by_probe.setdefault(it["id"] if it["id"] in targets else rep, []).append(it)
+        by_audio: dict = {}
+        for key, its in by_probe.items():
+            if key in results:
+                by_audio.setdefault(results[key], []).extend(its)
+            else:
+                late.append(releases.label(pack.release, its))
+        for a, its in by_audio.items():
+            if a:
+                blocks.setdefault(a, []).append(releases.label(pack.release, its))
+    if len(blocks) == 1 and not late:
+        return next(iter(blocks))
+    sections = [f"<i>{html.escape(' / '.join(labels))}</i>\n{a.rstrip()}" for a, labels in blocks.items()]
+    if pending:
+        sections += [f"<i>{html.escape(label)}</i>\n<i>⏳ Reading audio info…</i>" for label in late]
+    return "\n\n".join(sections)
+
+def _probe_packs(user_id: int, items: list) -> dict:
+    """Blocking: probe one representative per release group (plus size outliers) instead of every episode."""
+    packs = releases.plan(items)
+    results, first = {}, None
+    for it in _pack_targets(packs):
+        r = _probe_item(user_id, it)
+        first = first or r["probe"]
+        results[it["id"]] = r["audio"]
+    return {"probe": first, "audio": _pack_audio(packs, results)}
+
+def _post_probe(user_id: int, items: list, media_source_url: str, index_sources: list) -> dict:
+    """Shared files are probed per release group; an explicit direct link is probed as is."""
+    if items and index_sources:
+        return _probe_packs(user_id, items)
+    return _probe_post(user_id, media_source_url, index_sources)
+
+def _tmdb_name(items: list, probed: dict | None) -> str | None:
+    if items:
+        return items[0]["raw_name"]
+    probe = (probed or {}).get("probe") or {}
+    if probe.get("filename"):
+        return probe["filename"]
+    m = re.search(r"Complete name\s*:\s*(.+)", probe.get("text") or "")
+    return m.group(1).strip() if m else None
+
+def _match_post(name: str | None) -> dict:
+    """Blocking: TMDB title/year/poster for the file name."""
+    if not name:
+        return {"title": "Unknown", "year": "????", "poster_url": None, "tmdb_url": None}
+    base_title, file_year = extract_title_year_from_filename(name)
+    t_title, t_year, _, poster_url, tmdb_url = strict_match(base_title, file_year)
+    return {"title": t_title or base_title or "Unknown", "year": t_year or file_year or "????",
+            "poster_url": poster_url, "tmdb_url": tmdb_url}
+
+def _render_post(items: list, media_source_url: str | None, probed: dict | None, match: dict | None,
+                 degraded: bool = False, name: str | None = None, probing: bool = False) -> str:
+    """The /get caption. match=None renders a filename guess; probing=True a placeholder for the audio block."""
+    if match is None:
+        title, year = extract_title_year_from_filename(name) if name else ("Unknown", "????")
+        header = f"<b>🎬 {html.escape(title)} - ({html.escape(year)})</b> <i>⏳</i>"
+    else:
+        header = f"<b>🎬 {html.escape(match['title'])} - ({html.escape(match['year'])})</b>"
+    lines = [header, ""]
+    for it in items:
+        lines.append(f"<b>{html.escape(it['name'])} [{it['size_str']}]</b>")
+        lines.append(f"<b>{html.escape(it['link'])}</b>")
+        lines.append("")
+
+    probe = (probed or {}).get("probe") or {}
+    if not items and media_source_url:
+        fname = probe.get("filename") or urllib.parse.unquote(urllib.parse.urlparse(media_source_url).path.rsplit("/", 1)[-1])
+        size_bytes = probe.get("size")
+        size_str = human_readable_size(size_bytes) if size_bytes else "Unknown"
+        lines.append(f"<b>{html.escape(strip_extension(fname))} [{size_str}]</b>")
+        lines.append(f"<b>{html.escape(media_source_url)}</b>")
+        lines.append("")
+
+    audio = (probed or {}).get("audio")
+    if audio:
+        lines.append(audio.rstrip())
+    elif probing:
+        lines.append("<i>⏳ Reading audio info…</i>")
+    elif degraded and media_source_url:
+        lines.append("<i>Audio info skipped: the bot is busy.</i>")
+    return "\n".join(lines)
+
+def _build_get_post(user_id: int, items: list, drive_ids: list, media_source_url: str | None, degraded: bool = False):
+    """Blocking: probe mediainfo, match TMDB and render the /get caption. Returns (caption, poster_url, tmdb_url).
+
+    degraded skips the probe entirely (admission control under load): links + TMDB only.
+    """
+    media_source_url, index_sources = _post_sources(user_id, items, drive_ids, media_source_url)
+    probed = None
+    if media_source_url and degraded:
+        admission.skipped_probe()
+    elif media_source_url:
+        probed = _post_probe(user_id, items, media_source_url, index_sources)
+    match = _match_post(_tmdb_name(items, probed))
+    return _render_post(items, media_source_url, probed, match, degraded), match["poster_url"], match["tmdb_url"]
+
+async def _admit(update: Update, n_links: int, api_key: str | None = None, uses_gdflix: bool = True,
+                 degradable: bool = True) -> admission.Ticket | None:
+    """Admission under load, then quota for the job. Replies with the retry-after and returns None when refused."""
+    user = update.effective_user
+    chat = update.effective_chat
+    try:
+        ticket = admission.admit(degradable)
+    except admission.Overloaded as e:
+        await update.effective_message.reply_text(e.user_message())
+        return None
+    try:
+        quota.start(user.id, chat.id if chat else None, n_links, api_key, uses_gdflix)
+    except quota.QuotaExceeded as e:
+        admission.release(ticket)
+        await update.effective_message.reply_text(e.user_message())
+        return None
+    return ticket
+
+def _done(user_id: int, ticket: admission.Ticket | None):
+    quota.end_job(user_id)
+    admission.release(ticket)
+
+async def _send_post(message, msg: str, poster_url: str | None):
+    file_id = fileids.lookup(poster_url)
+    if file_id:
+        try:
+            return await message.reply_photo(photo=file_id, caption=msg, parse_mode=ParseMode.HTML)
+        except Exception:
+            fileids.FILE_IDS.pop(poster_url)
+    with tracing.span("poster.fetch"):
+        poster_bytes = await asyncio.to_thread(download_bytes, poster_url) if poster_url else None
+    if poster_bytes:
+        bio = BytesIO(poster_bytes); bio.name = "poster.jpg"
+        sent = await message.reply_photo(photo=bio, caption=msg, parse_mode=ParseMode.HTML)
+        fileids.remember(poster_url, sent)
+        return sent
+    return await message.reply_text(msg, parse_mode=ParseMode.HTML)
+
+def _wants_album(user_id: int) -> bool:
+    return usersettings.get(user_id).album
+
+async def _send_album(message, msg: str, urls: list):
+    """One media group with the caption on the first image; images Telegram doesn't have yet are fetched concurrently."""
+    cached = [fileids.lookup(u) for u in urls]
+    fetched = iter(await asyncio.gather(*(asyncio.to_thread(download_bytes, u) for u, fid in zip(urls, cached) if not fid)))
+    media, sources = [], []
+    for u, fid in zip(urls, cached):
+        data = fid or next(fetched)
+        if not data:
+            continue
+        if not fid:
+            data = BytesIO(data); data.name = "image.jpg"
+        first = not media
+        media.append(InputMediaPhoto(media=data, caption=msg if first else None, parse_mode=ParseMode.HTML if first else None))
+        sources.append((u, bool(fid)))
+    if len(media) < 2:
+        return [await _send_post(message, msg, sources[0][0] if sources else None)]
+    try:
+        sent = await message.reply_media_group(media=media)
+    except Exception:
+        if not any(by_ref for _, by_ref in sources):
+            raise
+        for u, by_ref in sources:  # a stale file_id spoils the whole group: retry once with bytes
+            if by_ref:
+                fileids.FILE_IDS.pop(u)
+        return await _send_album(message, msg, urls)
+    for (u, by_ref), m in zip(sources, sent):
+        if not by_ref:
+            fileids.remember(u, m)
+    return list(sent)
+
+async def _send_reply(message, user_id: int, msg: str, poster_url: str | None, tmdb_url: str | None) -> list:
+    """Poster post, or poster + backdrop + logo album for users who enabled it in /ucer. Returns the sent messages."""
+    if tmdb_url and _wants_album(user_id):
+        urls = await asyncio.to_thread(album_urls, tmdb_url, poster_url)
+        if len(urls) > 1:
+            return await _send_album(message, msg, urls)
+    return [await _send_post(message, msg, poster_url)]
 
 async def get_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
         track_user(update.effective_user.id)
-    user = update.effective_user
-    if not is_chat_authorized(update):
-        await update.message.reply_text("❌ Access denied.\nGroup: need /authorize\nPM: need /allow")
+    if not await _get_precheck(update, context):
+        return
+
+    reply = update.message.reply_to_message
+    if reply and _is_link_list(reply.document):
+        await _bulk_get(update, context, reply.document)
         return
-    # GDFLIX check
-    if not BOT_CONFIG.get("GDFLIX_GLOBAL", True):
-        user_api = UCER_SETTINGS.get(user.id, {}).get("gdflix")
-        if not user_api:
-            await update.message.reply_text("❌ <b>GDFlix is disabled.</b>\n\nAdd your own GDFlix API using /ucer to continue.", parse_mode=ParseMode.HTML)
-            return
 
     if not context.args:
-        await update.message.reply_text("Usage:\n/get <one or more links>")
+        await update.message.reply_text("Usage:\n/get <one or more links>\nOr reply /get to a .txt file of links")
         return
 
     parts = (update.message.text or "").split()
@@ -163,118 +455,420 @@ async def get_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("No valid links found.")
         return
     if len(urls) > 8:
-        await update.message.reply_text("Maximum 8 links allowed in one /get.")
+        await update.message.reply_text("Maximum 8 links allowed in one /get.\nSend them as a .txt file for bulk mode.")
         return
+    await _get_post(update, context, urls)
 
-    status_msg = await update.message.reply_text("Wait :- 50%\n▰▰▰▰▰▱▱▱▱▱")
+async def _get_post(update: Update, context: ContextTypes.DEFAULT_TYPE, urls: list):
+    """The /get pipeline for up to 8 links; also run by the /search result buttons."""
+    user = update.effective_user
+    message = update.effective_message
+    drive_ids, media_source_url = _get_links(urls)
+    api_key = _gdflix_api_key(user.id)
+    chat_id = update.effective_chat.id
+    links = drive_ids + ([media_source_url] if media_source_url else [])
+    post_key = posts.key(chat_id, links or urls, posts.render_options(api_key, usersettings.get(user.id)))
+    cached = posts.lookup(post_key)
+    if cached and await _repost(update, context, post_key, cached):
+        return
 
-    try:
-        drive_ids = []
-        media_source_url = None
-        for url in urls:
-            if "download.aspx" in url and media_source_url is None:
-                media_source_url = url
-            if is_gdrive_link(url):
-                did = extract_drive_id(url)
-                if did: drive_ids.append(did)
-            elif is_workers_link(url):
-                did = extract_drive_id_from_workers(url)
-                if did:
-                    drive_ids.append(did)
-                else:
-                    wpath = extract_workers_path(url)
-                    if wpath and media_source_url is None:
-                        media_source_url = wpath
-
-        items = []
-        first_name_for_tmdb = None
-        first_size_bytes = None
-
-        # choose gdflix api
-        api_key = UCER_SETTINGS.get(user.id, {}).get("gdflix") if not BOT_CONFIG.get("GDFLIX_GLOBAL", True) else None
+    ticket = await _admit(update, len(urls), api_key)
+    if not ticket:
+        return
 
-        for did in drive_ids:
-            gd_res = gdflix.share_file(did, api_key)
-            if not gd_res:
-                continue
-            raw_name = gd_res.get("name") or "Unknown"
-            display_name = format_filename(raw_name, user.id)
-            size = gd_res.get("size") or 0
-            size_str = human_readable_size(size)
-            link = gdflix.file_link_from_response(gd_res, did)
-            items.append({"id": did, "name": display_name, "size_str": size_str, "size_bytes": size, "link": link})
-            if not first_name_for_tmdb:
-                first_name_for_tmdb = raw_name
-            if first_size_bytes is None:
-                first_size_bytes = size
-
-        if not media_source_url:
-            first_drive_id = items[0]["id"] if items else (drive_ids[0] if drive_ids else None)
-            if first_drive_id:
-                media_source_url = workers_link_from_drive_id_for_user(user.id, first_drive_id)
-
-        parsed_mediainfo = ""
-        org_aud_lang = None
-        if media_source_url:
-            mi_text = get_text_from_url_or_path(media_source_url)
-            if mi_text:
-                ucer_audio_fmt = UCER_SETTINGS.get(user.id, {}).get("audio_format", False)
-                parsed_mediainfo, org_aud_lang = parse_audio_block(mi_text, ucer_audio_fmt)
-                if not first_name_for_tmdb:
-                    m = re.search(r"Complete name\s*:\s*(.+)", mi_text)
-                    if m: first_name_for_tmdb = m.group(1).strip()
-
-        final_title, final_year, poster_url, tmdb_url = "Unknown", "????", None, None
-        final_lang = pick_language(None, org_aud_lang)
-        if first_name_for_tmdb:
-            base_title, file_year = extract_title_year_from_filename(first_name_for_tmdb)
-            t_title, t_year, t_lang, poster_url, tmdb_url = strict_match(base_title, file_year)
-            final_title = t_title or base_title or "Unknown"
-            final_year = t_year or file_year or "????"
-            final_lang = pick_language(t_lang, org_aud_lang)
+    status_msg = await message.reply_text("⏳ Sharing links…")
 
-        header = f"<b>🎬 {html.escape(final_title)} - ({html.escape(final_year)})</b>"
-        lines = [header, ""]
-        for it in items:
-            lines.append(f"<b>{html.escape(it['name'])} [{it['size_str']}]</b>")
-            lines.append(f"<b>{html.escape(it['link'])}</b>")
-            lines.append("")
-
-        if not items and media_source_url:
-            import urllib.parse
-            fname = urllib.parse.unquote(urllib.parse.urlparse(media_source_url).path.rsplit("/", 1)[-1])
-            display_name = strip_extension(fname)
-            size_bytes = get_remote_size(media_source_url)
-            size_str = human_readable_size(size_bytes) if size_bytes else "Unknown"
-            lines.append(f"<b>{html.escape(display_name)} [{size_str}]</b>")
-            lines.append(f"<b>{html.escape(media_source_url)}</b>")
-            lines.append("")
+    try:
+        with tracing.span("stage.share", links=len(drive_ids)):
+            items = await asyncio.to_thread(lambda: [it for it in (_share_item(did, api_key, user.id) for did in drive_ids) if it])
 
-        if parsed_mediainfo:
-            lines.append(parsed_mediainfo.rstrip())
+        with tracing.span("stage.build") as sp:
+            msg, poster_url, tmdb_url, finish = await _progressive_post(status_msg, user.id, items, drive_ids, media_source_url, ticket.degraded)
+            sp["late"] = finish is not None
 
-        msg = "\n".join(lines)
+        # Poster arrived: the text message becomes a photo post (a text message can't be edited into one).
+        sent = [status_msg]
+        if poster_url or (tmdb_url and _wants_album(user.id)):
+            sent = await _send_reply(message, user.id, msg, poster_url, tmdb_url)
+            try: await status_msg.delete()
+            except Exception: pass
 
+        # Degraded posts lack their audio info: don't let a busy moment be replayed for a day
+        cache_key = post_key if items and not ticket.degraded else None
+        if finish:
+            # The probes that missed the deadline keep the job (and its quota slot) until they land
+            context.application.create_task(_fill_late(sent, sent[0] is not status_msg, finish, user.id, ticket, cache_key))
+            ticket = None
+        elif cache_key:
+            posts.remember(cache_key, msg, sent)
+
+    except Exception as e:
         try: await status_msg.delete()
         except Exception: pass
+        tracing.fail(e)
+        await message.reply_text(f"⚠️ Something went wrong.\n\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
+    finally:
+        if ticket:
+            _done(user.id, ticket)
 
-        poster_bytes = download_bytes(poster_url) if poster_url else None
-        if poster_bytes:
-            bio = BytesIO(poster_bytes); bio.name = "poster.jpg"
-            await update.message.reply_photo(photo=bio, caption=msg, parse_mode=ParseMode.HTML)
+def _get_links(urls: list) -> tuple[list, str | None]:
+    """Drive IDs to share, and the direct link (if any) to probe instead of the index copy."""
+    drive_ids = []
+    media_source_url = None
+    for url in urls:
+        if "download.aspx" in url and media_source_url is None:
+            media_source_url = url
+        if is_gdrive_link(url):
+            did = extract_drive_id(url)
+            if did: drive_ids.append(did)
+        elif is_workers_link(url):
+            did = extract_drive_id_from_workers(url)
+            if did:
+                drive_ids.append(did)
+            else:
+                wpath = extract_workers_path(url)
+                if wpath and media_source_url is None:
+                    media_source_url = wpath
+    return drive_ids, media_source_url
+
+async def _repost(update: Update, context: ContextTypes.DEFAULT_TYPE, post_key: str, cached: dict) -> bool:
+    """Answer a repeated /get from the post cache: copy the original, else resend its caption and photos by file_id."""
+    chat_id = update.effective_chat.id
+    with tracing.span("post.cache", ids=len(cached["ids"])) as sp:
+        try:
+            if len(cached["ids"]) > 1:
+                await context.bot.copy_messages(chat_id, chat_id, cached["ids"])
+            else:
+                await context.bot.copy_message(chat_id, chat_id, cached["ids"][0], reply_to_message_id=update.effective_message.message_id)
+            sp["via"] = "copy"
+            return True
+        except Exception as e:
+            logger.warning(f"/get cached post copy failed: {e}")
+        try:  # the original was deleted
+            caption, photos = cached["caption"], cached["photos"]
+            if len(photos) > 1:
+                await update.effective_message.reply_media_group(media=[
+                    InputMediaPhoto(media=fid, caption=caption if i == 0 else None, parse_mode=ParseMode.HTML if i == 0 else None)
+                    for i, fid in enumerate(photos)
+                ])
+            elif photos:
+                await update.effective_message.reply_photo(photo=photos[0], caption=caption, parse_mode=ParseMode.HTML)
+            else:
+                await update.effective_message.reply_text(caption, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+            sp["via"] = "resend"
+            return True
+        except Exception as e:
+            logger.warning(f"/get cached post resend failed: {e}")
+            posts.forget(post_key)
+            sp["via"] = "miss"
+            return False
+
+async def _fill_late(sent: list, caption: bool, finish, user_id: int, ticket: admission.Ticket, cache_key: str | None):
+    """Edit the audio info of late probes into the finished /get post."""
+    try:
+        text = await finish()
+        post = sent[0] if sent else None
+        if post is None:
+            return
+        if caption:
+            await post.edit_caption(caption=text, parse_mode=ParseMode.HTML)
         else:
-            await update.message.reply_text(msg, parse_mode=ParseMode.HTML)
+            await post.edit_text(text, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+        if cache_key:
+            posts.remember(cache_key, text, sent)
+    except Exception as e:
+        logger.warning(f"/get late audio fill failed: {e}")
+    finally:
+        _done(user_id, ticket)
+
+async def _progressive_post(status_msg, user_id: int, items: list, drive_ids: list, media_source_url: str | None, degraded: bool):
+    """Show links as soon as the shares resolve, then edit in the audio blocks and TMDB title as each lands.
+
+    Every release group of a batch is probed concurrently alongside TMDB, under one shared deadline.
+    Returns (caption, poster_url, tmdb_url, finish): finish is None, or a coroutine function that waits
+    for the groups that missed the deadline and returns the completed caption.
+    """
+    media_source_url, index_sources = _post_sources(user_id, items, drive_ids, media_source_url)
+    probing = bool(media_source_url) and not degraded
+    if media_source_url and degraded:
+        admission.skipped_probe()
+    probed, match = None, None
+    name = _tmdb_name(items, None)
+    shown = [None]
+
+    def render(pending: bool = True) -> str:
+        return _render_post(items, media_source_url, probed, match, degraded, name=name, probing=probing and probed is None and pending)
+
+    async def show():
+        text = render()
+        if text == shown[0]:
+            return
+        shown[0] = text
+        try:
+            await status_msg.edit_text(text, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+        except Exception:
+            pass
+
+    await show()  # first useful output: the links, at GDFlix latency
+
+    packs = releases.plan(items) if probing and items and index_sources else None
+    results: dict = {}
+    sem = asyncio.Semaphore(GET_PROBE_CONCURRENCY)
+
+    async def probe(item: dict | None):
+        async with sem:
+            try:
+                if item is None:
+                    return None, await asyncio.to_thread(_probe_post, user_id, media_source_url, index_sources)
+                return item["id"], await asyncio.to_thread(_probe_item, user_id, item)
+            except Exception as e:
+                logger.warning(f"/get probe failed: {e}")
+                return (item or {}).get("id"), {"probe": None, "audio": ""}
+
+    def landed(key, result: dict, pending: bool = True):
+        nonlocal probed
+        if packs is None:
+            probed = result
+            return
+        results[key] = result["audio"]
+        first = (probed or {}).get("probe") or result["probe"]
+        probed = {"probe": first, "audio": _pack_audio(packs, results, pending)}
+
+    if packs is not None:
+        probe_tasks = {asyncio.create_task(probe(it)) for it in _pack_targets(packs)}
+    else:
+        probe_tasks = {asyncio.create_task(probe(None))} if probing else set()
+    match_task = asyncio.create_task(asyncio.to_thread(_match_post, name)) if name else None
+    pending = probe_tasks | ({match_task} if match_task else set())
+    deadline = asyncio.get_running_loop().time() + GET_PROBE_DEADLINE
+    while pending & probe_tasks or match_task in pending:
+        timeout = None if not pending & probe_tasks else max(0.0, deadline - asyncio.get_running_loop().time())
+        done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:  # deadline: what's still probing is filled in by edit later
+            if match_task not in pending:
+                break
+            pending -= probe_tasks
+            continue
+        for t in done:
+            if t is match_task:
+                try:
+                    match = t.result()
+                except Exception as e:
+                    logger.warning(f"/get stage failed: {e}")
+                continue
+            key, result = t.result()
+            landed(key, result)
+            if match_task is None:
+                name = _tmdb_name(items, probed)
+                match_task = asyncio.create_task(asyncio.to_thread(_match_post, name))
+                pending.add(match_task)
+        await show()
+    if match is None:
+        match = await asyncio.to_thread(_match_post, name)
+    await show()
+
+    late = {t for t in probe_tasks if not t.done()}
+    if not late:
+        return shown[0], match["poster_url"], match["tmdb_url"], None
+
+    async def finish() -> str:
+        for t in asyncio.as_completed(late):
+            landed(*(await t), pending=False)
+        return render(pending=False)
+
+    return shown[0], match["poster_url"], match["tmdb_url"], finish
+
+# ---- Bulk /get from a .txt link list ----
+
+BULK_SHARE_CONCURRENCY = 4   # GDFlix shares in flight
+BULK_POST_CONCURRENCY = 2    # probe + TMDB + send pipelines in flight
+BULK_WINDOW = 16             # resolved-but-unconsumed links kept in memory
+BULK_GROUP_MAX = 8           # same cap as a single /get
+BULK_PROGRESS_EVERY = 3.0
+BULK_PROGRESS_EVERY_GROUP = 20.0   # groups get ~20 sends a minute; progress edits mustn't eat the posts' share
+BULK_FAILED_SHOWN = 10
+
+def _is_link_list(document) -> bool:
+    if not document:
+        return False
+    name = (document.file_name or "").lower()
+    return name.endswith(".txt") or document.mime_type == "text/plain"
+
+def _iter_links(path: str):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            for token in line.split():
+                if token.startswith("http"):
+                    yield token
+
+def _group_key(name: str) -> tuple:
+    title, year = extract_title_year_from_filename(name)
+    # Episodes of one season share a post, so key on the season rather than the SxxEyy marker.
+    season = None
+    m = re.search(r"\bS(\d{1,2})(?:E\d{1,3})?\b", title, flags=re.IGNORECASE)
+    if m and m.start():
+        title, season = title[:m.start()], int(m.group(1))
+    return re.sub(r"\W+", " ", title).strip().lower(), year, season
+
+def _resolve_bulk_link(url: str, api_key: str | None, user_id: int) -> dict | None:
+    did = _drive_id_from_url(url)
+    if did:
+        return _share_item(did, api_key, user_id)
+    if is_workers_link(url) or "download.aspx" in url:
+        return {"source": url, "raw_name": urllib.parse.unquote(urllib.parse.urlparse(url).path.rsplit("/", 1)[-1]) or url}
+    return None
+
+async def get_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """A .txt of links sent in PM, or with a /get caption in groups, runs bulk mode."""
+    if update.effective_user:
+        track_user(update.effective_user.id)
+    msg = update.message
+    if not msg or not _is_link_list(msg.document):
+        return
+    if msg.chat.type != "private" and not (msg.caption or "").startswith("/get"):
+        return
+    if not await _get_precheck(update, context):
+        return
+    await _bulk_get(update, context, msg.document)
+
+async def _bulk_get(update: Update, context: ContextTypes.DEFAULT_TYPE, document):
+    user = update.effective_user
+    api_key = _gdflix_api_key(user.id)
+    stats = {"read": 0, "resolved": 0, "failed": 0, "posts": 0, "post_failed": 0, "throttled": 0}
+    ticket = await _admit(update, 1, api_key)
+    if not ticket:
+        return
+    status_msg = await update.message.reply_text("📥 Reading link list…")
+
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    share_sem = asyncio.Semaphore(BULK_SHARE_CONCURRENCY)
+    post_sem = asyncio.Semaphore(BULK_POST_CONCURRENCY)
+    post_tasks: set = set()
+    last_progress = [0.0]
+    window: deque = deque()   # (url, resolve task)
+    failed_links: list = []
+    every = BULK_PROGRESS_EVERY if update.effective_chat and update.effective_chat.type == "private" else BULK_PROGRESS_EVERY_GROUP
+
+    async def progress(force: bool = False):
+        now = time.monotonic()
+        if not force and now - last_progress[0] < every:
+            return
+        last_progress[0] = now
+        text = (f"<b>📦 Bulk /get</b>\n\n"
+                f"Links read: <b>{stats['read']}</b>\n"
+                f"Shared: <b>{stats['resolved']}</b> | Failed: <b>{stats['failed']}</b>\n"
+                f"Posts sent: <b>{stats['posts']}</b>" + (f" | Failed: <b>{stats['post_failed']}</b>" if stats["post_failed"] else "")
+                + (f"\n⏳ Paced by quota: <b>{stats['throttled']}</b>s" if stats["throttled"] else ""))
+        if force and failed_links:
+            text += "\n\n<b>Failed links:</b>\n" + "\n".join(f"<code>{html.escape(u)}</code>" for u in failed_links[:BULK_FAILED_SHOWN])
+            if len(failed_links) > BULK_FAILED_SHOWN:
+                text += f"\n… and {len(failed_links) - BULK_FAILED_SHOWN} more"
+        try: await status_msg.edit_text(text, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+        except Exception: pass
+
+    async def pace(check):
+        # Long lists run under the same quotas as /get, so wait out the bucket instead of failing.
+        while True:
+            try:
+                check()
+                return
+            except quota.QuotaExceeded as e:
+                if e.retry_after > 3600:
+                    raise
+                stats["throttled"] += e.retry_after
+                await progress()
+                await asyncio.sleep(e.retry_after)
+
+    async def resolve(url: str):
+        async with share_sem:
+            return await asyncio.to_thread(_resolve_bulk_link, url, api_key, user.id)
+
+    async def post(group: list):
+        async with post_sem:
+            try:
+                await pace(lambda: quota.check_probe(user.id))
+                shared = [it for it in group if "id" in it]
+                source = None if shared else group[0]["source"]
+                # Long jobs re-check the load per post rather than trusting the level at admission
+                msg, poster_url, tmdb_url = await asyncio.to_thread(_build_get_post, user.id, shared, [], source, admission.degraded())
+                await _send_reply(update.message, user.id, msg, poster_url, tmdb_url)
+                stats["posts"] += 1
+            except Exception as e:
+                stats["post_failed"] += 1
+                tracing.fail(e)
+                await update.message.reply_text(f"⚠️ Post failed for <b>{html.escape(group[0]['raw_name'])}</b>\n\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
+        await progress()
+
+    async def flush(group: list):
+        # Keep the number of pending posts bounded so long lists don't queue everything in memory.
+        while len(post_tasks) >= BULK_POST_CONCURRENCY * 2:
+            done, _ = await asyncio.wait(post_tasks, return_when=asyncio.FIRST_COMPLETED)
+            post_tasks.difference_update(done)
+        task = asyncio.create_task(post(group))
+        post_tasks.add(task)
+
+    try:
+        tg_file = await document.get_file()
+        await tg_file.download_to_drive(path)
+
+        group: list = []
+        group_key = None
 
+        async def consume():
+            nonlocal group, group_key
+            url, task = window.popleft()
+            try:
+                item = await task
+            except Exception as e:
+                logger.warning(f"Bulk link {url} failed: {e}")
+                item = None
+            if not item:
+                stats["failed"] += 1
+                failed_links.append(url)
+            else:
+                stats["resolved"] += 1
+                key = _group_key(item["raw_name"]) if "id" in item else ("source", item["source"])
+                if group and (key != group_key or len(group) >= BULK_GROUP_MAX or "id" not in item):
+                    await flush(group)
+                    group = []
+                group.append(item)
+                group_key = key
+            await progress()
+
+        chat_id = update.effective_chat.id if update.effective_chat else None
+        for url in _iter_links(path):
+            stats["read"] += 1
+            await pace(lambda: quota.take_links(user.id, chat_id, 1, api_key))
+            window.append((url, asyncio.create_task(resolve(url))))
+            if len(window) >= BULK_WINDOW:
+                await consume()
+        while window:
+            await consume()
+        if group:
+            await flush(group)
+        if post_tasks:
+            await asyncio.wait(post_tasks)
+
+        if not stats["read"]:
+            await status_msg.edit_text("No valid links found in this file.")
+            return
+        await progress(force=True)
     except Exception as e:
-        try: await status_msg.delete()
+        tracing.fail(e)
+        await update.message.reply_text(f"⚠️ Bulk /get failed.\n\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
+    finally:
+        for t in [t for _, t in window] + list(post_tasks):
+            t.cancel()
+        _done(user.id, ticket)
+        try: os.remove(path)
         except Exception: pass
-        await update.message.reply_text(f"⚠️ Something went wrong.\n\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
 
 async def info_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
         track_user(update.effective_user.id)
     user = update.effective_user
-    if not is_chat_authorized(update):
+    if not is_chat_authorized(update, context):
         await update.message.reply_text("❌ Access denied.\nGroup: need /authorize\nPM: need /allow")
         return
     if not context.args:
@@ -286,32 +880,38 @@ async def info_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("No valid link found."); return
     url = urls[0]
 
+    ticket = await _admit(update, 1, uses_gdflix=False, degradable=False)
+    if not ticket:
+        return
+
     status_msg = await update.message.reply_text("Wait :- 50%\n▰▰▰▰▰▱▱▱▱▱")
     try:
-        size_bytes = get_remote_size(url)
+        with admission.probing(PROBE_LIMIT):
+            probe = await asyncio.to_thread(probe_url, url)
+        if probe:
+            quota.charge_probe(user.id, probe.get("downloaded", 0))
+        size_bytes = probe["size"] if probe else None
         size_str = human_readable_size(size_bytes) if size_bytes else "Unknown"
-        mi_text = get_text_from_url_or_path(url)
-        if not mi_text:
+        if not probe_has_audio_info(probe):
             try: await status_msg.delete()
             except Exception: pass
             await update.message.reply_text("Could not read media info from this link.")
             return
 
-        ucer_audio_fmt = UCER_SETTINGS.get(user.id, {}).get("audio_format", False)
-        parsed_mediainfo, org_aud_lang = parse_audio_block(mi_text, ucer_audio_fmt)
+        parsed_mediainfo, org_aud_lang = probe_audio_block(probe, usersettings.get(user.id).audio_format)
 
-        import urllib.parse, re
-        filename = None
-        m = re.search(r"Complete name\s*:\s*(.+)", mi_text)
-        if m:
-            filename = m.group(1).strip()
+        filename = probe.get("filename")
+        if not filename:
+            m = re.search(r"Complete name\s*:\s*(.+)", probe.get("text") or "")
+            if m:
+                filename = m.group(1).strip()
         if not filename:
             parsed = urllib.parse.urlparse(url)
             filename = urllib.parse.unquote(parsed.path.rsplit("/", 1)[-1]) or "Unknown"
 
         display_name = strip_extension(filename)
         base_title, file_year = extract_title_year_from_filename(filename)
-        tmdb_title, tmdb_year, tmdb_lang_code, poster_url, tmdb_url = strict_match(base_title, file_year)
+        tmdb_title, tmdb_year, tmdb_lang_code, poster_url, tmdb_url = await asyncio.to_thread(strict_match, base_title, file_year)
         final_title = tmdb_title or base_title or "Unknown"
         final_year = tmdb_year or file_year or "????"
 
@@ -324,22 +924,20 @@ async def info_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         try: await status_msg.delete()
         except Exception: pass
 
-        poster_bytes = download_bytes(poster_url) if poster_url else None
-        if poster_bytes:
-            bio = BytesIO(poster_bytes); bio.name = "poster.jpg"
-            await update.message.reply_photo(photo=bio, caption=msg, parse_mode=ParseMode.HTML)
-        else:
-            await update.message.reply_text(msg, parse_mode=ParseMode.HTML)
+        await _send_reply(update.message, user.id, msg, poster_url, tmdb_url)
     except Exception as e:
         try: await status_msg.delete()
         except Exception: pass
+        tracing.fail(e)
         await update.message.reply_text(f"⚠️ /info failed.\n\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
+    finally:
+        _done(user.id, ticket)
 
 async def ls_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
         track_user(update.effective_user.id)
     user = update.effective_user
-    if not is_chat_authorized(update):
+    if not is_chat_authorized(update, context):
         await update.message.reply_text("❌ Access denied.\nGroup: need /authorize\nPM: need /allow")
         return
     if not context.args:
@@ -354,6 +952,10 @@ async def ls_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Only Google Drive or workers links are supported for /ls.")
         return
 
+    ticket = await _admit(update, 1, uses_gdflix=is_gdrive_link(url) or bool(extract_drive_id_from_workers(url)))
+    if not ticket:
+        return
+
     status_msg = await update.message.reply_text("Wait :- 50%\n▰▰▰▰▰▱▱▱▱▱")
     try:
         drive_id, is_workers_path = None, False
@@ -371,7 +973,7 @@ async def ls_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         if drive_id:
-            gd_res = gdflix.share_file(drive_id, None)
+            gd_res = await asyncio.to_thread(gdflix.share_file, drive_id, None)
             if not gd_res:
                 try: await status_msg.delete()
                 except Exception: pass
@@ -381,29 +983,36 @@ async def ls_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             display_name = strip_extension(raw_name)
             size = gd_res.get("size") or 0
             gdlink = gdflix.file_link_from_response(gd_res, drive_id)
+            if ticket.degraded:
+                probe = None
+                admission.skipped_probe()
+            else:
+                with admission.probing(PROBE_LIMIT):
+                    probe = await asyncio.to_thread(probe_sources, workers_links_from_drive_id_for_user(user.id, drive_id))
         else:
+            # Workers path: name, size and mediainfo all come from one ranged GET (a HEAD when degraded)
             gdlink = url
-            import urllib.parse
-            raw_name = urllib.parse.unquote(urllib.parse.urlparse(url).path.rsplit("/", 1)[-1]) or "Unknown"
+            if ticket.degraded:
+                probe = None
+                admission.skipped_probe()
+                meta = await asyncio.to_thread(head_meta, url)
+            else:
+                with admission.probing(PROBE_LIMIT):
+                    probe = await asyncio.to_thread(probe_url, url)
+                meta = probe or {}
+            raw_name = meta.get("filename") or urllib.parse.unquote(urllib.parse.urlparse(url).path.rsplit("/", 1)[-1]) or "Unknown"
             display_name = strip_extension(raw_name)
-            from app.utils import get_remote_size
-            size = get_remote_size(url) or 0
+            size = meta.get("size") or 0
 
-        # mediainfo from workers
-        media_source_url = workers_link_from_drive_id_for_user(user.id, drive_id) if drive_id else url
-        mi_text = get_text_from_url_or_path(media_source_url)
-        parsed_mediainfo, org_aud_lang = ("", None)
-        if mi_text:
-            ucer_audio_fmt = UCER_SETTINGS.get(user.id, {}).get("audio_format", False)
-            parsed_mediainfo, org_aud_lang = parse_audio_block(mi_text, ucer_audio_fmt)
+        if probe:
+            quota.charge_probe(user.id, probe.get("downloaded", 0))
+        parsed_mediainfo, org_aud_lang = probe_audio_block(probe, usersettings.get(user.id).audio_format)
 
         base_title, file_year = extract_title_year_from_filename(raw_name)
-        tmdb_title, tmdb_year, tmdb_lang_code, poster_url_unused, tmdb_url = strict_match(base_title, file_year)
+        tmdb_title, tmdb_year, tmdb_lang_code, poster_url, tmdb_url = await asyncio.to_thread(strict_match, base_title, file_year)
         final_title = tmdb_title or base_title or "Unknown"
         final_year = tmdb_year or file_year or "????"
 
-        backdrop_url = backdrop_from_tmdb_url(tmdb_url) if tmdb_url else None
-
         header = f"<b>🎬 {html.escape(final_title)} - ({html.escape(final_year)})</b>"
         lines = [header, "", f"<b>{html.escape(display_name)} [{human_readable_size(size)}]</b>", f"<b>{html.escape(gdlink)}</b>", ""]
         if parsed_mediainfo:
@@ -413,17 +1022,167 @@ async def ls_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         try: await status_msg.delete()
         except Exception: pass
 
-        poster_bytes = download_bytes(backdrop_url) if backdrop_url else None
-        if poster_bytes:
-            bio = BytesIO(poster_bytes); bio.name = "backdrop.jpg"
-            await update.message.reply_photo(photo=bio, caption=msg, parse_mode=ParseMode.HTML)
+        if tmdb_url and _wants_album(user.id):
+            await _send_reply(update.message, user.id, msg, poster_url, tmdb_url)
         else:
-            await update.message.reply_text(msg, parse_mode=ParseMode.HTML)
+            backdrop = await asyncio.to_thread(backdrop_from_tmdb_url, tmdb_url) if tmdb_url else None
+            await _send_post(update.message, msg, backdrop)
 
     except Exception as e:
         try: await status_msg.delete()
         except Exception: pass
+        tracing.fail(e)
         await update.message.reply_text(f"⚠️ /ls failed.\n\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
+    finally:
+        _done(user.id, ticket)
+
+# ---- /search across the user's indexes ----
+
+SEARCH_PAGE = 8
+SEARCH_MAX_RESULTS = 64
+# search token -> {"user", "query", "results", "missed"}; buttons of an expired search ask for a new one
+SEARCHES = TTLCache(ttl=3600, max_entries=500)
+
+def _search_urls(user_id: int) -> list[str]:
+    """The search endpoint of each index, keeping its drive number: https://host/1:/Movies/ -> https://host/1:search."""
+    urls = []
+    for u in _get_user_indexes(user_id) or ([WORKERS_BASE] if WORKERS_BASE else []):
+        p = urllib.parse.urlparse(u.strip())
+        if p.scheme and p.netloc:
+            m = re.match(r"/(\d+):", p.path or "")
+            urls.append(f"{p.scheme}://{p.netloc}/{m.group(1) if m else 0}:search")
+    return list(dict.fromkeys(urls))
+
+def _search_page(token: str, found: dict, page: int) -> tuple[str, InlineKeyboardMarkup]:
+    results = found["results"]
+    pages = max(1, -(-len(results) // SEARCH_PAGE))
+    page = min(max(page, 0), pages - 1)
+    lines = [f"<b>🔎 {html.escape(found['query'])}</b> · {len(results)} result(s)", ""]
+    rows = []
+    for n, f in enumerate(results[page * SEARCH_PAGE:(page + 1) * SEARCH_PAGE], page * SEARCH_PAGE + 1):
+        size = human_readable_size(f["size"]) if f["size"] else "?"
+        where = f" · {len(f['indexes'])} indexes" if len(f["indexes"]) > 1 else ""
+        lines.append(f"<b>{n}.</b> {html.escape(f['name'])} <i>[{size}{where}]</i>")
+        rows.append([InlineKeyboardButton(f"📥 {n}. {f['name'][:48]}", callback_data=f"search:g:{token}:{n - 1}")])
+    if found["missed"]:
+        lines += ["", f"<i>⏱ {len(found['missed'])} index(es) didn't answer in time.</i>"]
+    if pages > 1:
+        rows.append([
+            InlineKeyboardButton("◀️", callback_data=f"search:p:{token}:{(page - 1) % pages}"),
+            InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="search:noop"),
+            InlineKeyboardButton("▶️", callback_data=f"search:p:{token}:{(page + 1) % pages}"),
+        ])
+    rows.append([InlineKeyboardButton("❌ Close", callback_data=f"search:close:{token}")])
+    return "\n".join(lines), InlineKeyboardMarkup(rows)
+
+async def search_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user:
+        track_user(update.effective_user.id)
+    user = update.effective_user
+    if not is_chat_authorized(update, context):
+        await update.message.reply_text("❌ Access denied.\nGroup: need /authorize\nPM: need /allow")
+        return
+    query = " ".join(context.args).strip()
+    if len(query) < 2:
+        await update.message.reply_text("Usage:\n/search <title> (searches all your /ucer indexes)")
+        return
+    urls = _search_urls(user.id)
+    if not urls:
+        await update.message.reply_text("No index configured. Add your index URLs in /ucer.")
+        return
+    status_msg = await update.message.reply_text(f"🔎 Searching {len(urls)} index(es)…")
+    try:
+        results, missed = await asyncio.to_thread(search_indexes, urls, query)
+    except Exception as e:
+        tracing.fail(e)
+        await status_msg.edit_text(f"⚠️ Search failed.\n\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
+        return
+    if not results:
+        note = f"\n{len(missed)} index(es) didn't answer in time." if missed else ""
+        await status_msg.edit_text(f"❌ Nothing found for <b>{html.escape(query)}</b>.{note}", parse_mode=ParseMode.HTML)
+        return
+    token = uuid.uuid4().hex[:10]
+    found = {"user": user.id, "query": query, "results": results[:SEARCH_MAX_RESULTS], "missed": missed}
+    SEARCHES.set(token, found)
+    text, kb = _search_page(token, found, 0)
+    await status_msg.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=kb, disable_web_page_preview=True)
+
+async def search_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    q = update.callback_query
+    parts = (q.data or "").split(":")
+    action = parts[1] if len(parts) > 1 else ""
+    if action == "noop":
+        await q.answer()
+        return
+    found = SEARCHES.get(parts[2]) if len(parts) > 2 else None
+    if found is None:
+        await q.answer("This search has expired, run /search again.", show_alert=True)
+        return
+    if found["user"] != update.effective_user.id:
+        await q.answer("Only the person who searched can use these buttons.", show_alert=True)
+        return
+    if action == "close":
+        await q.answer()
+        SEARCHES.pop(parts[2])
+        try: await q.message.delete()
+        except Exception: pass
+        return
+    if action == "p":
+        await q.answer()
+        text, kb = _search_page(parts[2], found, int(parts[3]))
+        try:
+            await q.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=kb, disable_web_page_preview=True)
+        except Exception:
+            pass
+        return
+    if action == "g":
+        idx = int(parts[3])
+        if idx >= len(found["results"]):
+            await q.answer()
+            return
+        await q.answer("⏳ Getting…")
+        if not await _get_precheck(update, context):
+            return
+        await _get_post(update, context, [f"https://drive.google.com/file/d/{found['results'][idx]['id']}/view"])
+
+async def dead_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Report a dead GDFlix link: drop its cached share and re-share the file."""
+    if update.effective_user:
+        track_user(update.effective_user.id)
+    user = update.effective_user
+    if not is_chat_authorized(update, context):
+        await update.message.reply_text("❌ Access denied.\nGroup: need /authorize\nPM: need /allow")
+        return
+    urls = [p for p in (update.message.text or "").split() if p.startswith("http")]
+    if not urls:
+        await update.message.reply_text("Usage:\n/dead <GDFlix link or Drive link>")
+        return
+    url = urls[0]
+    drive_ids = []
+    did = _drive_id_from_url(url)
+    if did:
+        drive_ids.append(did)
+        gdflix.invalidate(file_id=did)
+    else:
+        share_key = urllib.parse.urlparse(url).path.rstrip("/").rsplit("/", 1)[-1]
+        drive_ids = list(dict.fromkeys(k.split(":", 1)[0] for k, v in gdflix.SHARE_CACHE.items() if v.get("key") == share_key))
+        gdflix.invalidate(share_key=share_key)
+    if not drive_ids:
+        await update.message.reply_text("That link isn't in the cache; send the Drive link to re-share it.")
+        return
+    posts.forget_links(drive_ids)
+    ticket = await _admit(update, len(drive_ids), _gdflix_api_key(user.id))
+    if not ticket:
+        return
+    try:
+        lines = []
+        for did in drive_ids:
+            res = await asyncio.to_thread(gdflix.share_file, did, _gdflix_api_key(user.id), True)
+            link = gdflix.file_link_from_response(res, did) if res else "GDFlix did not return a link"
+            lines.append(f"<b>{html.escape(link)}</b>")
+        await update.message.reply_text("♻️ <b>Re-shared</b>\n\n" + "\n".join(lines), parse_mode=ParseMode.HTML)
+    finally:
+        _done(user.id, ticket)
 
 async def tmdb_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
@@ -437,14 +1196,13 @@ async def tmdb_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tmdb_year = "????"
     try:
         if raw.startswith("http") and "themoviedb.org" in raw:
-            import re, requests
             m = re.search(r"themoviedb\.org/(movie|tv)/(\d+)", raw)
             if not m:
                 await update.message.reply_text("Invalid TMDB URL."); return
             ctype, tmdb_id = m.group(1), m.group(2)
             api_url = f"https://api.themoviedb.org/3/{ctype}/{tmdb_id}"
             from app.config import TMDB_API_KEY
-            r = requests.get(api_url, params={"api_key": TMDB_API_KEY}, timeout=10)
+            r = await asyncio.to_thread(HTTP.get, api_url, params={"api_key": TMDB_API_KEY}, timeout=10)
             if r.status_code != 200:
                 await update.message.reply_text(f"TMDB error: HTTP {r.status_code}")
                 return
@@ -462,18 +1220,14 @@ async def tmdb_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 title = raw[:m.start()].strip()
             else:
                 year = "????"
-            t_title, t_year, t_lang, poster_url, tmdb_url = strict_match(title, year)
+            t_title, t_year, t_lang, poster_url, tmdb_url = await asyncio.to_thread(strict_match, title, year)
             tmdb_title = t_title or title or "Unknown"
             tmdb_year = t_year or year or "????"
 
         header = f"<b>🎬 {html.escape(tmdb_title)} - ({html.escape(tmdb_year)})</b>"
-        poster_bytes = download_bytes(poster_url) if poster_url else None
-        if poster_bytes:
-            bio = BytesIO(poster_bytes); bio.name = "poster.jpg"
-            await update.message.reply_photo(photo=bio, caption=header, parse_mode=ParseMode.HTML)
-        else:
-            await update.message.reply_text(header, parse_mode=ParseMode.HTML)
+        await _send_post(update.message, header, poster_url)
     except Exception as e:
+        tracing.fail(e)
         await update.message.reply_text(f"⚠️ TMDB lookup failed.\n\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
 
 async def manual_poster(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -500,4 +1254,18 @@ async def manual_poster(update: Update, context: ContextTypes.DEFAULT_TYPE):
     caption_to_send = "\n".join(lines)
     # UCER audio transform is already handled during generation
     photo = msg.photo[-1]
-    await msg.chat.send_photo(photo=photo.file_id, caption=caption_to_send, parse_mode=ParseMode.HTML)
\ No newline at end of file
+    sent = await msg.chat.send_photo(photo=photo.file_id, caption=caption_to_send, parse_mode=ParseMode.HTML)
+    if imagehost.configured():
+        context.application.create_task(_rehost_manual(sent, photo.file_id, caption_to_send))
+
+async def _rehost_manual(sent, file_id: str, caption: str):
+    """Upload a manual poster to the image host in the background and add its stable link to the caption."""
+    try:
+        tg_file = await sent.get_bot().get_file(file_id)
+        data = bytes(await tg_file.download_as_bytearray())
+        url = await asyncio.to_thread(imagehost.rehost_bytes, data)
+        line = f"\n\n<b>🖼 Poster:</b> {html.escape(url)}" if url else ""
+        if line and len(caption) + len(line) <= MANUAL_CAPTION_MAX:
+            await sent.edit_caption(caption=caption + line, parse_mode=ParseMode.HTML)
+    except Exception as e:
+        logger.warning(f"Manual poster re-hosting failed: {e}")
\ No newline at end of file
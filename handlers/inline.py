@@ -0,0 +1,97 @@
+import asyncio
+import html
+import re
+from uuid import uuid4
+
+from telegram import (
+    Update, InlineQueryResultPhoto, InlineQueryResultCachedPhoto, InlineQueryResultArticle, InputTextMessageContent,
+)
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from app import access, fileids
+from app.cache import TTLCache
+from app.services.tmdb import search_page, IMAGE_BASE
+from app.state import track_user
+
+DEBOUNCE = 0.35            # seconds of typing silence before a TMDB round trip
+MIN_QUERY = 2
+MAX_RESULTS = 20
+
+SEARCH_CACHE = TTLCache(ttl=6 * 3600, max_entries=2000)   # query -> {"items": [...], "complete": bool}
+_latest: dict = {}         # user_id -> latest inline query id
+
+def _norm(q: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", q.lower())).strip()
+
+def _matches(item: dict, tokens: list) -> bool:
+    title = _norm(item["title"])
+    words = title.split()
+    # every typed token must prefix some title word (last token may be half-typed)
+    return all(any(w.startswith(t) for w in words) for t in tokens)
+
+def _from_cache(q: str) -> list | None:
+    exact = SEARCH_CACHE.get(q)
+    if exact is not None:
+        return exact["items"]
+    tokens = q.split()
+    for cut in range(len(q) - 1, MIN_QUERY - 1, -1):
+        prefix = q[:cut].rstrip()
+        cached = SEARCH_CACHE.get(prefix, count=False)
+        if cached is None:
+            continue
+        # Only a prefix whose every TMDB match came back is a superset of a longer query; page 1 of a
+        # bigger result set holds whatever ranked first for the prefix, not for what is typed now.
+        if cached["complete"]:
+            return [it for it in cached["items"] if _matches(it, tokens)]
+        return None
+    return None
+
+def _result(item: dict):
+    caption = f"<b>🎬 {html.escape(item['title'])} - ({html.escape(item['year'])})</b>"
+    rid = f"{item['type']}:{item['id']}"
+    if item.get("poster_path"):
+        full = f"{IMAGE_BASE}/original{item['poster_path']}"
+        file_id = fileids.lookup(full)
+        if file_id:
+            return InlineQueryResultCachedPhoto(id=rid, photo_file_id=file_id, title=item["title"],
+                                                caption=caption, parse_mode=ParseMode.HTML)
+        return InlineQueryResultPhoto(
+            id=rid, photo_url=f"{IMAGE_BASE}/w780{item['poster_path']}",
+            thumbnail_url=f"{IMAGE_BASE}/w185{item['poster_path']}",
+            title=f"{item['title']} ({item['year']})", caption=caption, parse_mode=ParseMode.HTML,
+        )
+    return InlineQueryResultArticle(
+        id=rid, title=f"{item['title']} ({item['year']})", description=item["type"].upper(),
+        input_message_content=InputTextMessageContent(caption, parse_mode=ParseMode.HTML),
+    )
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    iq = update.inline_query
+    if not iq:
+        return
+    track_user(iq.from_user.id)
+    if not access.decision_for(update, context).allowed:
+        await iq.answer([], cache_time=60, is_personal=True)
+        return
+    q = _norm(iq.query or "")
+    if len(q) < MIN_QUERY:
+        await iq.answer([], cache_time=5)
+        return
+
+    results = _from_cache(q)
+    if results is None:
+        token = uuid4().hex
+        _latest[iq.from_user.id] = token
+        await asyncio.sleep(DEBOUNCE)
+        if _latest.get(iq.from_user.id) != token:
+            return  # superseded by a newer keystroke
+        _latest.pop(iq.from_user.id, None)
+        results, complete = await asyncio.to_thread(search_page, q, MAX_RESULTS)
+        SEARCH_CACHE.set(q, {"items": results, "complete": complete})
+
+    ranked = sorted(results, key=lambda it: it.get("popularity") or 0, reverse=True)[:MAX_RESULTS]
+    try:
+        await iq.answer([_result(it) for it in ranked], cache_time=300)
+    except Exception:
+        pass
@@ -1,27 +1,40 @@
+import asyncio
 import html
-import requests
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from io import BytesIO
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
-from app.config import TMDB_API_KEY
+from app import fileids
+from app.cache import TTLCache
+from app.services.tmdb import IMAGE_BASE, images, search_titles
 from app.state import track_user
+from app.utils import download_bytes
+
+# Gallery state lives entirely in the callback data, so buttons keep working across restarts:
+#   poster:v:<m|t>:<tmdb id>:<kind>:<lang>:<size>:<index>
+KINDS = {"p": ("posters", "🖼 Posters"), "b": ("backdrops", "🌄 Backdrops"), "l": ("logos", "🔤 Logos")}
+SIZES = {
+    "p": ("w342", "w780", "original"),
+    "b": ("w780", "w1280", "original"),
+    "l": ("w300", "w500", "original"),
+}
+DEFAULT_SIZE = 1
+MAX_LANGS = 6              # language filter cycles through the most common ones
+PREFETCH_AHEAD = 2
+
+_PREFETCHED = TTLCache(ttl=600, max_entries=32)   # image URL -> bytes not yet sent to Telegram
+_inflight: dict = {}                              # image URL -> asyncio.Task
 
 async def posters_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
         track_user(update.effective_user.id)
     query = " ".join(context.args).strip()
     if not query:
-        await update.message.reply_text("Usage:\n/posters movie name [year]")
+        await update.message.reply_text("Usage:\n/posters movie or series name [year]")
         return
     try:
-        url = "https://api.themoviedb.org/3/search/movie"
-        params = {"api_key": TMDB_API_KEY, "query": query, "page": 1, "include_adult": "false"}
-        r = requests.get(url, params=params, timeout=10)
-        if r.status_code != 200:
-            await update.message.reply_text(f"TMDB error: HTTP {r.status_code}")
-            return
-        data = r.json().get("results", [])[:5]
+        data = (await asyncio.to_thread(search_titles, query, 8))[:8]
     except Exception as e:
         await update.message.reply_text(f"❌ TMDB search failed:\n<code>{html.escape(str(e))}</code>", parse_mode=ParseMode.HTML)
         return
@@ -31,12 +44,151 @@ async def posters_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     buttons = []
     for m in data:
-        title = m.get("title") or m.get("name") or "Unknown"
-        year = (m.get("release_date") or "????")[:4]
-        mid = m.get("id")
-        if not mid: continue
-        buttons.append([InlineKeyboardButton(f"{title} ({year})", callback_data=f"poster:select:{mid}")])
+        icon = "📺" if m["type"] == "tv" else "🎬"
+        buttons.append([InlineKeyboardButton(f"{icon} {m['title']} ({m['year']})",
+                                             callback_data=f"poster:select:{m['type'][0]}:{m['id']}")])
     buttons.append([InlineKeyboardButton("❌ Close", callback_data="poster:close")])
-    await update.message.reply_text("Select a Movie 👇", reply_markup=InlineKeyboardMarkup(buttons))
+    await update.message.reply_text("Select a Title 👇", reply_markup=InlineKeyboardMarkup(buttons))
+
+def _languages(items: list) -> list:
+    counts = {}
+    for it in items:
+        lang = it["lang"] or "xx"
+        counts[lang] = counts.get(lang, 0) + 1
+    ranked = sorted(counts, key=lambda k: (k != "en", -counts[k]))[:MAX_LANGS]
+    return ["all"] + ranked
+
+def _filtered(imgs: dict, kind: str, lang: str) -> list:
+    items = imgs.get(KINDS[kind][0]) or []
+    if lang == "all":
+        return items
+    return [it for it in items if (it["lang"] or "xx") == lang]
+
+def _image_url(item: dict, kind: str, size: int) -> str:
+    return f"{IMAGE_BASE}/{SIZES[kind][size]}{item['path']}"
+
+def _gallery_kb(t: str, tmdb_id: str, kind: str, lang: str, size: int, idx: int, total: int, langs: list):
+    def cb(k=kind, lg=lang, sz=size, i=idx):
+        return f"poster:v:{t}:{tmdb_id}:{k}:{lg}:{sz}:{i}"
+    rows = []
+    if total > 1:
+        rows.append([
+            InlineKeyboardButton("◀️", callback_data=cb(i=(idx - 1) % total)),
+            InlineKeyboardButton(f"{idx + 1}/{total}", callback_data="poster:noop"),
+            InlineKeyboardButton("▶️", callback_data=cb(i=(idx + 1) % total)),
+        ])
+    rows.append([InlineKeyboardButton(("• " if k == kind else "") + label, callback_data=cb(k=k, lg="all", i=0))
+                 for k, (_, label) in KINDS.items()])
+    next_lang = langs[(langs.index(lang) + 1) % len(langs)] if lang in langs else "all"
+    next_size = (size + 1) % len(SIZES[kind])
+    rows.append([
+        InlineKeyboardButton(f"🌐 {lang}", callback_data=cb(lg=next_lang, i=0)),
+        InlineKeyboardButton(f"📐 {SIZES[kind][size]}", callback_data=cb(sz=next_size)),
+    ])
+    rows.append([InlineKeyboardButton("❌ Close", callback_data="poster:close")])
+    return InlineKeyboardMarkup(rows)
+
+def _fetch(url: str) -> bytes | None:
+    data = _PREFETCHED.pop(url)
+    return data if data is not None else download_bytes(url)
+
+async def _image_bytes(url: str) -> bytes | None:
+    task = _inflight.get(url)
+    if task is not None:
+        try:
+            await task
+        except Exception:
+            pass
+    return await asyncio.to_thread(_fetch, url)
+
+def _prefetch(urls: list):
+    """Download the next pages in the background while the user looks at this one."""
+    for url in urls:
+        if url in _inflight or fileids.lookup(url) or _PREFETCHED.get(url, count=False) is not None:
+            continue
+        async def run(u=url):
+            try:
+                data = await asyncio.to_thread(download_bytes, u)
+                if data:
+                    _PREFETCHED.set(u, data)
+            finally:
+                _inflight.pop(u, None)
+        _inflight[url] = asyncio.create_task(run())
+
+async def _media_for(url: str, caption: str):
+    """InputMediaPhoto by cached file_id when Telegram already has it, else freshly downloaded bytes."""
+    file_id = fileids.lookup(url)
+    if file_id:
+        return InputMediaPhoto(media=file_id, caption=caption, parse_mode=ParseMode.HTML), True
+    data = await _image_bytes(url)
+    if not data:
+        return None, False
+    bio = BytesIO(data); bio.name = "image.jpg"
+    return InputMediaPhoto(media=bio, caption=caption, parse_mode=ParseMode.HTML), False
+
+async def _show(q, t: str, tmdb_id: str, kind: str, lang: str, size: int, idx: int, fresh: bool):
+    ctype = "tv" if t == "t" else "movie"
+    imgs = await asyncio.to_thread(images, ctype, tmdb_id)
+    if not imgs:
+        await q.answer("TMDB images unavailable", show_alert=True); return
+    items = _filtered(imgs, kind, lang)
+    if not items:
+        await q.answer(f"No {KINDS[kind][0]} for {lang}", show_alert=True); return
+    idx %= len(items)
+    size = min(size, len(SIZES[kind]) - 1)
+    item = items[idx]
+    url = _image_url(item, kind, size)
+    caption = (f"<b>{KINDS[kind][1]}</b> {idx + 1}/{len(items)}\n"
+               f"🌐 {item['lang'] or 'no text'} · {item['w']}×{item['h']} · ⭐ {item['votes']:.1f}\n"
+               f"<a href=\"{IMAGE_BASE}/original{item['path']}\">Original</a>")
+    kb = _gallery_kb(t, tmdb_id, kind, lang, size, idx, len(items), _languages(imgs.get(KINDS[kind][0]) or []))
+
+    media, by_ref = await _media_for(url, caption)
+    if media is None:
+        await q.answer("Could not fetch image", show_alert=True); return
+    try:
+        if fresh:
+            sent = await q.message.reply_photo(photo=media.media, caption=caption, parse_mode=ParseMode.HTML, reply_markup=kb)
+            try: await q.message.delete()
+            except Exception: pass
+        else:
+            sent = await q.message.edit_media(media=media, reply_markup=kb)
+    except Exception:
+        if not by_ref:
+            raise
+        fileids.FILE_IDS.pop(url)  # stale file_id: retry once with the bytes
+        await _show(q, t, tmdb_id, kind, lang, size, idx, fresh)
+        return
+    await q.answer()
+    if not by_ref and hasattr(sent, "photo"):
+        fileids.remember(url, sent)
+    _prefetch([_image_url(items[(idx + k) % len(items)], kind, size) for k in range(1, PREFETCH_AHEAD + 1)
+               if len(items) > k])
 
-# You can port your full UI flow here if needed. For brevity, only the search/select page provided.
\ No newline at end of file
+async def posters_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    q = update.callback_query
+    track_user(q.from_user.id)
+    parts = q.data.split(":")
+    action = parts[1] if len(parts) > 1 else ""
+
+    if action == "close":
+        await q.answer()
+        try: await q.message.delete()
+        except Exception: pass
+        return
+    if action == "noop":
+        await q.answer(); return
+
+    try:
+        if action == "select" and len(parts) == 4:
+            await _show(q, parts[2], parts[3], "p", "all", DEFAULT_SIZE, 0, fresh=True)
+        elif action == "v" and len(parts) == 8:
+            t, tmdb_id, kind, lang, size, idx = parts[2:8]
+            if kind not in KINDS:
+                await q.answer(); return
+            await _show(q, t, tmdb_id, kind, lang, int(size), int(idx), fresh=False)
+        else:
+            await q.answer()
+    except Exception as e:
+        try: await q.answer(f"Failed: {str(e)[:150]}", show_alert=True)
+        except Exception: pass
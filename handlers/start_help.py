@@ -41,12 +41,18 @@ async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "<b>🟢 BASIC COMMANDS</b>\n"
         "<b>/start</b> – Show welcome message\n"
         "<b>/help</b> – Show this help menu\n"
-        "<b>/authorize</b> – (Owner only) Authorize this group\n\n"
+        "<b>/authorize</b> [7d] [all|allowed|admins] – (Owner/admins) Authorize this group\n"
+        "<b>/allow</b> id [7d] [user|admin] – Grant access, optionally time-limited\n\n"
         "<b>🎬 GOOGLE DRIVE / DIRECT LINKS</b>\n"
         "<b>/get</b> – GDrive → GDFlix link + TMDB + MediaInfo\n"
+        "<b>/get</b> (reply to .txt) – Bulk mode for long link lists\n"
         "<b>/info</b> – Direct link → TMDB + Audio Info\n"
         "<b>/ls</b> – GDrive/Workers → GDFlix + TMDB + Audio Info\n"
-        "<b>/tmdb</b> – TMDB title/year/poster\n\n"
+        "<b>/search</b> title – Search all your /ucer indexes, tap a result to /get it\n"
+        "<b>/tmdb</b> – TMDB title/year/poster\n"
+        "<b>/posters</b> – Browse TMDB posters, backdrops and logos\n"
+        "<b>/dead</b> – Report a dead GDFlix link and re-share it\n"
+        "<b>@bot title</b> – Inline TMDB poster search in any chat\n\n"
         "<b>📺 STREAMING POSTERS</b>\n"
         "<b>/amzn /airtel /zee5 /hulu /viki /mmax /snxt /aha /dsnp /apple /bms /iq /hbo /up /uj /wetv /sl /tk /nf</b>\n\n"
         "<b>🖼 MANUAL POSTER MODE</b>\n"
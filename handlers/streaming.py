@@ -1,15 +1,19 @@
+import asyncio
 import html
+import logging
 import re
 import urllib.parse
-import requests
 from io import BytesIO
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from app.config import NETFLIX_API
+from app.services import imagehost
 from app.state import track_user
-from app.utils import download_bytes
+from app.utils import HTTP, download_bytes
+
+logger = logging.getLogger(__name__)
 
 STREAM_APIS = {
     "netflix.com": "https://nf.rickgrimesapi.workers.dev/?url={encoded}",
@@ -31,6 +35,21 @@ STREAM_APIS = {
     "tentkotta": "https://tentkotta.rickheroko.workers.dev/?url={encoded}",
 }
 
+async def _rehost_later(message, render, urls: list):
+    """Upload the scraped images to the image host, then point the reply at the hosted copies."""
+    urls = [u for u in dict.fromkeys(urls) if u and not imagehost.hosted(u)]
+    if not urls or not imagehost.configured():
+        return
+    try:
+        hosted = await asyncio.gather(*(asyncio.to_thread(imagehost.rehost_url, u) for u in urls))
+        if any(hosted):
+            await message.edit_text(render(), parse_mode=ParseMode.HTML, disable_web_page_preview=False)
+    except Exception as e:
+        logger.warning(f"Poster re-hosting failed: {e}")
+
+def _stable(url: str | None) -> str | None:
+    return imagehost.hosted(url) or url
+
 async def generic_stream(update: Update, context: ContextTypes.DEFAULT_TYPE, label_landscape: str, label_portrait: str, base_api: str):
     track_user(update.effective_user.id)
     url = " ".join(context.args)
@@ -41,7 +60,7 @@ async def generic_stream(update: Update, context: ContextTypes.DEFAULT_TYPE, lab
     api = base_api.format(encoded=encoded)
     msg = await update.message.reply_text("🔍 Fetching...")
     try:
-        r = requests.get(api, timeout=30)
+        r = HTTP.get(api, timeout=30)
         r.raise_for_status()
         data = r.json()
     except Exception as e:
@@ -53,13 +72,15 @@ async def generic_stream(update: Update, context: ContextTypes.DEFAULT_TYPE, lab
     portrait = data.get("poster") or data.get("portrait") or data.get("vertical") or data.get("image")
     landscape = data.get("landscape") or data.get("backdrop") or data.get("horizontal") or data.get("cover")
 
-    text = (
-        f"<b>{label_landscape} {html.escape(landscape or 'Not Found')}</b>\n\n"
-        f"<b>{label_portrait} {html.escape(portrait or 'Not Found')}</b>\n\n"
-        f"<b>{html.escape(title)}{(' - (' + str(year) + ')') if year else ''}</b>\n\n"
-        "<b><blockquote>Powered By: <a href='https://t.me/ott_posters_club'>Ott Posters Club 🎞️</a></blockquote></b>"
-    )
-    await msg.edit_text(text, parse_mode=ParseMode.HTML, disable_web_page_preview=False)
+    def render():
+        return (
+            f"<b>{label_landscape} {html.escape(_stable(landscape) or 'Not Found')}</b>\n\n"
+            f"<b>{label_portrait} {html.escape(_stable(portrait) or 'Not Found')}</b>\n\n"
+            f"<b>{html.escape(title)}{(' - (' + str(year) + ')') if year else ''}</b>\n\n"
+            "<b><blockquote>Powered By: <a href='https://t.me/ott_posters_club'>Ott Posters Club 🎞️</a></blockquote></b>"
+        )
+    await msg.edit_text(render(), parse_mode=ParseMode.HTML, disable_web_page_preview=False)
+    context.application.create_task(_rehost_later(msg, render, [landscape, portrait]))
 
 # Individual command wrappers
 async def amzn(update, context):  await generic_stream(update, context, "AMZN Poster:", "Portrait:", STREAM_APIS["primevideo.com"])
@@ -100,7 +121,7 @@ async def nf(update: Update, context: ContextTypes.DEFAULT_TYPE):
     api_url = f"{NETFLIX_API}{movie_id}"
     status_msg = await update.message.reply_text("🔍 Fetching Netflix data…")
     try:
-        r = requests.get(api_url, timeout=30); r.raise_for_status()
+        r = HTTP.get(api_url, timeout=30); r.raise_for_status()
         data = r.json()
     except Exception as e:
         try: await status_msg.delete()
@@ -114,10 +135,12 @@ async def nf(update: Update, context: ContextTypes.DEFAULT_TYPE):
     year = data.get("year") or data.get("releaseYear") or ""
 
     esc = lambda v: html.escape(v) if v else "Not Found"
-    text = (
-        f"<b>Netflix Poster:</b> <b>{esc(landscape)}</b>\n\n"
-        f"<b>Portrait:</b> <b><a href='{esc(portrait)}'>Click</a></b>\n\n"
-        f"<b>{esc(title)}{(' (' + esc(str(year)) + ')') if year else ''}</b>\n\n"
-        "<b><blockquote>Powered By: <a href='https://t.me/ott_posters_club'>Ott Posters Club 🎞️</a></blockquote></b>"
-    )
-    await update.message.reply_text(text, parse_mode=ParseMode.HTML, disable_web_page_preview=False)
\ No newline at end of file
+    def render():
+        return (
+            f"<b>Netflix Poster:</b> <b>{esc(_stable(landscape))}</b>\n\n"
+            f"<b>Portrait:</b> <b><a href='{esc(_stable(portrait))}'>Click</a></b>\n\n"
+            f"<b>{esc(title)}{(' (' + esc(str(year)) + ')') if year else ''}</b>\n\n"
+            "<b><blockquote>Powered By: <a href='https://t.me/ott_posters_club'>Ott Posters Club 🎞️</a></blockquote></b>"
+        )
+    sent = await update.message.reply_text(render(), parse_mode=ParseMode.HTML, disable_web_page_preview=False)
+    context.application.create_task(_rehost_later(sent, render, [landscape, portrait]))
\ No newline at end of file
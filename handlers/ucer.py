@@ -3,7 +3,8 @@ from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from app.keyboards import ucer_main_kb, ucer_sub_kb
-from app.state import UCER_SETTINGS, save_state, track_user
+from app import usersettings
+from app.state import save_state, track_user
 from app.utils import ensure_line_bold
 
 def _sanitize_index_url(u: str) -> str | None:
@@ -29,11 +30,10 @@ def _sanitize_index_url(u: str) -> str | None:
         return None
 
 def _get_indexes(user_id: int):
-    cfg = UCER_SETTINGS.setdefault(user_id, {"gdflix": None, "indexes": [], "full_name": False, "audio_format": False})
-    if "indexes" not in cfg: cfg["indexes"] = []
-    idxs = (cfg.get("indexes") or [])[:6]
-    cfg["indexes"] = idxs
-    return idxs
+    return list(usersettings.get(user_id).indexes)
+
+def _main_kb(cfg: usersettings.UcerSettings):
+    return ucer_main_kb(cfg.full_name, cfg.audio_format, len(cfg.indexes), cfg.album)
 
 def is_waiting(ctx: ContextTypes.DEFAULT_TYPE) -> bool:
     return "waiting_ucer" in ctx.user_data
@@ -42,19 +42,17 @@ async def ucer_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user:
         track_user(update.effective_user.id)
     user = update.effective_user
-    cfg = UCER_SETTINGS.setdefault(user.id, {"gdflix": None, "indexes": [], "full_name": False, "audio_format": False})
-    idx_count = len(cfg.get("indexes") or [])
     await update.message.reply_text(
         "<b>⚙️ UCER SETTINGS</b>",
         parse_mode=ParseMode.HTML,
-        reply_markup=ucer_main_kb(cfg.get("full_name", False), cfg.get("audio_format", False), idx_count)
+        reply_markup=_main_kb(usersettings.get(user.id))
     )
 
 async def ucer_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
     user_id = q.from_user.id
-    cfg = UCER_SETTINGS.setdefault(user_id, {"gdflix": None, "indexes": [], "full_name": False, "audio_format": False})
+    cfg = usersettings.get(user_id)
     action = q.data.split(":")[1]
 
     if action == "close":
@@ -63,26 +61,27 @@ async def ucer_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if action == "back":
-        idx_count = len(cfg.get("indexes") or [])
-        await q.message.edit_text("<b>⚙️ UCER SETTINGS</b>", parse_mode=ParseMode.HTML,
-                                  reply_markup=ucer_main_kb(cfg.get("full_name", False), cfg.get("audio_format", False), idx_count))
+        await q.message.edit_text("<b>⚙️ UCER SETTINGS</b>", parse_mode=ParseMode.HTML, reply_markup=_main_kb(cfg))
         return
 
     if action == "fullname":
-        cfg["full_name"] = not cfg.get("full_name", False); save_state()
-        idx_count = len(cfg.get("indexes") or [])
-        await q.message.edit_reply_markup(reply_markup=ucer_main_kb(cfg.get("full_name", False), cfg.get("audio_format", False), idx_count))
+        cfg = usersettings.update(user_id, full_name=not cfg.full_name); save_state()
+        await q.message.edit_reply_markup(reply_markup=_main_kb(cfg))
         return
 
     if action == "audiofmt":
-        cfg["audio_format"] = not cfg.get("audio_format", False); save_state()
-        idx_count = len(cfg.get("indexes") or [])
-        await q.message.edit_reply_markup(reply_markup=ucer_main_kb(cfg.get("full_name", False), cfg.get("audio_format", False), idx_count))
+        cfg = usersettings.update(user_id, audio_format=not cfg.audio_format); save_state()
+        await q.message.edit_reply_markup(reply_markup=_main_kb(cfg))
+        return
+
+    if action == "album":
+        cfg = usersettings.update(user_id, album=not cfg.album); save_state()
+        await q.message.edit_reply_markup(reply_markup=_main_kb(cfg))
         return
 
     if action == "gdflix":
         context.user_data["ucer_edit"] = "gdflix"
-        current = cfg.get("gdflix") or "Not Set"
+        current = cfg.gdflix or "Not Set"
         await q.message.edit_text(f"<b>GDFLIX SETTINGS</b>\n\n<b>Current:</b>\n<code>{current}</code>", parse_mode=ParseMode.HTML, reply_markup=ucer_sub_kb())
         return
 
@@ -119,10 +118,10 @@ async def ucer_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     field = context.user_data.pop("waiting_ucer")
     raw_value = (update.message.text or "").strip()
-    cfg = UCER_SETTINGS.setdefault(user_id, {"gdflix": None, "indexes": [], "full_name": False, "audio_format": False})
+    cfg = usersettings.get(user_id)
 
     if field == "gdflix":
-        cfg["gdflix"] = raw_value; save_state()
+        usersettings.update(user_id, gdflix=raw_value or None); save_state()
         msg = await update.message.reply_text("<b>✅ GDFLIX Saved</b>", parse_mode=ParseMode.HTML)
     elif field == "indexes_add":
         candidates = []
@@ -140,11 +139,11 @@ async def ucer_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             msg = await update.message.reply_text("<b>❌ No valid index URLs found.</b>", parse_mode=ParseMode.HTML)
         else:
             merged = []
-            for u in (cfg.get("indexes") or []) + cleaned:
+            for u in list(cfg.indexes) + cleaned:
                 if u not in merged:
                     merged.append(u)
-            cfg["indexes"] = merged[:6]; save_state()
-            current = "Not Set" if not cfg["indexes"] else "\n".join(f"{i+1}. {x}" for i, x in enumerate(cfg["indexes"]))
+            cfg = usersettings.update(user_id, indexes=merged); save_state()
+            current = "Not Set" if not cfg.indexes else "\n".join(f"{i+1}. {x}" for i, x in enumerate(cfg.indexes))
             msg = await update.message.reply_text("<b>✅ Index URLs Saved</b>\n\n<b>Current:</b>\n<code>{}</code>".format(html.escape(current)), parse_mode=ParseMode.HTML)
     else:
         msg = await update.message.reply_text("<b>❌ Unknown UCER field.</b>", parse_mode=ParseMode.HTML)
@@ -11,13 +11,52 @@ def admin_panel_kb(gdflix_on: bool):
     return InlineKeyboardMarkup([
         [InlineKeyboardButton(f"🎞 GDFlix Mode: {status}", callback_data="admin:gdflix")],
         [InlineKeyboardButton("👥 Bot Users", callback_data="admin:users")],
-        [InlineKeyboardButton("🔑 UCER Stats", callback_data="admin:ucer")],
+        [
+            InlineKeyboardButton("🔑 UCER Stats", callback_data="admin:ucer"),
+            InlineKeyboardButton("🗄 Indexes", callback_data="admin:indexes"),
+        ],
+        [
+            InlineKeyboardButton("📮 Send Queue", callback_data="admin:queue"),
+            InlineKeyboardButton("📊 Usage", callback_data="admin:usage"),
+        ],
+        [
+            InlineKeyboardButton("🗂 GDFlix Cache", callback_data="admin:gdcache"),
+            InlineKeyboardButton("🗝 GDFlix Keys", callback_data="admin:gdkeys"),
+        ],
+        [InlineKeyboardButton("🖼 Posts & Images", callback_data="admin:posts")],
+        [
+            InlineKeyboardButton("🚦 Load", callback_data="admin:load"),
+            InlineKeyboardButton("🔬 Profiling", callback_data="admin:prof"),
+        ],
         [InlineKeyboardButton("❌ Close", callback_data="admin:close")],
     ])
 
-def ucer_main_kb(full_on: bool, audio_on: bool, idx_count: int):
+def admin_load_kb(limits: dict):
+    def row(name: str, label: str, step: int):
+        return [
+            InlineKeyboardButton("➖", callback_data=f"admin:load:{name}:-{step}"),
+            InlineKeyboardButton(f"{label}: {limits[name] or 'off'}", callback_data="admin:load"),
+            InlineKeyboardButton("➕", callback_data=f"admin:load:{name}:{step}"),
+        ]
+    return InlineKeyboardMarkup([
+        row("soft_jobs", "Soft jobs", 1),
+        row("hard_jobs", "Hard jobs", 2),
+        row("soft_mb", "Soft MB", 50),
+        row("hard_mb", "Hard MB", 100),
+        [InlineKeyboardButton("🔄 Refresh", callback_data="admin:load"), InlineKeyboardButton("⬅ Back", callback_data="admin:back")],
+    ])
+
+def admin_profile_kb():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"🔥 CPU {s}s", callback_data=f"admin:prof:cpu:{s}") for s in (10, 30, 60)],
+        [InlineKeyboardButton(f"🧠 Memory {s}s", callback_data=f"admin:prof:mem:{s}") for s in (10, 30, 60)],
+        [InlineKeyboardButton("⬅ Back", callback_data="admin:back")],
+    ])
+
+def ucer_main_kb(full_on: bool, audio_on: bool, idx_count: int, album_on: bool = False):
     fullname_status = "🟢 ON" if full_on else "🔴 OFF"
     audio_status = "🟢 ON" if audio_on else "🔴 OFF"
+    album_status = "🟢 ON" if album_on else "🔴 OFF"
     return InlineKeyboardMarkup([
         [
             InlineKeyboardButton("🔑 GdFlix API", callback_data="ucer:gdflix"),
@@ -27,6 +66,7 @@ def ucer_main_kb(full_on: bool, audio_on: bool, idx_count: int):
             InlineKeyboardButton(f"📄 Full File Name: {fullname_status}", callback_data="ucer:fullname"),
             InlineKeyboardButton(f"🔈 Audio Format: {audio_status}", callback_data="ucer:audiofmt"),
         ],
+        [InlineKeyboardButton(f"🖼 Album Reply (Poster + Backdrop): {album_status}", callback_data="ucer:album")],
         [InlineKeyboardButton("❌ Close", callback_data="ucer:close")]
     ])
 
@@ -0,0 +1,735 @@
+"""Replay/load harness: drives the real Application and handlers with recorded or synthetic updates.
+
+    python -m app.loadtest --rate 5 --duration 60 --users 50
+    python -m app.loadtest --replay updates.jsonl --speed 2
+    python -m app.loadtest --rate 10 --count 500 --mix get=6,info=2,tmdb=2 --json report.json
+
+The Bot API is stubbed in-process; every outbound HTTP call goes to local stand-ins for GDFlix
+/share, TMDB search/details/images, the OTT poster workers and a workers index that serves
+synthetic media (Range-capable, with TTFB and bandwidth limits). Runs in a scratch directory so
+state, caches and traces never touch the real ones. Replay files are JSONL Update objects as
+returned by getUpdates, optionally with an "_at" offset in seconds.
+"""
+import argparse
+import asyncio
+import contextvars
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# app.config reads the environment at import time, so app modules are imported only after _configure_env()
+
+BOT_TOKEN = "100000001:LOADTEST"
+OWNER = 1
+FIRST_USER = 10_000_001
+INDEX_HOST = "index.loadtest"
+
+LATENCY_MS = {"telegram": 60, "gdflix": 350, "tmdb": 180, "image": 120, "index": 250, "ott": 700}
+DEFAULT_MIX = "get=6,ls=2,info=2,tmdb=2,search=1,posters=1,nf=1,amzn=1"
+STALL_MS = 20                   # event-loop lag above this counts as a stall
+WATCH_INTERVAL = 0.01
+
+# ---- synthetic media ----
+
+_WORDS = ("Shadow", "River", "Kingdom", "Last", "Night", "Iron", "Silent", "Storm", "Golden", "Hunter",
+          "Broken", "Empire", "Lost", "City", "Fire", "Dragon", "Echo", "Wild", "Secret", "Road")
+
+def _bits(fields) -> bytes:
+    s = "".join(format(v, f"0{n}b") for n, v in fields)
+    s += "0" * (-len(s) % 8)
+    return bytes(int(s[i:i + 8], 2) for i in range(0, len(s), 8))
+
+def _eac3_frame(atmos: bool) -> bytes:
+    # 640 kb/s 5.1 independent substream; addbsi carries the JOC (Atmos) flag
+    hdr = b"\x0b\x77" + _bits([(2, 0), (3, 0), (11, 1279), (2, 0), (2, 3), (3, 7), (1, 1), (5, 16), (5, 27),
+                               (1, 0), (1, 0), (1, 0), (1, 1), (6, 1), (7, 0), (1, int(atmos)), (8, 16)])
+    return hdr + b"\0" * (2560 - len(hdr))
+
+def _el(eid: int, payload: bytes) -> bytes:
+    return eid.to_bytes((eid.bit_length() + 7) // 8, "big") + b"\x01" + len(payload).to_bytes(7, "big") + payload
+
+def _uint_el(eid: int, v: int) -> bytes:
+    return _el(eid, v.to_bytes(max(1, (v.bit_length() + 7) // 8), "big"))
+
+def _str_el(eid: int, v: str) -> bytes:
+    return _el(eid, v.encode())
+
+def _mkv_header(atmos: bool, second_lang: str) -> bytes:
+    tracks = _el(0x1654AE6B,
+                 _el(0xAE, _uint_el(0xD7, 1) + _uint_el(0x83, 1) + _str_el(0x86, "V_MPEG4/ISO/AVC"))
+                 + _el(0xAE, _uint_el(0xD7, 2) + _uint_el(0x73C5, 2) + _uint_el(0x83, 2) + _str_el(0x86, "A_EAC3")
+                       + _str_el(0x22B59C, "hin") + _el(0xE1, _uint_el(0x9F, 6)))
+                 + _el(0xAE, _uint_el(0xD7, 3) + _uint_el(0x73C5, 3) + _uint_el(0x83, 2) + _str_el(0x86, "A_AAC")
+                       + _str_el(0x22B59C, second_lang) + _el(0xE1, _uint_el(0x9F, 2))))
+    block = _el(0xA3, bytes([0x82]) + b"\0\0\x80" + _eac3_frame(atmos))
+    cluster = _el(0x1F43B675, _uint_el(0xE7, 0) + _el(0xA3, bytes([0x81]) + b"\0\0\x80" + b"\0" * 4096) + block)
+    ebml = _el(0x1A45DFA3, _str_el(0x4282, "matroska"))
+    return ebml + b"\x18\x53\x80\x67\x01\xff\xff\xff\xff\xff\xff\xff" + tracks + cluster   # Segment of unknown size
+
+@dataclass(slots=True)
+class MediaFile:
+    id: str
+    name: str
+    title: str
+    year: str
+    size: int
+    header: bytes
+
+def build_catalog(n: int, opaque_ratio: float, seed: int) -> List[MediaFile]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        words = rnd.sample(_WORDS, rnd.choice((1, 2, 3)))
+        title, year = " ".join(words), str(rnd.randint(1995, 2025))
+        opaque = rnd.random() < opaque_ratio
+        name = f"{title.replace(' ', '.')}.{year}.1080p.WEB-DL.DDP5.1.H.264-LT.{'ts' if opaque else 'mkv'}"
+        # Opaque files defeat the container fast path and exercise the download + mediainfo fallback
+        header = b"\x47\x40\x00\x10" + b"\xff" * 184 if opaque else _mkv_header(rnd.random() < 0.4, rnd.choice(("eng", "tam", "tel")))
+        fid = "1" + hashlib.sha1(f"{seed}:{i}".encode()).hexdigest()[:32]
+        out.append(MediaFile(fid, name, title, year, rnd.randint(700, 4000) * 1024 * 1024, header))
+    return out
+
+# ---- upstream stand-ins ----
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+class StandIns:
+    """GDFlix, TMDB, OTT workers and a workers index on one local port, routed by the original host."""
+
+    def __init__(self, catalog: List[MediaFile], latency_ms: Dict[str, float], index_mbps: float):
+        self.by_id = {f.id: f for f in catalog}
+        self.by_name = {f.name: f for f in catalog}
+        self.latency_ms = latency_ms
+        self.index_bps = index_mbps * 1_000_000 / 8
+        self.calls: Counter = Counter()
+        self.bytes_served = [0]
+        self.lock = threading.Lock()
+        self.image = b"\xff\xd8\xff\xe0" + random.Random(7).randbytes(60_000) + b"\xff\xd9"
+        self.server = _Server(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="loadtest-standins", daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def delay(self, service: str):
+        ms = self.latency_ms.get(service, 0)
+        if ms > 0:
+            # Mostly around the mean with an occasional slow answer
+            time.sleep(ms / 1000 * (random.uniform(0.5, 1.5) if random.random() > 0.02 else random.uniform(3, 6)))
+
+    def count(self, service: str, nbytes: int = 0):
+        with self.lock:
+            self.calls[service] += 1
+            self.bytes_served[0] += nbytes
+
+    def _handler(self):
+        standins = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                url = urllib.parse.urlsplit(self.path)
+                if "/0:" in url.path:
+                    return self._media(url.path, {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()})
+                self._send(200, b"", "text/plain")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if urllib.parse.urlsplit(self.path).path.endswith(":search"):
+                    standins.delay("index")
+                    standins.count("index")
+                    try:
+                        terms = str(json.loads(body or b"{}").get("q") or "").lower().split()
+                    except ValueError:
+                        terms = []
+                    files = [{"id": f.id, "name": f.name, "size": str(f.size), "mimeType": "video/x-matroska"}
+                             for f in standins.by_id.values() if terms and all(t in f.name.lower() for t in terms)]
+                    return self._json({"nextPageToken": None, "curPageIndex": 0, "data": {"files": files[:50]}})
+                self._json({"error": "not emulated"}, 404)
+
+            def do_GET(self):
+                host = self.headers.get("X-Upstream-Host", "")
+                url = urllib.parse.urlsplit(self.path)
+                qs = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+                try:
+                    if "/0:" in url.path:
+                        self._media(url.path, qs)
+                    elif host == "image.tmdb.org":
+                        standins.delay("image")
+                        standins.count("image", len(standins.image))
+                        self._send(200, standins.image, "image/jpeg")
+                    elif host == "api.themoviedb.org":
+                        standins.delay("tmdb")
+                        standins.count("tmdb")
+                        self._tmdb(url.path, qs)
+                    elif url.path.endswith("/share") and "id" in qs:
+                        standins.delay("gdflix")
+                        standins.count("gdflix")
+                        self._gdflix(qs["id"])
+                    elif "url" in qs or host.startswith("nf."):
+                        standins.delay("ott")
+                        standins.count("ott")
+                        self._json({"title": "Load Test Title", "year": 2024,
+                                    "poster": "https://image.tmdb.org/t/p/original/ott-portrait.jpg",
+                                    "landscape": "https://image.tmdb.org/t/p/original/ott-landscape.jpg"})
+                    else:
+                        standins.count("unrouted")
+                        self._json({"error": "unknown upstream"}, 404)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send(self, status: int, body: bytes, ctype: str, headers: Optional[dict] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def _json(self, data, status: int = 200):
+                self._send(status, json.dumps(data).encode(), "application/json")
+
+            def _gdflix(self, fid: str):
+                f = standins.by_id.get(fid)
+                if not f:
+                    return self._json({"error": True, "message": "File not found"})
+                self._json({"key": hashlib.sha1(fid.encode()).hexdigest()[:12], "name": f.name, "size": f.size})
+
+            def _tmdb(self, path: str, qs: dict):
+                m = re.match(r"/3/search/(movie|tv|multi)$", path)
+                if m:
+                    query = qs.get("query", "")
+                    year = qs.get("year") or qs.get("first_air_date_year") or "2021"
+                    results = [] if m.group(1) == "tv" else [_tmdb_item(query, year, "movie")]
+                    return self._json({"page": 1, "results": results, "total_results": len(results)})
+                m = re.match(r"/3/(movie|tv)/(\d+)(/images)?$", path)
+                if not m:
+                    return self._json({"status_message": "not emulated"}, 404)
+                ctype, tid = m.group(1), int(m.group(2))
+                if m.group(3):
+                    def imgs(kind, n, w, h):
+                        return [{"file_path": f"/lt{tid}{kind}{i}.jpg", "iso_639_1": ("en", "hi", None)[i % 3],
+                                 "width": w, "height": h, "vote_average": 5.0 - i / 10} for i in range(n)]
+                    return self._json({"id": tid, "posters": imgs("p", 12, 2000, 3000),
+                                       "backdrops": imgs("b", 8, 3840, 2160), "logos": imgs("l", 3, 1200, 400)})
+                self._json(_tmdb_item(f"Title {tid}", "2021", ctype, tid))
+
+            def _media(self, path: str, qs: dict):
+                f = standins.by_id.get(qs.get("id", "")) or standins.by_name.get(urllib.parse.unquote(path.rsplit("/", 1)[-1]))
+                standins.delay("index")
+                if not f:
+                    standins.count("index")
+                    return self._json({"error": "not found"}, 404)
+                start, end = 0, f.size - 1
+                m = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if m:
+                    start = int(m.group(1))
+                    end = min(int(m.group(2) or end), end)
+                self.send_response(206 if m else 200)
+                self.send_header("Content-Type", "video/x-matroska")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Disposition", f'attachment; filename="{f.name}"')
+                self.send_header("Content-Length", str(end - start + 1))
+                if m:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{f.size}")
+                self.end_headers()
+                if self.command == "HEAD":
+                    standins.count("index")
+                    return
+                sent, pos = 0, start
+                try:
+                    while pos <= end:
+                        n = min(64 * 1024, end - pos + 1)
+                        chunk = f.header[pos:pos + n] if pos < len(f.header) else b""
+                        chunk += bytes(n - len(chunk))
+                        self.wfile.write(chunk)
+                        sent += n
+                        pos += n
+                        if standins.index_bps:
+                            time.sleep(n / standins.index_bps)
+                finally:
+                    standins.count("index", sent)
+
+        return Handler
+
+def _tmdb_item(title: str, year: str, ctype: str, tid: int | None = None) -> dict:
+    tid = tid or zlib.crc32(title.lower().encode()) % 900_000 + 1000
+    item = {"id": tid, "original_language": "hi", "poster_path": f"/lt{tid}.jpg", "backdrop_path": f"/lt{tid}b.jpg",
+            "popularity": 12.5, "media_type": ctype, "overview": ""}
+    if ctype == "tv":
+        item.update(name=title, first_air_date=f"{year}-01-01")
+    else:
+        item.update(title=title, release_date=f"{year}-01-01")
+    return item
+
+def _redirect_adapter(target: str):
+    from requests.adapters import HTTPAdapter
+
+    class Redirect(HTTPAdapter):
+        """Sends every request to the stand-ins, keeping the original host in a header for routing."""
+
+        def send(self, request, **kwargs):
+            p = urllib.parse.urlsplit(request.url)
+            request.headers["X-Upstream-Host"] = p.netloc
+            request.url = target + (p.path or "/") + (f"?{p.query}" if p.query else "")
+            return super().send(request, **kwargs)
+
+    return Redirect(pool_connections=32, pool_maxsize=64)
+
+# ---- stubbed Bot API ----
+
+# The update whose handling (or one of its follow-up tasks) is making the current Bot API call
+_measured: contextvars.ContextVar = contextvars.ContextVar("loadtest_update", default=None)
+
+def _stub_request_class():
+    from telegram.request import BaseRequest
+
+    class StubBotRequest(BaseRequest):
+        """Answers Bot API calls in-process with plausible results after a simulated round trip."""
+
+        def __init__(self, latency_ms: float, calls: Counter, links_txt: bytes, on_call=None):
+            self.latency_ms = latency_ms
+            self.calls = calls
+            self.links_txt = links_txt
+            self.on_call = on_call
+            self._ids = itertools.count(1_000_000)
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                             connect_timeout=None, pool_timeout=None) -> Tuple[int, bytes]:
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000 * random.uniform(0.5, 1.5))
+            if self.on_call and _measured.get() is not None:
+                self.on_call(_measured.get())
+            if "/file/bot" in url:
+                self.calls["file download"] += 1
+                return 200, self.links_txt
+            name = url.rsplit("/", 1)[-1]
+            self.calls[name] += 1
+            params = request_data.parameters if request_data else {}
+            return 200, json.dumps({"ok": True, "result": self._result(name, params)}).encode()
+
+        def _message(self, params: dict, **extra) -> dict:
+            chat_id = params.get("chat_id", 0)
+            chat_id = int(chat_id) if str(chat_id).lstrip("-").isdigit() else -1
+            n = next(self._ids)
+            return {"message_id": n, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup", "title": "load"},
+                    "from": {"id": 999, "is_bot": True, "first_name": "LoadBot"}, **extra}
+
+        def _photo(self) -> list:
+            n = next(self._ids)
+            return [{"file_id": f"ph{n}", "file_unique_id": f"u{n}", "width": 500, "height": 750}]
+
+        def _result(self, name: str, params: dict):
+            if name == "getMe":
+                return {"id": 999, "is_bot": True, "first_name": "LoadBot", "username": "loadtest_bot",
+                        "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": True}
+            if name == "getFile":
+                return {"file_id": params.get("file_id", "f"), "file_unique_id": "fu", "file_size": len(self.links_txt),
+                        "file_path": "documents/links.txt"}
+            if name.startswith("edit") and params.get("inline_message_id"):
+                return True
+            if name in ("sendMessage", "editMessageText"):
+                return self._message(params, text=params.get("text", ""))
+            if name in ("sendPhoto", "editMessageMedia", "editMessageCaption"):
+                return self._message(params, photo=self._photo(), caption=params.get("caption", ""))
+            if name == "sendDocument":
+                n = next(self._ids)
+                return self._message(params, document={"file_id": f"doc{n}", "file_unique_id": f"d{n}"})
+            if name == "sendMediaGroup":
+                return [self._message(params, photo=self._photo()) for _ in params.get("media") or [None]]
+            if name == "copyMessage":
+                return {"message_id": next(self._ids)}
+            if name == "copyMessages":
+                return [{"message_id": next(self._ids)} for _ in params.get("message_ids") or ()]
+            if name.startswith(("send", "forward", "edit")):
+                return self._message(params)
+            return True
+
+    return StubBotRequest
+
+# ---- workload ----
+
+def _command_text(cmd: str, rnd: random.Random, catalog: List[MediaFile]) -> str:
+    f = rnd.choice(catalog)
+    drive = lambda m: f"https://drive.google.com/file/d/{m.id}/view"
+    if cmd == "get":
+        return "/get " + " ".join(drive(m) for m in rnd.sample(catalog, rnd.choice((1, 1, 1, 2, 3))))
+    if cmd == "ls":
+        return f"/ls {drive(f)}" if rnd.random() < 0.5 else f"/ls https://{INDEX_HOST}/0:/Movies/{urllib.parse.quote(f.name)}"
+    if cmd == "info":
+        return f"/info https://{INDEX_HOST}/0:/Movies/{urllib.parse.quote(f.name)}"
+    if cmd == "tmdb":
+        return f"/tmdb {f.title} {f.year}"
+    if cmd == "posters" or cmd == "search":
+        return f"/{cmd} {f.title}"
+    if cmd == "nf":
+        return f"/nf https://www.netflix.com/title/{80_000_000 + rnd.randint(0, 99_999)}"
+    return f"/{cmd} https://www.example.com/title/{rnd.randint(1, 99_999)}"
+
+def _message_update(update_id: int, user_id: int, text: str) -> dict:
+    cmd_len = len(text.split()[0]) if text.startswith("/") else 0
+    msg = {"message_id": update_id, "date": int(time.time()),
+           "chat": {"id": user_id, "type": "private", "first_name": "Load"},
+           "from": {"id": user_id, "is_bot": False, "first_name": "Load"}, "text": text}
+    if cmd_len:
+        msg["entities"] = [{"type": "bot_command", "offset": 0, "length": cmd_len}]
+    return {"update_id": update_id, "message": msg}
+
+def synthetic_arrivals(args, catalog: List[MediaFile]) -> List[Tuple[float, dict]]:
+    rnd = random.Random(args.seed)
+    mix = [(k.strip(), float(v)) for k, v in (p.split("=") for p in args.mix.split(",") if "=" in p)]
+    cmds, weights = zip(*mix)
+    out, t = [], 0.0
+    for i in itertools.count(1):
+        t += rnd.expovariate(args.rate)         # Poisson arrivals at the offered rate
+        if (args.count and i > args.count) or (not args.count and t > args.duration):
+            break
+        cmd = rnd.choices(cmds, weights)[0]
+        out.append((t, _message_update(i, FIRST_USER + rnd.randrange(args.users), _command_text(cmd, rnd, catalog))))
+    return out
+
+def replay_arrivals(args) -> List[Tuple[float, dict]]:
+    rows = []
+    with open(args.replay, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                rows.append(json.loads(line))
+    rnd = random.Random(args.seed)
+    out, t = [], 0.0
+    first_date = next((_update_date(r) for r in rows if _update_date(r)), 0)
+    for i, data in enumerate(rows, 1):
+        if args.rate:
+            t += rnd.expovariate(args.rate)
+        elif "_at" in data:
+            t = float(data["_at"]) / args.speed
+        elif _update_date(data):
+            t = (_update_date(data) - first_date) / args.speed
+        data = {k: v for k, v in data.items() if k != "_at"}
+        data["update_id"] = i                   # renumbered so repeated captures don't collide
+        out.append((t, data))
+    return sorted(out, key=lambda x: x[0])
+
+def _update_date(data: dict) -> int:
+    msg = data.get("message") or data.get("edited_message") or (data.get("callback_query") or {}).get("message") or {}
+    return int(msg.get("date") or 0)
+
+def _update_kind(data: dict) -> str:
+    msg = data.get("message") or data.get("edited_message")
+    if msg:
+        text = msg.get("text") or msg.get("caption") or ""
+        if text.startswith("/"):
+            return text.split()[0].split("@")[0]
+        return "document" if msg.get("document") else "photo" if msg.get("photo") else "message"
+    if data.get("callback_query"):
+        return "cb:" + (data["callback_query"].get("data") or "").split(":", 1)[0]
+    return "inline" if data.get("inline_query") else "other"
+
+def _actors(arrivals) -> Tuple[set, set]:
+    users, groups = set(), set()
+    for _, data in arrivals:
+        for key in ("message", "edited_message", "callback_query", "inline_query"):
+            obj = data.get(key) or {}
+            if (obj.get("from") or {}).get("id"):
+                users.add(obj["from"]["id"])
+            chat = obj.get("chat") or (obj.get("message") or {}).get("chat") or {}
+            if chat.get("type") in ("group", "supergroup"):
+                groups.add(chat["id"])
+    return users, groups
+
+# ---- run + report ----
+
+class Run:
+    """Latency runs from submission to the update's last Bot API call, counted once the update and every
+    task it started (non-blocking handlers, late fills) are done."""
+
+    def __init__(self):
+        self.sent: Dict[int, Tuple[float, str]] = {}
+        self.last_call: Dict[int, float] = {}
+        self.pending: Counter = Counter()
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.lags: List[float] = []
+        self.done = 0
+        self.started = time.perf_counter()
+        self.finished_at = None
+
+    def submit(self, update_id: int, kind: str):
+        self.sent[update_id] = (time.perf_counter(), kind)
+
+    def touch(self, update_id: int):
+        self.last_call[update_id] = time.perf_counter()
+
+    def hold(self, update_id: int):
+        self.pending[update_id] += 1
+
+    def release(self, update_id: int):
+        self.pending[update_id] -= 1
+        if self.pending[update_id] <= 0:
+            del self.pending[update_id]
+            self.complete(update_id)
+
+    def complete(self, update_id: int):
+        entry = self.sent.get(update_id)
+        ended = self.last_call.pop(update_id, None) or time.perf_counter()
+        if entry:
+            self.latency[entry[1]].append((ended - entry[0]) * 1000)
+            self.done += 1
+
+    def kind_of(self, update_id: int) -> str:
+        return self.sent.get(update_id, (0, "other"))[1]
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, max(0, int(round(q / 100 * len(s) + 0.5)) - 1))]
+
+async def _watch_loop(run: Run):
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(WATCH_INTERVAL)
+        run.lags.append(max(0.0, loop.time() - t0 - WATCH_INTERVAL) * 1000)
+
+def report(run: Run, offered_s: float, tg_calls: Counter, standins: StandIns) -> dict:
+    from app import admission
+    elapsed = (run.finished_at or time.perf_counter()) - run.started
+    rows = {}
+    everything = []
+    for kind, vals in sorted(run.latency.items()):
+        everything += vals
+        rows[kind] = _stats_row(vals, run.errors[kind])
+    rows["all"] = _stats_row(everything, sum(run.errors.values()))
+    stalls = [lag for lag in run.lags if lag > STALL_MS]
+    return {
+        "updates": len(run.sent), "completed": run.done, "timed_out": len(run.sent) - run.done,
+        "elapsed_s": round(elapsed, 2),
+        "offered_per_s": round(len(run.sent) / offered_s, 2) if offered_s else None,
+        "throughput_per_s": round(run.done / elapsed, 2) if elapsed else None,
+        "latency_ms": rows,
+        "event_loop": {
+            "stalled_ms": round(sum(stalls), 1), "stalled_pct": round(sum(stalls) / (elapsed * 10), 2) if elapsed else 0,
+            "max_lag_ms": round(max(run.lags, default=0), 1), "p99_lag_ms": round(_pct(run.lags, 99), 1),
+            "stalls_over_100ms": sum(1 for lag in run.lags if lag > 100),
+        },
+        "admission": {k: admission.STATS[k] for k in ("admitted", "degraded", "rejected", "probes_skipped")},
+        "bot_api_calls": dict(tg_calls.most_common()),
+        "upstream_calls": dict(standins.calls.most_common()),
+        "upstream_mb": round(standins.bytes_served[0] / 1048576, 1),
+    }
+
+def _stats_row(vals: List[float], errors: int) -> dict:
+    return {"n": len(vals), "errors": errors, "p50": round(_pct(vals, 50)), "p95": round(_pct(vals, 95)),
+            "p99": round(_pct(vals, 99)), "max": round(max(vals, default=0))}
+
+def render(rep: dict) -> str:
+    lines = [
+        f"{rep['updates']} updates, {rep['completed']} completed, {rep['timed_out']} unfinished in {rep['elapsed_s']}s "
+        f"(offered {rep['offered_per_s']}/s, throughput {rep['throughput_per_s']}/s)",
+        "",
+        f"{'command':<14}{'n':>6}{'err':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}",
+    ]
+    for kind, r in rep["latency_ms"].items():
+        lines.append(f"{kind:<14}{r['n']:>6}{r['errors']:>6}{r['p50']:>9}{r['p95']:>9}{r['p99']:>9}{r['max']:>9}")
+    ev, adm = rep["event_loop"], rep["admission"]
+    lines += [
+        "",
+        f"Event loop: stalled {ev['stalled_ms']:.0f} ms ({ev['stalled_pct']}% of wall time, lag > {STALL_MS} ms), "
+        f"max lag {ev['max_lag_ms']:.0f} ms, p99 lag {ev['p99_lag_ms']:.0f} ms, {ev['stalls_over_100ms']} stalls > 100 ms",
+        f"Admission: {adm['admitted']} admitted ({adm['degraded']} degraded), {adm['rejected']} shed, "
+        f"{adm['probes_skipped']} probes skipped",
+        "Bot API: " + ", ".join(f"{k} {v}" for k, v in rep["bot_api_calls"].items()),
+        "Upstream: " + ", ".join(f"{k} {v}" for k, v in rep["upstream_calls"].items()) + f" ({rep['upstream_mb']} MB served)",
+    ]
+    return "\n".join(lines)
+
+# ---- wiring ----
+
+def _configure_env(args):
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN, "OWNER_ID": str(OWNER),
+        "GDFLIX_API_KEY": "loadtest", "GDFLIX_API_BASE": "https://gdflix.loadtest/v2",
+        "GDFLIX_FILE_BASE": "https://gdflix.loadtest/file", "WORKERS_BASE": f"https://{INDEX_HOST}",
+        "TMDB_API_KEY": "loadtest", "TMDB_INDEX_PATH": "", "NETFLIX_API": "https://nf.loadtest/?id=",
+        "FREEIMAGE_API_KEY": "", "STATE_REMOTE_URL": "",
+    })
+    if not args.quotas:
+        for name in ("QUOTA_USER_LINKS_PER_MIN", "QUOTA_CHAT_LINKS_PER_MIN", "QUOTA_KEY_LINKS_PER_MIN",
+                     "QUOTA_USER_PROBE_MB_PER_HOUR", "QUOTA_USER_CONCURRENT_JOBS"):
+            os.environ[name] = "0"
+    if args.no_admission:
+        for name in ("ADMISSION_SOFT_JOBS", "ADMISSION_HARD_JOBS", "ADMISSION_SOFT_INFLIGHT_MB", "ADMISSION_HARD_INFLIGHT_MB"):
+            os.environ[name] = "0"
+
+async def run_load(args, arrivals: List[Tuple[float, dict]], catalog: List[MediaFile], standins: StandIns) -> dict:
+    from telegram import Update
+    from telegram.ext import ApplicationBuilder
+    from app import access, tracing
+    from app.main import build_app
+    from app.utils import HTTP
+
+    adapter = _redirect_adapter(standins.url)
+    HTTP.mount("http://", adapter)
+    HTTP.mount("https://", adapter)
+
+    run = Run()
+
+    class MeasuredApplication(tracing.TracedApplication):
+        async def process_update(self, update: object) -> None:
+            if not isinstance(update, Update):
+                return await super().process_update(update)
+            token = _measured.set(update.update_id)
+            run.hold(update.update_id)
+            try:
+                await super().process_update(update)
+            finally:
+                _measured.reset(token)
+                run.release(update.update_id)
+
+        def create_task(self, coroutine, update: object = None, *, name: str | None = None):
+            update_id = _measured.get()
+            if update_id is None:
+                return super().create_task(coroutine, update, name=name)
+            run.hold(update_id)
+            return super().create_task(_measured_task(update_id, coroutine), update, name=name)
+
+    async def _measured_task(update_id: int, coroutine):
+        try:
+            return await coroutine
+        finally:
+            run.release(update_id)
+
+    async def on_error(update: object, context):
+        kind = run.kind_of(update.update_id) if isinstance(update, Update) else "other"
+        run.errors[kind] += 1
+        logger.debug(f"Handler error for {kind}: {context.error!r}")
+
+    tg_calls: Counter = Counter()
+    links = "\n".join(f"https://drive.google.com/file/d/{f.id}/view" for f in catalog[:20]).encode()
+    builder = ApplicationBuilder().token(BOT_TOKEN).request(_stub_request_class()(args.tg_latency, tg_calls, links, run.touch)).updater(None)
+    if args.concurrent_updates:
+        builder = builder.concurrent_updates(args.concurrent_updates)
+    app = build_app(builder, MeasuredApplication)
+    app.add_error_handler(on_error)
+
+    users, groups = _actors(arrivals)
+    for uid in users:
+        access.grant_user(uid)
+    for gid in groups:
+        access.authorize_chat(gid)
+
+    await app.initialize()
+    await app.start()
+    watcher = asyncio.create_task(_watch_loop(run))
+    run.started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    t0 = loop.time()
+    for at, data in arrivals:
+        delay = t0 + at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        update = Update.de_json(data, app.bot)
+        run.submit(update.update_id, _update_kind(data))
+        await app.update_queue.put(update)
+    offered_s = max(loop.time() - t0, 1e-9)
+
+    deadline = loop.time() + args.drain
+    while run.done < len(run.sent) and loop.time() < deadline:
+        await asyncio.sleep(0.1)
+    run.finished_at = time.perf_counter()
+    watcher.cancel()
+    await app.stop()
+    await app.shutdown()
+    return report(run, offered_s, tg_calls, standins)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay or synthesize updates against the bot with local upstream stand-ins")
+    ap.add_argument("--replay", help="JSONL of recorded Update objects (optional \"_at\" seconds offset)")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay time compression")
+    ap.add_argument("--rate", type=float, default=0.0, help="offered updates/s (Poisson); overrides recorded timing")
+    ap.add_argument("--duration", type=float, default=60.0, help="synthetic run length in seconds")
+    ap.add_argument("--count", type=int, default=0, help="synthetic update count (instead of --duration)")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="synthetic command weights, e.g. get=6,tmdb=2")
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--files", type=int, default=200, help="sample media files served by the index stand-in")
+    ap.add_argument("--opaque", type=float, default=0.1, help="share of files the container parser can't read")
+    ap.add_argument("--latency", default="", help="override stand-in latency in ms, e.g. gdflix=800,tmdb=100")
+    ap.add_argument("--tg-latency", type=float, default=LATENCY_MS["telegram"], help="Bot API round trip in ms")
+    ap.add_argument("--index-mbps", type=float, default=200.0, help="index bandwidth per connection (0 = unthrottled)")
+    ap.add_argument("--concurrent-updates", type=int, default=0, help="as ApplicationBuilder.concurrent_updates (0 = bot default)")
+    ap.add_argument("--quotas", action="store_true", help="keep per-user quotas on (off by default)")
+    ap.add_argument("--no-admission", action="store_true", help="disable admission thresholds")
+    ap.add_argument("--drain", type=float, default=120.0, help="seconds to wait for in-flight updates after the last arrival")
+    ap.add_argument("--workdir", help="scratch directory for state/caches/traces (default: a new temp dir)")
+    ap.add_argument("--json", help="also write the report as JSON here")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args(argv)
+    if not args.replay and not args.rate:
+        ap.error("synthetic runs need --rate")
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                        level=logging.INFO if args.verbose else logging.WARNING)
+
+    json_out = os.path.abspath(args.json) if args.json else None
+    if args.replay:
+        args.replay = os.path.abspath(args.replay)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bot-loadtest-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    _configure_env(args)
+
+    latency = dict(LATENCY_MS)
+    for part in filter(None, args.latency.split(",")):
+        k, v = part.split("=")
+        latency[k.strip()] = float(v)
+    catalog = build_catalog(args.files, args.opaque, args.seed)
+    arrivals = replay_arrivals(args) if args.replay else synthetic_arrivals(args, catalog)
+    standins = StandIns(catalog, latency, args.index_mbps)
+    standins.start()
+    print(f"{len(arrivals)} updates, stand-ins on {standins.url}, workdir {workdir}", file=sys.stderr)
+    try:
+        rep = asyncio.run(run_load(args, arrivals, catalog, standins))
+    finally:
+        standins.stop()
+    print(render(rep))
+    if json_out:
+        with open(json_out, "w", encoding="utf-8") as fh:
+            json.dump(rep, fh, indent=2)
+
+if __name__ == "__main__":
+    main()
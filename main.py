@@ -1,13 +1,32 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import itertools
 import logging
 import os
 
+from telegram import Update
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, ChatMemberHandler, filters
+    Application, ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, ChatMemberHandler,
+    InlineQueryHandler, TypeHandler, filters,
 )
 
-from app.config import TELEGRAM_BOT_TOKEN
-from app.handlers import start_help, core, streaming, ucer, admin, posters_ui
-from app.state import load_state
+from app.config import TELEGRAM_BOT_TOKEN, GDFLIX_API_BASE, WORKERS_BASE
+from app import access, admission, tracing, usersettings
+from app.ratelimit import LIMITER
+from app.handlers import start_help, core, streaming, ucer, admin, posters_ui, inline
+from app.state import load_local_state, start_state_reconcile
+from app.utils import prewarm
+
+IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
+logger = logging.getLogger(__name__)
+
+UPSTREAM_HOSTS = [
+    "https://api.themoviedb.org/",
+    "https://image.tmdb.org/",
+    GDFLIX_API_BASE,
+    WORKERS_BASE,
+]
 
 def setup_logging():
     logging.basicConfig(
@@ -15,20 +34,22 @@ def setup_logging():
         level=logging.INFO,
     )
 
-def main():
-    setup_logging()
-    load_state()
+async def _post_init(app: Application):
+    logger.info(f"Startup ready in {(time.perf_counter() - _IMPORT_STARTED) * 1000:.0f} ms (imports {IMPORT_MS:.0f} ms)")
 
-    if not TELEGRAM_BOT_TOKEN:
-        print("Set TELEGRAM_BOT_TOKEN in environment first!")
-        return
+def build_app(builder: ApplicationBuilder, app_class: type = tracing.TracedApplication) -> Application:
+    """The bot with every handler registered; the load harness builds it with a stubbed Bot API."""
+    app = builder.application_class(app_class).rate_limiter(LIMITER).post_init(_post_init).build()
+    admission.watch(app.update_queue)
 
-    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    # Access decision is evaluated once per update, before any handler group runs
+    app.add_handler(TypeHandler(Update, access.gate), group=-1)
 
     # Basic
     app.add_handler(CommandHandler("start", start_help.start, block=True))
     app.add_handler(CommandHandler("help", start_help.help_cmd, block=True))
     app.add_handler(CommandHandler("authorize", core.authorize, block=True))
+    app.add_handler(CommandHandler("unauthorize", core.unauthorize, block=True))
 
     # Access control
     app.add_handler(CommandHandler("allow", core.allow_user, block=True))
@@ -39,7 +60,11 @@ def main():
     app.add_handler(CommandHandler("info", core.info_cmd, block=True))
     app.add_handler(CommandHandler("ls", core.ls_cmd, block=True))
     app.add_handler(CommandHandler("tmdb", core.tmdb_cmd, block=True))
+    app.add_handler(CommandHandler("dead", core.dead_cmd, block=True))
+    app.add_handler(CommandHandler("search", core.search_cmd, block=True))
+    app.add_handler(CallbackQueryHandler(core.search_cb, pattern="^search:"))
     app.add_handler(MessageHandler(filters.PHOTO, core.manual_poster))
+    app.add_handler(MessageHandler(filters.Document.FileExtension("txt"), core.get_document))
 
     # UCER
     app.add_handler(CommandHandler("ucer", ucer.ucer_cmd, block=True))
@@ -49,6 +74,7 @@ def main():
     # Admin
     app.add_handler(CommandHandler("admin", admin.admin_cmd, block=True))
     app.add_handler(CallbackQueryHandler(admin.admin_cb, pattern="^admin:"))
+    app.add_handler(CommandHandler("traces", admin.traces_cmd, block=True))
 
     # Streaming posters
     app.add_handler(CommandHandler("amzn", streaming.amzn, block=True))
@@ -73,6 +99,27 @@ def main():
 
     # Posters UI (TMDB)
     app.add_handler(CommandHandler("posters", posters_ui.posters_command, block=True))
+    app.add_handler(CallbackQueryHandler(posters_ui.posters_cb, pattern="^poster:"))
+
+    # Inline TMDB search (@bot title) - non-blocking so debounce sleeps don't stall other updates
+    app.add_handler(InlineQueryHandler(inline.inline_query, block=False))
+    return app
+
+def main():
+    setup_logging()
+    started = time.perf_counter()
+    # Serve from the local snapshot right away; the remote copy is reconciled in the background.
+    load_local_state()
+    start_state_reconcile()
+    user_index_hosts = [cfg.indexes[0] for _, cfg in itertools.islice(usersettings.iter_settings(), 200) if cfg.indexes]
+    prewarm(UPSTREAM_HOSTS + user_index_hosts[:20])
+    logger.info(f"Imports took {IMPORT_MS:.0f} ms, local state {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    if not TELEGRAM_BOT_TOKEN:
+        print("Set TELEGRAM_BOT_TOKEN in environment first!")
+        return
+
+    app = build_app(ApplicationBuilder().token(TELEGRAM_BOT_TOKEN))
 
     print("Bot running...")
     app.run_polling()
@@ -0,0 +1,43 @@
+import hashlib
+from typing import Iterable, Optional
+
+from app.cache import TTLCache
+
+# Finished /get posts, so a link set posted again in the same chat is answered without touching any upstream.
+# Keyed by chat, render options and links, not by user: anyone whose settings render the same post can reuse it,
+# and a settings change moves a user to another options digest rather than needing an eviction.
+POST_CACHE_TTL = 24 * 3600
+POSTS = TTLCache(POST_CACHE_TTL, max_entries=5000, path="post_cache.json", flush_delay=30.0)
+
+def render_options(api_key: Optional[str], cfg) -> str:
+    """Everything in a user's settings that changes the rendered post (the GDFlix key only as a digest)."""
+    raw = "|".join([api_key or "", ",".join(cfg.indexes), str(cfg.full_name), str(cfg.audio_format), str(cfg.album)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+def key(chat_id: int, links: Iterable[str], options: str) -> str:
+    return f"{chat_id}:{options}:{','.join(sorted(set(links)))}"
+
+def lookup(k: str) -> Optional[dict]:
+    return POSTS.get(k)
+
+def remember(k: str, caption: str, messages: list):
+    """Record the sent post: its message IDs for copy_message and its photos' file_ids for a resend."""
+    messages = [m for m in messages if m]
+    if not messages:
+        return
+    photos = [m.photo[-1].file_id for m in messages if m.photo]
+    POSTS.set(k, {"ids": [m.message_id for m in messages], "caption": caption, "photos": photos})
+
+def forget(k: str):
+    POSTS.pop(k)
+
+def forget_links(links: Iterable[str]) -> int:
+    """A link went dead: drop every post that carries it."""
+    dead = set(links)
+    stale = [k for k, _ in POSTS.items() if dead.intersection(k.split(":", 2)[2].split(","))]
+    for k in stale:
+        POSTS.pop(k)
+    return len(stale)
+
+def stats() -> dict:
+    return POSTS.stats()
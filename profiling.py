@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Tuple
+
+# Nothing here runs until an owner asks for a profile: no hooks, no tracemalloc, no sampler thread.
+
+SAMPLE_INTERVAL = 0.005     # 200 Hz
+MAX_SECONDS = 300
+TOP_N = 40
+MEM_FRAMES = 25
+
+_busy = threading.Lock()
+
+class ProfilerBusy(Exception):
+    pass
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _stack(frame) -> list:
+    out = []
+    while frame is not None:
+        out.append(_label(frame.f_code))
+        frame = frame.f_back
+    out.reverse()
+    return out
+
+def _clamp(seconds: float) -> float:
+    return max(1.0, min(float(seconds), MAX_SECONDS))
+
+def profile_cpu(seconds: float) -> Tuple[str, str]:
+    """Blocking: sample every thread's stack for `seconds`. Returns (report text, folded stacks)."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        seconds = _clamp(seconds)
+        me = threading.get_ident()
+        names = {}
+        folded: Counter = Counter()
+        self_hits: Counter = Counter()
+        total_hits: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in frames.items():
+                if tid == me:
+                    continue
+                stack = _stack(frame)
+                if not stack:
+                    continue
+                folded[";".join([names.get(tid, str(tid))] + stack)] += 1
+                self_hits[stack[-1]] += 1
+                for fn in set(stack):
+                    total_hits[fn] += 1
+            samples += 1
+            time.sleep(SAMPLE_INTERVAL)
+        elapsed = time.perf_counter() - started
+    finally:
+        _busy.release()
+
+    thread_samples = sum(self_hits.values()) or 1
+    lines = [
+        f"CPU sampling profile: {elapsed:.1f}s, {samples} sweeps, {thread_samples} thread samples",
+        "Idle threads (selectors, queue waits, sleeps) show up too; look past them.",
+        "",
+        f"Top {TOP_N} by self samples:",
+    ]
+    lines += [f"{n:8d} {n / thread_samples * 100:6.2f}%  {fn}" for fn, n in self_hits.most_common(TOP_N)]
+    lines += ["", f"Top {TOP_N} by inclusive samples:"]
+    lines += [f"{n:8d} {n / thread_samples * 100:6.2f}%  {fn}" for fn, n in total_hits.most_common(TOP_N)]
+    folded_text = "\n".join(f"{k} {v}" for k, v in folded.most_common()) + "\n"
+    return "\n".join(lines) + "\n", folded_text
+
+def profile_memory(seconds: float) -> Tuple[str, str]:
+    """Blocking: trace allocations for `seconds`. Returns (report of growth by site, folded stacks weighted by bytes)."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        seconds = _clamp(seconds)
+        if not was_tracing:
+            tracemalloc.start(MEM_FRAMES)
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+        _busy.release()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    before, after = before.filter_traces(filters), after.filter_traces(filters)
+    by_line = after.compare_to(before, "lineno")
+    lines = [
+        f"Memory trace: {seconds:.0f}s, traced now {current / 1048576:.1f} MB, peak {peak / 1048576:.1f} MB",
+        "",
+        f"Top {TOP_N} allocation sites by growth:",
+    ]
+    lines += [str(stat) for stat in by_line[:TOP_N]]
+    lines += ["", f"Top {TOP_N} sites by size still allocated from this window:"]
+    lines += [str(stat) for stat in after.statistics("lineno")[:TOP_N]]
+
+    folded: Counter = Counter()
+    for stat in after.compare_to(before, "traceback"):
+        if stat.size_diff <= 0:
+            continue
+        frames = [f"{os.path.basename(f.filename)}:{f.lineno}" for f in stat.traceback]
+        folded[";".join(frames)] += stat.size_diff
+    folded_text = "\n".join(f"{k} {v}" for k, v in folded.most_common()) + "\n"
+    return "\n".join(lines) + "\n", folded_text
+
+def running() -> bool:
+    return _busy.locked()
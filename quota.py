@@ -0,0 +1,156 @@
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from app.config import (
+    QUOTA_USER_LINKS_PER_MIN, QUOTA_CHAT_LINKS_PER_MIN, QUOTA_KEY_LINKS_PER_MIN,
+    QUOTA_USER_PROBE_MB_PER_HOUR, QUOTA_USER_CONCURRENT_JOBS,
+)
+from app.ratelimit import TokenBucket
+
+_lock = threading.Lock()
+_user_links: Dict[int, TokenBucket] = {}
+_chat_links: Dict[int, TokenBucket] = {}
+_key_links: Dict[str, TokenBucket] = {}
+_user_bytes: Dict[int, TokenBucket] = {}
+_user_jobs: Dict[int, int] = {}
+_last_seen: Dict[int, float] = {}
+_last_prune = [time.monotonic()]
+
+PROBE_BYTES_PER_HOUR = QUOTA_USER_PROBE_MB_PER_HOUR * 1024 * 1024
+PRUNE_EVERY = 600
+IDLE_TTL = 3600     # the longest window; a user unseen this long has nothing left to remember
+
+class QuotaExceeded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+    def user_message(self) -> str:
+        return f"⏳ Quota reached: {self.reason}.\nTry again in {self.retry_after}s."
+
+def _bucket(table: dict, key, per_window: float, window: float) -> Optional[TokenBucket]:
+    if per_window <= 0:
+        return None
+    b = table.get(key)
+    if b is None:
+        b = table[key] = TokenBucket(per_window / window, per_window)
+    return b
+
+def _key_identity(api_key: Optional[str]) -> str:
+    return f"user:{api_key[-6:]}" if api_key else "global"
+
+def _key_rate(api_key: Optional[str]) -> int:
+    """The global bucket stands for the whole GDFlix key pool, so it grows with the pool."""
+    from app.services import gdflix
+    return QUOTA_KEY_LINKS_PER_MIN * (1 if api_key else max(1, gdflix.POOL.size()))
+
+def _exempt(user_id: int) -> bool:
+    from app import access
+    return access.user_role(user_id) == access.ROLE_OWNER
+
+def _prune():
+    """Drop full buckets (a new one would be identical) and users idle past every window. Caller holds _lock."""
+    now = time.monotonic()
+    if now - _last_prune[0] < PRUNE_EVERY:
+        return
+    _last_prune[0] = now
+    for table in (_user_links, _chat_links, _key_links, _user_bytes):
+        for k in [k for k, b in table.items() if b.peek() >= b.capacity]:
+            del table[k]
+    cutoff = time.time() - IDLE_TTL
+    for uid in [u for u, t in _last_seen.items() if t < cutoff and u not in _user_jobs]:
+        del _last_seen[uid]
+
+def _link_checks(user_id: int, chat_id: Optional[int], n: int, api_key: Optional[str], uses_gdflix: bool) -> list:
+    """Raise unless all of the user, chat and GDFlix-key buckets hold n links; returns the buckets to take from."""
+    checks = [
+        ("links per minute for you", _bucket(_user_links, user_id, QUOTA_USER_LINKS_PER_MIN, 60)),
+        ("links per minute in this chat", _bucket(_chat_links, chat_id, QUOTA_CHAT_LINKS_PER_MIN, 60) if chat_id is not None else None),
+        ("GDFlix key rate", _bucket(_key_links, _key_identity(api_key), _key_rate(api_key), 60) if uses_gdflix else None),
+    ]
+    for reason, b in checks:
+        if b is None:
+            continue
+        if n > b.capacity:
+            raise QuotaExceeded(f"{reason} is {int(b.capacity)}", 60)
+        if b.peek() < n:
+            raise QuotaExceeded(reason, (n - b.peek()) / b.rate)
+    return [b for _, b in checks if b is not None]
+
+def _check_probe(user_id: int):
+    b = _bucket(_user_bytes, user_id, PROBE_BYTES_PER_HOUR, 3600)
+    if b is not None and b.peek() <= 0:
+        raise QuotaExceeded("probe download volume per hour", -b.peek() / b.rate + 1)
+
+def _check_job(user_id: int):
+    if QUOTA_USER_CONCURRENT_JOBS > 0 and _user_jobs.get(user_id, 0) >= QUOTA_USER_CONCURRENT_JOBS:
+        raise QuotaExceeded(f"{QUOTA_USER_CONCURRENT_JOBS} jobs already running", 15)
+
+def take_links(user_id: int, chat_id: Optional[int], n: int, api_key: Optional[str] = None, uses_gdflix: bool = True):
+    """Reserve n links against the user, chat and GDFlix-key buckets, all or nothing."""
+    if _exempt(user_id):
+        return
+    with _lock:
+        _last_seen[user_id] = time.time()
+        for b in _link_checks(user_id, chat_id, n, api_key, uses_gdflix):
+            b.take(n)
+
+def check_probe(user_id: int):
+    if _exempt(user_id):
+        return
+    with _lock:
+        _check_probe(user_id)
+
+def start(user_id: int, chat_id: Optional[int], n: int, api_key: Optional[str] = None, uses_gdflix: bool = True):
+    """Admit a job: check the link buckets, probe volume and job cap first, and only then take the links and
+    the job slot, so a refusal costs nothing. Pair with end_job()."""
+    if _exempt(user_id):
+        return
+    with _lock:
+        _prune()
+        _last_seen[user_id] = time.time()
+        buckets = _link_checks(user_id, chat_id, n, api_key, uses_gdflix)
+        _check_probe(user_id)
+        _check_job(user_id)
+        for b in buckets:
+            b.take(n)
+        if QUOTA_USER_CONCURRENT_JOBS > 0:
+            _user_jobs[user_id] = _user_jobs.get(user_id, 0) + 1
+
+def charge_probe(user_id: int, nbytes: int):
+    if not nbytes or _exempt(user_id):
+        return
+    with _lock:
+        b = _bucket(_user_bytes, user_id, PROBE_BYTES_PER_HOUR, 3600)
+        if b is not None:
+            b.charge(nbytes)
+
+def end_job(user_id: int):
+    with _lock:
+        left = _user_jobs.get(user_id, 0) - 1
+        if left > 0:
+            _user_jobs[user_id] = left
+        else:
+            _user_jobs.pop(user_id, None)
+
+def usage_snapshot(limit: int = 15) -> list[Dict[str, Any]]:
+    with _lock:
+        rows = []
+        for uid in sorted(_last_seen, key=_last_seen.get, reverse=True)[:limit]:
+            lb = _user_links.get(uid)
+            bb = _user_bytes.get(uid)
+            rows.append({
+                "user_id": uid,
+                "links_used": int(lb.capacity - lb.peek()) if lb else 0,
+                "links_cap": int(lb.capacity) if lb else QUOTA_USER_LINKS_PER_MIN,
+                "probe_mb": max(0.0, (bb.capacity - bb.peek()) / 1048576) if bb else 0.0,
+                "probe_cap_mb": QUOTA_USER_PROBE_MB_PER_HOUR,
+                "jobs": _user_jobs.get(uid, 0),
+            })
+        return rows
+
+def key_usage() -> Dict[str, int]:
+    with _lock:
+        return {k: int(b.capacity - b.peek()) for k, b in _key_links.items()}
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import BaseRateLimiter
+
+from app import tracing
+
+logger = logging.getLogger(__name__)
+
+# Telegram's documented outbound limits
+GLOBAL_RATE, GLOBAL_BURST = 30.0, 30.0          # ~30 msg/s across all chats
+CHAT_RATE, CHAT_BURST = 1.0, 3.0                # ~1 msg/s per private chat
+GROUP_RATE, GROUP_BURST = 20.0 / 60.0, 20.0     # 20 msg/min per group
+EDIT_INTERVAL = 1.0                             # per message; edits don't spend the chat's new-message budget
+MAX_RETRIES = 3
+BUCKET_IDLE_TTL = 600
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self, n: float = 1.0) -> float:
+        """Consume n tokens if available and return 0, else return seconds until they will be."""
+        self._refill(time.monotonic())
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        return (n - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def charge(self, n: float):
+        """Consume after the fact (e.g. bytes already downloaded); may drive the balance negative."""
+        self._refill(time.monotonic())
+        self.tokens -= n
+
+    def peek(self) -> float:
+        self._refill(time.monotonic())
+        return self.tokens
+
+    async def acquire(self, n: float = 1.0):
+        while True:
+            wait = self.take(n)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+def _is_limited(endpoint: str) -> bool:
+    return endpoint.startswith(("send", "edit", "copy", "forward"))
+
+class EditSuperseded(TelegramError):
+    """A queued edit was dropped because a newer edit of the same message replaced it before it went out."""
+
+class FloodRateLimiter(BaseRateLimiter[int]):
+    """Central outbound dispatcher for every Bot API call.
+
+    New messages (sends, copies, forwards) take from Telegram's global and per-chat/per-group token
+    buckets. Edits only take from the global one and are paced per message, and a queued edit that a
+    newer edit of the same message supersedes is dropped (raising EditSuperseded). `RetryAfter` is
+    waited out instead of failing.
+    """
+
+    def __init__(self, max_retries: int = MAX_RETRIES):
+        self.max_retries = max_retries
+        self._global = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._blocked_until: Dict[Any, float] = {}
+        self._edit_gen: Dict[Tuple[str, Any, Any], int] = {}
+        self._edit_next: Dict[Tuple[Any, Any], float] = {}   # (chat, message) -> earliest next edit
+        self._last_prune = time.monotonic()
+        self.waiting: Counter = Counter()
+        self.stats: Counter = Counter()
+        self.max_depth = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        b = self._chats.get(chat_id)
+        if b is None:
+            is_group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+            b = self._chats[chat_id] = TokenBucket(*((GROUP_RATE, GROUP_BURST) if is_group else (CHAT_RATE, CHAT_BURST)))
+        return b
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < BUCKET_IDLE_TTL:
+            return
+        self._last_prune = now
+        # A full bucket is indistinguishable from a new one (peek() refills, so its stamp is always fresh)
+        for cid in [c for c, b in self._chats.items() if b.peek() >= b.capacity]:
+            self._chats.pop(cid, None)
+        for cid in [c for c, t in self._blocked_until.items() if t < now]:
+            self._blocked_until.pop(cid, None)
+        for key in [k for k, t in self._edit_next.items() if t < now]:
+            self._edit_next.pop(key, None)
+
+    async def _wait_turn(self, chat_id: Any, message_id: Any = None):
+        blocked = self._blocked_until.get(chat_id, 0) - time.monotonic()
+        if blocked > 0:
+            await asyncio.sleep(blocked)
+        if message_id is not None:
+            now = time.monotonic()
+            slot = max(now, self._edit_next.get((chat_id, message_id), 0.0))
+            self._edit_next[(chat_id, message_id)] = slot + EDIT_INTERVAL
+            if slot > now:
+                await asyncio.sleep(slot - now)
+        elif chat_id is not None:
+            await self._chat_bucket(chat_id).acquire()
+        await self._global.acquire()
+
+    def _superseded(self, edit_key, gen: int) -> bool:
+        return edit_key is not None and self._edit_gen.get(edit_key) != gen
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ):
+        with tracing.span(f"telegram.{endpoint}", chat=data.get("chat_id")):
+            if not _is_limited(endpoint):
+                return await callback(*args, **kwargs)
+            return await self._process_limited(callback, args, kwargs, endpoint, data, rate_limit_args)
+
+    async def _process_limited(self, callback, args, kwargs, endpoint: str, data: Dict[str, Any], rate_limit_args: Optional[int]):
+
+        chat_id = data.get("chat_id")
+        edit_key, gen = None, 0
+        if endpoint.startswith("edit") and data.get("message_id") is not None:
+            edit_key = (endpoint, chat_id, data.get("message_id"))
+            gen = self._edit_gen[edit_key] = self._edit_gen.get(edit_key, 0) + 1
+
+        self.waiting[endpoint] += 1
+        self.max_depth = max(self.max_depth, sum(self.waiting.values()))
+        try:
+            self._prune()
+            attempt = 0
+            while True:
+                if not self._superseded(edit_key, gen):
+                    await self._wait_turn(chat_id, data.get("message_id") if edit_key else None)
+                if self._superseded(edit_key, gen):
+                    # A newer edit of the same message is queued; it will carry the final content.
+                    self.stats["coalesced"] += 1
+                    raise EditSuperseded(f"{endpoint} superseded by a newer edit")
+                try:
+                    result = await callback(*args, **kwargs)
+                    self.stats["sent"] += 1
+                    return result
+                except RetryAfter as e:
+                    self.stats["flood_waits"] += 1
+                    retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+                    self._blocked_until[chat_id] = time.monotonic() + retry_after
+                    if attempt >= (rate_limit_args if rate_limit_args is not None else self.max_retries):
+                        self.stats["gave_up"] += 1
+                        raise
+                    attempt += 1
+                    logger.warning(f"Flood wait {retry_after:.0f}s on {endpoint} chat={chat_id} (retry {attempt})")
+        finally:
+            self.waiting[endpoint] -= 1
+            if self.waiting[endpoint] <= 0:
+                del self.waiting[endpoint]
+            if edit_key and self._edit_gen.get(edit_key) == gen:
+                self._edit_gen.pop(edit_key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "depth": sum(self.waiting.values()),
+            "by_endpoint": dict(self.waiting),
+            "max_depth": self.max_depth,
+            "chats_tracked": len(self._chats),
+            "global_tokens": round(self._global.peek(), 1),
+            **{k: self.stats[k] for k in ("sent", "coalesced", "flood_waits", "gave_up")},
+        }
+
+LIMITER = FloodRateLimiter()
@@ -0,0 +1,109 @@
+import re
+import statistics
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.services.tmdb import extract_title_year_from_filename
+
+# Episodes of one pack share an encode; a size this far from the representative suggests they don't
+SIZE_OUTLIER_RATIO = 1.6
+
+_SOURCES = (
+    ("REMUX", r"remux"), ("BluRay", r"blu-?ray|bdrip|brrip"), ("WEB-DL", r"web-?dl"), ("WEBRip", r"web-?rip"),
+    ("HDTV", r"hdtv"), ("HDRip", r"hdrip"), ("DVDRip", r"dvd-?rip"), ("WEB", r"web"),
+)
+_SERVICES = r"amzn|nf|dsnp|hmax|atvp|jhs|zee5|sonyliv|hs|aha|snxt|mmax|iq|viki"
+_VIDEO = (("HEVC", r"x265|h\.?265|hevc"), ("AVC", r"x264|h\.?264|avc"), ("AV1", r"av1"))
+_AUDIO = r"ddpa?\d\.\d|dd\+?\d\.\d|e?ac-?3|aac(?:\d\.\d)?|atmos|truehd|dts(?:-?hd)?(?:\.?ma)?|opus|flac"
+_LANGS = r"hindi|tamil|telugu|malayalam|kannada|bengali|marathi|english|eng|hin|tam|tel|mal|kan|dual|multi"
+
+@dataclass(frozen=True, slots=True)
+class Release:
+    show: str
+    year: str
+    season: Optional[int]
+    episode: Optional[int]
+    source: str
+    resolution: str
+    video: str
+    audio: str
+    group: str
+
+    def pack_key(self) -> tuple:
+        """Files sharing this key are taken to share one encode (and so one audio layout)."""
+        return (self.show, self.year, self.season, self.source, self.resolution, self.video, self.audio, self.group)
+
+    def encode_label(self) -> str:
+        return " ".join(p for p in (self.resolution, self.source, self.video) if p) or "Other"
+
+def _first(patterns, text: str) -> str:
+    for label, pat in patterns:
+        if re.search(rf"(?<![a-z0-9])(?:{pat})(?![a-z0-9])", text):
+            return label
+    return ""
+
+def parse(name: str) -> Release:
+    title, year = extract_title_year_from_filename(name)
+    season = episode = None
+    m = re.search(r"\bS(\d{1,2})(?:\s?E(\d{1,3}))?\b", title, flags=re.IGNORECASE)
+    if m and m.start():
+        title, season = title[:m.start()], int(m.group(1))
+        episode = int(m.group(2)) if m.group(2) else None
+    if episode is None:
+        m = re.search(r"\bS(\d{1,2})\s?E(\d{1,3})\b", name, flags=re.IGNORECASE)
+        if m:
+            season, episode = int(m.group(1)), int(m.group(2))
+
+    low = name.lower()
+    base = re.sub(r"\.[a-z0-9]{2,4}$", "", low)
+    service = re.search(rf"(?<![a-z0-9])({_SERVICES})(?![a-z0-9])", base)
+    source = " ".join(p for p in ((service.group(1).upper() if service else ""), _first(_SOURCES, base)) if p)
+    res = re.search(r"(?<![a-z0-9])(2160p|1080p|720p|576p|480p|4k)(?![a-z0-9])", base)
+    video = _first(_VIDEO, base)
+    if video and re.search(r"10-?bit", base):
+        video += " 10bit"
+    audio = sorted(set(re.findall(rf"(?<![a-z0-9])(?:{_AUDIO})(?![a-z0-9])", base)))
+    langs = sorted(set(re.findall(rf"(?<![a-z0-9])(?:{_LANGS})(?![a-z0-9])", base)))
+    group = re.search(r"-([a-z0-9]+)$", base)
+    return Release(
+        show=re.sub(r"\W+", " ", title).strip().lower(), year=year, season=season, episode=episode,
+        source=source, resolution=(res.group(1) if res else "").replace("4k", "2160p"), video=video,
+        audio=" ".join(audio + langs), group=group.group(1) if group else "",
+    )
+
+@dataclass(slots=True)
+class Pack:
+    release: Release
+    items: List[dict] = field(default_factory=list)
+    probe: List[dict] = field(default_factory=list)      # representative first, then size outliers
+
+def _episodes(items: List[dict]) -> str:
+    eps = sorted({e for e in (parse(it["raw_name"]).episode for it in items) if e is not None})
+    if len(eps) != len(items) or not eps:
+        return f"{len(items)} files" if len(items) > 1 else ""
+    if len(eps) > 2 and eps[-1] - eps[0] == len(eps) - 1:
+        return f"E{eps[0]:02d}–E{eps[-1]:02d}"
+    return ", ".join(f"E{e:02d}" for e in eps)
+
+def label(release: Release, items: List[dict]) -> str:
+    season = f"S{release.season:02d} " if release.season is not None else ""
+    eps = _episodes(items)
+    return f"{season}{release.encode_label()}" + (f" · {eps}" if eps else "")
+
+def plan(items: List[dict]) -> List[Pack]:
+    """Group /get items by release pattern and pick which ones need probing (in item order)."""
+    packs: dict = {}
+    for it in items:
+        rel = parse(it["raw_name"])
+        packs.setdefault(rel.pack_key(), Pack(rel)).items.append(it)
+    for pack in packs.values():
+        sized = [it for it in pack.items if it.get("size_bytes")]
+        if not sized:
+            pack.probe = pack.items[:1]
+            continue
+        # The median-sized file represents the pack; a pilot or special won't skew it
+        median = statistics.median_low(it["size_bytes"] for it in sized)
+        rep = next(it for it in sized if it["size_bytes"] == median)
+        pack.probe = [rep] + [it for it in sized if it is not rep and
+                              not 1 / SIZE_OUTLIER_RATIO <= it["size_bytes"] / median <= SIZE_OUTLIER_RATIO]
+    return list(packs.values())
@@ -0,0 +1,503 @@
+import struct
+from typing import Callable, Dict, List
+
+# Audio track layout read straight from Matroska/WebM and MP4/MOV headers through a ranged reader.
+# Only layouts that can be named exactly as mediainfo would are answered; anything else raises
+# Unsupported and the caller falls back to the full head download + mediainfo.
+
+Reader = Callable[[int, int], bytes]      # read(offset, length) -> bytes (short at EOF)
+
+MAX_ELEMENT = 4 * 1024 * 1024             # largest Tracks/Tags/moov child we are willing to pull
+CLUSTER_SCAN = 512 * 1024                 # bytes of the first Cluster searched for Dolby frames
+MAX_TOP_LEVEL = 32
+
+class Unsupported(Exception):
+    pass
+
+AC3_KBPS = (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384, 448, 512, 576, 640)
+ACMOD_CHANNELS = (2, 1, 2, 3, 3, 4, 4, 5)
+SAMPLE_RATES = (48000, 44100, 32000)
+EAC3_BLOCKS = (1, 2, 3, 6)
+AAC_CHANNELS = {1: 1, 2: 2, 3: 3, 4: 4, 5: 5, 6: 6, 7: 8}
+
+# ISO 639-2 (bibliographic and terminology) and 639-1 codes, named the way mediainfo prints them
+_LANGUAGE_CODES = {
+    "English": ("eng", "en"), "Hindi": ("hin", "hi"), "Tamil": ("tam", "ta"), "Telugu": ("tel", "te"),
+    "Malayalam": ("mal", "ml"), "Kannada": ("kan", "kn"), "Marathi": ("mar", "mr"), "Bengali": ("ben", "bn"),
+    "Punjabi": ("pan", "pa"), "Gujarati": ("guj", "gu"), "Urdu": ("urd", "ur"), "Odia": ("ori", "or"),
+    "Assamese": ("asm", "as"), "Nepali": ("nep", "ne"), "Sinhala": ("sin", "si"), "Bhojpuri": ("bho",),
+    "Japanese": ("jpn", "ja"), "Korean": ("kor", "ko"), "Chinese": ("chi", "zho", "zh"), "Thai": ("tha", "th"),
+    "Vietnamese": ("vie", "vi"), "Indonesian": ("ind", "id"), "Malay": ("may", "msa", "ms"),
+    "Filipino": ("fil",), "Tagalog": ("tgl", "tl"), "Arabic": ("ara", "ar"), "Persian": ("per", "fas", "fa"),
+    "Turkish": ("tur", "tr"), "Hebrew": ("heb", "he"), "Russian": ("rus", "ru"), "Ukrainian": ("ukr", "uk"),
+    "Polish": ("pol", "pl"), "Czech": ("cze", "ces", "cs"), "Hungarian": ("hun", "hu"), "Romanian": ("rum", "ron", "ro"),
+    "Greek": ("gre", "ell", "el"), "Spanish": ("spa", "es"), "Portuguese": ("por", "pt"), "French": ("fre", "fra", "fr"),
+    "German": ("ger", "deu", "de"), "Italian": ("ita", "it"), "Dutch": ("dut", "nld", "nl"), "Swedish": ("swe", "sv"),
+    "Norwegian": ("nor", "no"), "Danish": ("dan", "da"), "Finnish": ("fin", "fi"),
+}
+LANGUAGES = {code: name for name, codes in _LANGUAGE_CODES.items() for code in codes}
+
+def _language(code: str) -> str:
+    code = (code or "").strip().lower()
+    if not code or code == "und":
+        return ""
+    if code not in LANGUAGES:
+        raise Unsupported(f"language {code}")
+    return LANGUAGES[code]
+
+def _kbps(kbps: float) -> str:
+    if not kbps:
+        return ""
+    return f"{kbps:.1f}kb/s" if kbps < 100 else f"{round(kbps)}kb/s"
+
+def _track(channels: int, kbps: float, language: str, codec: str) -> dict:
+    return {
+        "channels": f"{channels} channel" if channels == 1 else f"{channels} channels",
+        "bitrate": _kbps(kbps), "language": language, "codec": codec,
+    }
+
+def audio_tracks(read: Reader, size: int | None = None) -> List[dict]:
+    """Audio tracks in file order as {channels, bitrate, language, codec}. Raises Unsupported."""
+    head = read(0, 12)
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return _mkv_tracks(read, size)
+    if head[4:8] == b"ftyp":
+        return _mp4_tracks(read, size)
+    raise Unsupported("not Matroska or MP4")
+
+# ---- bit-level helpers ----
+
+class _Bits:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def read(self, n: int) -> int:
+        v = 0
+        for _ in range(n):
+            v = (v << 1) | ((self.data[self.pos >> 3] >> (7 - (self.pos & 7))) & 1)
+            self.pos += 1
+        return v
+
+    def skip(self, n: int):
+        self.pos += n
+
+    def left(self) -> int:
+        return len(self.data) * 8 - self.pos
+
+def _dolby_frame(data: bytes) -> dict:
+    """AC-3 / E-AC-3 syncframe(s) at the start of `data`: codec name and nominal bit rate."""
+    if data[:2] != b"\x0b\x77" or len(data) < 8:
+        raise Unsupported("no Dolby sync")
+    bsid = data[5] >> 3
+    if bsid <= 10:
+        fscod, frmsizecod = data[4] >> 6, data[4] & 0x3F
+        if fscod == 3 or frmsizecod >= 38:
+            raise Unsupported("bad AC-3 header")
+        return {"codec": "DD", "kbps": AC3_KBPS[frmsizecod >> 1]}
+    if bsid > 16:
+        raise Unsupported("bad E-AC-3 header")
+    first = _eac3_bsi(data)
+    # One frame set: the independent substream 0 plus the dependent/extra substreams after it
+    total, pos = first["size"], first["size"]
+    while pos + 6 <= len(data) and data[pos:pos + 2] == b"\x0b\x77":
+        b = _Bits(data[pos + 2:pos + 5])
+        strmtyp, substreamid, frmsiz = b.read(2), b.read(3), b.read(11)
+        if strmtyp != 1 and substreamid == 0:
+            break
+        total += (frmsiz + 1) * 2
+        pos += (frmsiz + 1) * 2
+    kbps = total * 8 * first["rate"] / (first["blocks"] * 256) / 1000
+    return {"codec": "DDPA" if first["atmos"] else "DDP", "kbps": kbps}
+
+def _eac3_bsi(data: bytes) -> dict:
+    # Bitstream info up to addbsi, where flag_ec3_extension_type_a marks Atmos (JOC)
+    b = _Bits(data[2:])
+    strmtyp, _substreamid, frmsiz, fscod = b.read(2), b.read(3), b.read(11), b.read(2)
+    if fscod == 3:
+        fscod2 = b.read(2)
+        if fscod2 == 3:
+            raise Unsupported("bad E-AC-3 sample rate")
+        rate, blocks = SAMPLE_RATES[fscod2] // 2, 6
+    else:
+        rate, blocks = SAMPLE_RATES[fscod], EAC3_BLOCKS[b.read(2)]
+    acmod, lfeon = b.read(3), b.read(1)
+    b.skip(5)                                   # bsid
+    mono_pairs = 1 if acmod else 2
+    for _ in range(mono_pairs):
+        b.skip(5)                               # dialnorm
+        if b.read(1): b.skip(8)                 # compr
+    if strmtyp == 1 and b.read(1):
+        b.skip(16)                              # chanmap
+    if b.read(1):                               # mixmdate
+        if acmod > 2:
+            b.skip(2)
+            if acmod & 1: b.skip(6)
+            if acmod & 4: b.skip(6)
+        if lfeon and b.read(1): b.skip(5)
+        if strmtyp == 0:
+            for _ in range(mono_pairs):
+                if b.read(1): b.skip(6)         # pgmscl
+            if b.read(1): b.skip(6)             # extpgmscl
+            mixdef = b.read(2)
+            if mixdef == 1: b.skip(5)
+            elif mixdef == 2: b.skip(12)
+            elif mixdef == 3: b.skip((b.read(5) + 2) * 8)
+            if acmod < 2:
+                for _ in range(mono_pairs):
+                    if b.read(1): b.skip(14)    # panmean + paninfo
+            if b.read(1):                       # frmmixcfginfoe
+                for _ in range(blocks):
+                    if blocks == 1 or b.read(1): b.skip(5)
+    if b.read(1):                               # infomdate
+        b.skip(5)
+        if acmod == 2: b.skip(4)
+        if acmod >= 6: b.skip(2)
+        for _ in range(mono_pairs):
+            if b.read(1): b.skip(8)
+        if fscod < 3: b.skip(1)
+    if strmtyp == 0 and blocks != 6:
+        b.skip(1)                               # convsync
+    if strmtyp == 2 and (blocks == 6 or b.read(1)):
+        b.skip(6)                               # frmsizecod
+    atmos = False
+    if b.read(1):                               # addbsie
+        b.skip(6 + 7)
+        atmos = bool(b.read(1))
+    return {"size": (frmsiz + 1) * 2, "rate": rate, "blocks": blocks, "atmos": atmos}
+
+# ---- Matroska / WebM ----
+
+EBML, DOCTYPE, SEGMENT = 0x1A45DFA3, 0x4282, 0x18538067
+SEEKHEAD, SEEK, SEEK_ID, SEEK_POSITION = 0x114D9B74, 0x4DBB, 0x53AB, 0x53AC
+TRACKS, TRACK_ENTRY, CLUSTER, TAGS = 0x1654AE6B, 0xAE, 0x1F43B675, 0x1254C367
+TRACK_NUMBER, TRACK_UID, TRACK_TYPE, CODEC_ID = 0xD7, 0x73C5, 0x83, 0x86
+LANGUAGE, LANGUAGE_IETF, AUDIO, CHANNELS = 0x22B59C, 0x22B59D, 0xE1, 0x9F
+TAG, TARGETS, TAG_TRACK_UID, SIMPLE_TAG, TAG_NAME, TAG_STRING = 0x7373, 0x63C0, 0x63C5, 0x67C8, 0x45A3, 0x4487
+SIMPLE_BLOCK, BLOCK_GROUP, BLOCK = 0xA3, 0xA0, 0xA1
+
+def _vint(buf: bytes, pos: int, marker: bool = False):
+    if pos >= len(buf):
+        raise Unsupported("truncated EBML")
+    first, length, mask = buf[pos], 1, 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or pos + length > len(buf):
+        raise Unsupported("bad EBML number")
+    value = first if marker else first & (mask - 1)
+    for byte in buf[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    if not marker and value == (1 << (7 * length)) - 1:
+        value = -1                              # unknown size
+    return value, length
+
+def _uint(data: bytes) -> int:
+    return int.from_bytes(data, "big") if data else 0
+
+def _text(data: bytes) -> str:
+    return data.split(b"\0", 1)[0].decode("utf-8", errors="ignore")
+
+def _ebml_header(read: Reader, off: int):
+    buf = read(off, 12)
+    eid, n = _vint(buf, 0, True)
+    size, m = _vint(buf, n)
+    return eid, size, off + n + m
+
+def _ebml_element(read: Reader, off: int) -> bytes:
+    _, size, data = _ebml_header(read, off)
+    if size < 0 or size > MAX_ELEMENT:
+        raise Unsupported("element too large")
+    payload = read(data, size)
+    if len(payload) < size:
+        raise Unsupported("truncated element")
+    return payload
+
+def _ebml_children(buf: bytes):
+    pos = 0
+    while pos < len(buf):
+        eid, n = _vint(buf, pos, True)
+        size, m = _vint(buf, pos + n)
+        start = pos + n + m
+        if size < 0 or start + size > len(buf):
+            raise Unsupported("truncated element")
+        yield eid, buf[start:start + size]
+        pos = start + size
+
+def _mkv_tracks(read: Reader, size: int | None) -> List[dict]:
+    _, hsize, off = _ebml_header(read, 0)
+    doctype = next((_text(d) for i, d in _ebml_children(read(off, hsize)) if i == DOCTYPE), "matroska")
+    if doctype not in ("matroska", "webm"):
+        raise Unsupported(f"doctype {doctype}")
+    eid, seg_size, seg_start = _ebml_header(read, off + hsize)
+    if eid != SEGMENT:
+        raise Unsupported("no Segment")
+    seg_end = seg_start + seg_size if seg_size >= 0 else (size or seg_start + MAX_ELEMENT)
+
+    # Top-level walk up to the first Cluster; SeekHead fills in whatever lives past it (Tags, usually)
+    where: Dict[int, int] = {}
+    pos = seg_start
+    for _ in range(MAX_TOP_LEVEL):
+        if pos >= seg_end:
+            break
+        eid, esize, data = _ebml_header(read, pos)
+        where.setdefault(eid, pos)
+        if eid == SEEKHEAD:
+            for sid, seek in _ebml_children(_ebml_element(read, pos)):
+                if sid != SEEK:
+                    continue
+                fields = dict(_ebml_children(seek))
+                if SEEK_ID in fields and SEEK_POSITION in fields:
+                    where.setdefault(_uint(fields[SEEK_ID]), seg_start + _uint(fields[SEEK_POSITION]))
+        if eid == CLUSTER or esize < 0:
+            break
+        pos = data + esize
+
+    if TRACKS not in where:
+        raise Unsupported("no Tracks")
+    audio = []
+    for eid, entry in _ebml_children(_ebml_element(read, where[TRACKS])):
+        if eid != TRACK_ENTRY:
+            continue
+        t = {"type": 0, "number": 0, "uid": 0, "codec": "", "lang": "eng", "ietf": "", "channels": 1}
+        for cid, data in _ebml_children(entry):
+            if cid == TRACK_TYPE: t["type"] = _uint(data)
+            elif cid == TRACK_NUMBER: t["number"] = _uint(data)
+            elif cid == TRACK_UID: t["uid"] = _uint(data)
+            elif cid == CODEC_ID: t["codec"] = _text(data)
+            elif cid == LANGUAGE: t["lang"] = _text(data)
+            elif cid == LANGUAGE_IETF: t["ietf"] = _text(data)
+            elif cid == AUDIO:
+                t["channels"] = next((_uint(d) for i, d in _ebml_children(data) if i == CHANNELS), 1)
+        if t["type"] == 2:
+            audio.append(t)
+    if not audio:
+        raise Unsupported("no audio tracks")
+
+    bps = _mkv_bps(_ebml_element(read, where[TAGS])) if TAGS in where else {}
+    dolby = {t["number"] for t in audio if t["codec"] in ("A_AC3", "A_EAC3")}
+    frames = _mkv_first_frames(read, where[CLUSTER], dolby) if dolby and CLUSTER in where else {}
+
+    out = []
+    for t in audio:
+        if "-" in t["ietf"]:
+            raise Unsupported(f"language {t['ietf']}")    # regional tags print differently
+        lang = _language(t["ietf"] or t["lang"])
+        kbps = bps.get(t["uid"], 0) / 1000
+        codec = t["codec"]
+        if codec.startswith("A_AAC"):
+            name = "AAC"
+        elif codec in ("A_AC3", "A_EAC3"):
+            if t["number"] not in frames:
+                raise Unsupported("no Dolby frame in the first Cluster")
+            frame = _dolby_frame(frames[t["number"]])
+            name, kbps = frame["codec"], frame["kbps"]
+        elif codec == "A_OPUS":
+            name = "Opus"
+        elif codec == "A_FLAC":
+            name = "FLAC"
+        else:
+            raise Unsupported(f"codec {codec}")
+        out.append(_track(t["channels"], kbps, lang, name))
+    return out
+
+def _mkv_bps(tags: bytes) -> Dict[int, int]:
+    # mkvmerge's track statistics tags carry the average bit rate as BPS
+    out = {}
+    for eid, tag in _ebml_children(tags):
+        if eid != TAG:
+            continue
+        uids, value = [], None
+        for cid, data in _ebml_children(tag):
+            if cid == TARGETS:
+                uids = [_uint(d) for i, d in _ebml_children(data) if i == TAG_TRACK_UID]
+            elif cid == SIMPLE_TAG:
+                fields = dict(_ebml_children(data))
+                if _text(fields.get(TAG_NAME, b"")) == "BPS" and _text(fields.get(TAG_STRING, b"")).isdigit():
+                    value = int(_text(fields[TAG_STRING]))
+        if value:
+            for uid in uids:
+                out[uid] = value
+    return out
+
+def _block_payload(block: bytes):
+    track, n = _vint(block, 0)
+    flags, pos = block[n + 2], n + 3
+    lacing = (flags >> 1) & 3
+    if lacing:
+        count = block[pos] + 1
+        pos += 1
+        if lacing == 1:                         # Xiph
+            for _ in range(count - 1):
+                while block[pos] == 255:
+                    pos += 1
+                pos += 1
+        elif lacing == 3:                       # EBML
+            for _ in range(count - 1):
+                pos += _vint(block, pos)[1]
+    return track, block[pos:]
+
+def _mkv_first_frames(read: Reader, cluster: int, wanted: set) -> Dict[int, bytes]:
+    _, size, data = _ebml_header(read, cluster)
+    buf = read(data, CLUSTER_SCAN if size < 0 else min(size, CLUSTER_SCAN))
+    frames: Dict[int, bytes] = {}
+    pos = 0
+    try:
+        while pos < len(buf) and len(frames) < len(wanted):
+            eid, n = _vint(buf, pos, True)
+            esize, m = _vint(buf, pos + n)
+            start = pos + n + m
+            if esize < 0 or start + esize > len(buf):
+                break
+            payload = buf[start:start + esize]
+            if eid == BLOCK_GROUP:
+                payload = next((d for i, d in _ebml_children(payload) if i == BLOCK), b"")
+            if eid in (SIMPLE_BLOCK, BLOCK_GROUP) and payload:
+                track, frame = _block_payload(payload)
+                if track in wanted and track not in frames:
+                    frames[track] = frame
+            pos = start + esize
+    except (Unsupported, IndexError):
+        pass
+    return frames
+
+# ---- MP4 / MOV ----
+
+def _boxes(read: Reader, start: int, end: int):
+    pos = start
+    while pos + 8 <= end:
+        hdr = read(pos, 16)
+        if len(hdr) < 8:
+            break
+        size, kind = struct.unpack(">I4s", hdr[:8])
+        hlen = 8
+        if size == 1:
+            if len(hdr) < 16:
+                break
+            size, hlen = struct.unpack(">Q", hdr[8:16])[0], 16
+        elif size == 0:
+            size = end - pos
+        if size < hlen:
+            raise Unsupported("bad box")
+        yield kind, pos + hlen, min(pos + size, end)
+        pos += size
+
+def _box(read: Reader, start: int, end: int, kind: bytes):
+    return next(((s, e) for k, s, e in _boxes(read, start, end) if k == kind), None)
+
+def _mem_boxes(buf: bytes, pos: int = 0):
+    while pos + 8 <= len(buf):
+        size, kind = struct.unpack(">I4s", buf[pos:pos + 8])
+        if size < 8:
+            break
+        yield kind, buf[pos + 8:pos + size]
+        pos += size
+
+def _mp4_tracks(read: Reader, size: int | None) -> List[dict]:
+    end = size or 1 << 62
+    moov = _box(read, 0, end, b"moov")
+    if not moov:
+        raise Unsupported("no moov")
+    out = []
+    for kind, s, e in _boxes(read, *moov):
+        if kind != b"trak":
+            continue
+        mdia = _box(read, s, e, b"mdia")
+        hdlr = mdia and _box(read, *mdia, b"hdlr")
+        if not hdlr or read(hdlr[0] + 8, 4) != b"soun":
+            continue
+        mdhd = _box(read, *mdia, b"mdhd")
+        minf = _box(read, *mdia, b"minf")
+        stbl = minf and _box(read, *minf, b"stbl")
+        stsd = stbl and _box(read, *stbl, b"stsd")
+        if not (mdhd and stsd):
+            raise Unsupported("incomplete audio trak")
+        head = read(mdhd[0], 34)
+        packed = struct.unpack(">H", head[32:34] if head[0] == 1 else head[20:22])[0]
+        code = "".join(chr(((packed >> shift) & 31) + 0x60) for shift in (10, 5, 0))
+        lang = _language(code) if packed else ""
+        entry = read(stsd[0] + 8, min(stsd[1] - stsd[0] - 8, 64 * 1024))
+        out.append(_mp4_sample_entry(entry, lang))
+    if not out:
+        raise Unsupported("no audio tracks")
+    return out
+
+def _mp4_sample_entry(entry: bytes, lang: str) -> dict:
+    if len(entry) < 36:
+        raise Unsupported("short sample entry")
+    size, kind = struct.unpack(">I4s", entry[:8])
+    entry = entry[:size]
+    version, channels = struct.unpack(">H", entry[16:18])[0], struct.unpack(">H", entry[24:26])[0]
+    if version > 1:
+        raise Unsupported("QuickTime sound description v2")
+    children = dict(_mem_boxes(entry, 36 + 16 * version))
+    if b"wave" in children:
+        children.update(_mem_boxes(children[b"wave"]))
+    if kind == b"mp4a" and b"esds" in children:
+        oti, avg, asc_channels = _esds(children[b"esds"])
+        if oti not in (0x40, 0x66, 0x67, 0x68):
+            raise Unsupported(f"mp4a object type {oti:#x}")
+        return _track(asc_channels or channels, avg / 1000, lang, "AAC")
+    if kind == b"ac-3" and b"dac3" in children:
+        b = _Bits(children[b"dac3"])
+        b.skip(2 + 5 + 3)
+        acmod, lfeon, rate_code = b.read(3), b.read(1), b.read(5)
+        if rate_code >= len(AC3_KBPS):
+            raise Unsupported("bad dac3")
+        return _track(ACMOD_CHANNELS[acmod] + lfeon, AC3_KBPS[rate_code], lang, "DD")
+    if kind == b"ec-3" and b"dec3" in children:
+        b = _Bits(children[b"dec3"])
+        data_rate, extra_ind = b.read(13), b.read(3)
+        b.skip(2 + 5 + 1 + 1 + 3)
+        acmod, lfeon = b.read(3), b.read(1)
+        b.skip(3)
+        deps = b.read(4)
+        if extra_ind or deps:
+            raise Unsupported("E-AC-3 with extra substreams")
+        b.skip(1)
+        atmos = False
+        if b.left() >= 16:
+            b.skip(7)
+            atmos = bool(b.read(1))
+        return _track(ACMOD_CHANNELS[acmod] + lfeon, data_rate, lang, "DDPA" if atmos else "DDP")
+    raise Unsupported(f"sample entry {kind!r}")
+
+def _esds(data: bytes):
+    def descriptor(pos):
+        tag, length = data[pos], 0
+        pos += 1
+        for _ in range(4):
+            byte = data[pos]
+            pos += 1
+            length = (length << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                break
+        return tag, length, pos
+
+    try:
+        tag, _, pos = descriptor(4)
+        if tag != 3:
+            raise Unsupported("no ES descriptor")
+        flags = data[pos + 2]
+        pos += 3
+        if flags & 0x80: pos += 2
+        if flags & 0x40: pos += 1 + data[pos]
+        if flags & 0x20: pos += 2
+        tag, length, pos = descriptor(pos)
+        if tag != 4:
+            raise Unsupported("no decoder config")
+        oti, avg, config_end = data[pos], struct.unpack(">I", data[pos + 9:pos + 13])[0], pos + length
+        pos += 13
+        channels = 0
+        if pos < config_end:
+            tag, length, pos = descriptor(pos)
+            if tag == 5 and length >= 2:
+                b = _Bits(data[pos:pos + length])
+                if b.read(5) == 31: b.skip(6)
+                if b.read(4) == 15: b.skip(24)
+                channels = AAC_CHANNELS.get(b.read(4), 0)
+        return oti, avg, channels
+    except (IndexError, struct.error):
+        raise Unsupported("bad esds")
@@ -1,26 +1,193 @@
+import hashlib
 import logging
-import requests
-from app.config import GDFLIX_API_BASE, GDFLIX_API_KEY, GDFLIX_FILE_BASE
+import re
+import threading
+import time
+from app import tracing
+from app.cache import TTLCache
+from app.config import GDFLIX_API_BASE, GDFLIX_API_KEY, GDFLIX_API_KEYS, GDFLIX_FILE_BASE, QUOTA_KEY_LINKS_PER_MIN
+from app.ratelimit import TokenBucket
+from app.utils import HTTP
 logger = logging.getLogger(__name__)
 
-def share_file(file_id: str, api_key: str | None = None):
-    key = api_key or GDFLIX_API_KEY
-    if not key or not GDFLIX_API_BASE:
-        logger.warning("GDFLIX not configured")
-        return None
+# Share results (key, name, size) never change for a given file + API key, so keep them for a month.
+SHARE_CACHE_TTL = 30 * 86400
+SHARE_CACHE = TTLCache(SHARE_CACHE_TTL, max_entries=50000, path="gdflix_cache.json")
+SHARE_CACHE_FIELDS = ("key", "name", "size")
+API_CALLS = {"share": 0}
+
+QUARANTINE_BASE = 30.0     # seconds out of rotation after a key's first error; doubles per consecutive error
+QUARANTINE_MAX = 1800.0
+# A JSON error that is about the key rather than the file
+_KEY_ERROR = re.compile(r"key|limit|quota|exceed|unauthori[sz]ed|forbidden|banned|expired", re.IGNORECASE)
+
+class _PoolKey:
+    __slots__ = ("key", "weight", "current", "bucket", "calls", "errors", "fails", "until", "trial", "last_error")
+
+    def __init__(self, key: str, weight: int):
+        self.key = key
+        self.weight = weight
+        self.current = 0
+        self.bucket = TokenBucket(QUOTA_KEY_LINKS_PER_MIN / 60, QUOTA_KEY_LINKS_PER_MIN) if QUOTA_KEY_LINKS_PER_MIN > 0 else None
+        self.calls = 0
+        self.errors = 0
+        self.fails = 0          # consecutive
+        self.until = 0.0        # quarantined while in the future; once past, the next call is a recovery trial
+        self.trial = False
+        self.last_error = ""
+
+class KeyPool:
+    """The global GDFlix keys: smooth weighted round-robin over the keys that are healthy and have rate left.
+
+    A key that errors is quarantined with exponential backoff; when that runs out, one live request is let
+    through as a trial, and its outcome either restores the key or sends it back with a doubled backoff.
+    """
+
+    def __init__(self, spec: str, fallback: str = ""):
+        self._lock = threading.Lock()
+        self.keys: list[_PoolKey] = []
+        for part in (spec or fallback).split(","):
+            key, _, weight = part.strip().rpartition(":")
+            if not weight.isdigit():
+                key, weight = part.strip(), "1"
+            if key and key not in {k.key for k in self.keys}:
+                self.keys.append(_PoolKey(key, max(1, int(weight))))
+
+    def size(self) -> int:
+        return len(self.keys)
+
+    def acquire(self, exclude: tuple = ()) -> str | None:
+        now = time.time()
+        with self._lock:
+            pool = [k for k in self.keys if k.key not in exclude]
+            ready = [k for k in pool if k.until <= now and not (k.until and k.trial) and (not k.bucket or k.bucket.peek() >= 1)]
+            if not ready:
+                # Everything is out or drained: the key back soonest beats failing outright
+                if not pool:
+                    return None
+                best = min(pool, key=lambda k: k.until)
+            else:
+                total = sum(k.weight for k in ready)
+                for k in ready:
+                    k.current += k.weight
+                best = max(ready, key=lambda k: k.current)
+                best.current -= total
+            if best.until:
+                best.trial = True
+            if best.bucket:
+                best.bucket.charge(1)
+            best.calls += 1
+            return best.key
+
+    def _find(self, key: str) -> _PoolKey | None:
+        return next((k for k in self.keys if k.key == key), None)
+
+    def success(self, key: str):
+        with self._lock:
+            k = self._find(key)
+            if k and (k.fails or k.until):
+                logger.info(f"GDFLIX key {_mask(key)} recovered")
+                k.fails, k.until, k.trial = 0, 0.0, False
+
+    def failure(self, key: str, reason: str):
+        with self._lock:
+            k = self._find(key)
+            if not k:
+                return
+            k.errors += 1
+            k.fails += 1
+            k.trial = False
+            backoff = min(QUARANTINE_MAX, QUARANTINE_BASE * 2 ** (k.fails - 1))
+            k.until = time.time() + backoff
+            k.last_error = reason[:120]
+        logger.warning(f"GDFLIX key {_mask(key)} quarantined for {backoff:.0f}s: {reason}")
+
+    def health(self) -> list[dict]:
+        now = time.time()
+        with self._lock:
+            return [{
+                "key": _mask(k.key), "weight": k.weight, "calls": k.calls, "errors": k.errors,
+                "state": "quarantined" if k.until > now else ("trial" if k.until else "healthy"),
+                "retry_in": max(0.0, k.until - now),
+                "rate_left": int(k.bucket.peek()) if k.bucket else None, "last_error": k.last_error,
+            } for k in self.keys]
+
+POOL = KeyPool(GDFLIX_API_KEYS, GDFLIX_API_KEY)
+
+def _mask(key: str) -> str:
+    return f"…{key[-4:]}"
+
+def _key_identity(key: str) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+def _cache_key(file_id: str, api_key: str | None) -> str:
+    """User keys cache under their own identity; shares made by any pool key are interchangeable."""
+    return f"{file_id}:{_key_identity(api_key) if api_key else 'global'}"
+
+def _share_once(file_id: str, key: str) -> tuple[dict | None, str | None]:
+    """One /share call. Returns (data, key_error): key_error is set when the key, not the file, is at fault."""
     url = f"{GDFLIX_API_BASE}/share"
     try:
-        r = requests.get(url, params={"key": key, "id": file_id}, timeout=30, verify=False)
-        r.raise_for_status()
+        API_CALLS["share"] += 1
+        with tracing.span("gdflix.share", id=file_id) as sp:
+            r = HTTP.get(url, params={"key": key, "id": file_id}, timeout=30, verify=False)
+            sp["status"] = r.status_code
+        if r.status_code in (401, 403, 429) or r.status_code >= 500:
+            return None, f"HTTP {r.status_code}"
+        if r.status_code >= 400:
+            logger.warning(f"GDFLIX HTTP {r.status_code} for {file_id}")
+            return None, None
         data = r.json()
         if data.get("error"):
-            logger.warning(f"GDFLIX error: {data.get('message')}")
-            return None
-        return data
+            message = str(data.get("message") or "")
+            logger.warning(f"GDFLIX error: {message}")
+            return None, (message or "error") if _KEY_ERROR.search(message) else None
+        return data, None
     except Exception as e:
         logger.warning(f"GDFLIX HTTP error: {e}")
+        return None, str(e) or type(e).__name__
+
+def share_file(file_id: str, api_key: str | None = None, refresh: bool = False):
+    """Share through the user's own key, or through the global pool, moving on to the next key when one fails."""
+    if not (api_key or POOL.size()) or not GDFLIX_API_BASE:
+        logger.warning("GDFLIX not configured")
         return None
+    ck = _cache_key(file_id, api_key)
+    if not refresh:
+        cached = SHARE_CACHE.get(ck)
+        if cached:
+            return dict(cached, cached=True)
+    if api_key:
+        data, _ = _share_once(file_id, api_key)
+    else:
+        tried: tuple = ()
+        data = None
+        while len(tried) < POOL.size():
+            key = POOL.acquire(exclude=tried)
+            data, key_error = _share_once(file_id, key)
+            if not key_error:
+                POOL.success(key)
+                break
+            POOL.failure(key, key_error)
+            tried += (key,)
+    if data and (data.get("key") or data.get("name")):
+        SHARE_CACHE.set(ck, {f: data.get(f) for f in SHARE_CACHE_FIELDS})
+    return data
+
+def invalidate(file_id: str | None = None, share_key: str | None = None) -> int:
+    """Drop cached shares for a Drive ID (any API key) or for a GDFlix file key reported dead."""
+    dead = [k for k, v in SHARE_CACHE.items()
+            if (file_id and k.split(":", 1)[0] == file_id) or (share_key and v.get("key") == share_key)]
+    for k in dead:
+        SHARE_CACHE.pop(k)
+    return len(dead)
+
+def cache_stats() -> dict:
+    st = SHARE_CACHE.stats()
+    st["api_calls"] = API_CALLS["share"]
+    st["saved"] = st["hits"]
+    return st
 
 def file_link_from_response(res: dict, file_id: str) -> str:
     key = res.get("key")
-    return f"{GDFLIX_FILE_BASE}/{key or file_id}"
\ No newline at end of file
+    return f"{GDFLIX_FILE_BASE}/{key or file_id}"
@@ -0,0 +1,80 @@
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from app import tracing
+from app.cache import TTLCache
+from app.config import FREEIMAGE_API_KEY, FREEIMAGE_UPLOAD_API
+from app.utils import HTTP, download_bytes
+
+logger = logging.getLogger(__name__)
+
+# "sha:<sha256>" -> hosted URL, so identical images are uploaded once however many URLs point at them;
+# "src:<source url>" -> hosted URL, so a known source isn't even downloaded again.
+HOSTED = TTLCache(ttl=365 * 86400, max_entries=50000, path="imagehost.json", flush_delay=30.0)
+SOURCE_TTL = 30 * 86400     # source URLs get re-pointed upstream; the content hash is what stays true
+UPLOADS = {"uploaded": 0, "deduped": 0, "failed": 0}
+
+_locks: dict = {}
+_locks_guard = threading.Lock()
+
+def configured() -> bool:
+    return bool(FREEIMAGE_API_KEY and FREEIMAGE_UPLOAD_API)
+
+def hosted(url: Optional[str]) -> Optional[str]:
+    return HOSTED.get(f"src:{url}") if url else None
+
+def _lock(digest: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(digest, threading.Lock())
+
+def _upload(data: bytes) -> Optional[str]:
+    with tracing.span("imagehost.upload", bytes=len(data)) as sp:
+        r = HTTP.post(FREEIMAGE_UPLOAD_API, data={"key": FREEIMAGE_API_KEY, "action": "upload", "format": "json"},
+                      files={"source": ("image.jpg", data)}, timeout=60)
+        sp["status"] = r.status_code
+    r.raise_for_status()
+    image = (r.json() or {}).get("image") or {}
+    return image.get("url") or image.get("display_url")
+
+def rehost_bytes(data: bytes) -> Optional[str]:
+    """Blocking: the hosted URL for these image bytes, uploading them only if this content is new."""
+    if not data or not configured():
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    try:
+        with _lock(digest):  # the same image arriving twice at once is uploaded once
+            url = HOSTED.get(f"sha:{digest}")
+            if url:
+                UPLOADS["deduped"] += 1
+                return url
+            try:
+                url = _upload(data)
+            except Exception as e:
+                logger.warning(f"Image upload failed: {e}")
+                url = None
+            if not url:
+                UPLOADS["failed"] += 1
+                return None
+            UPLOADS["uploaded"] += 1
+            HOSTED.set(f"sha:{digest}", url)
+            return url
+    finally:
+        with _locks_guard:
+            _locks.pop(digest, None)
+
+def rehost_url(url: Optional[str]) -> Optional[str]:
+    """Blocking: the hosted copy of a third-party image URL (None when not configured or it can't be fetched)."""
+    if not url or not configured():
+        return None
+    known = hosted(url)
+    if known:
+        return known
+    new = rehost_bytes(download_bytes(url) or b"")
+    if new:
+        HOSTED.set(f"src:{url}", new, ttl=SOURCE_TTL)
+    return new
+
+def stats() -> dict:
+    return dict(HOSTED.stats(), **UPLOADS)
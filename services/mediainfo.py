@@ -3,9 +3,13 @@ import os
 import re
 import subprocess
 import tempfile
+import time
+import urllib.parse
 from typing import Tuple, Optional
 
-import requests
+from app import tracing
+from app.services import containers
+from app.utils import HTTP
 
 logger = logging.getLogger(__name__)
 
@@ -34,38 +38,246 @@ def _map_codec_name(raw: str) -> str:
         return "AAC"
     return raw.strip()
 
-def get_text_from_url_or_path(url: str) -> Optional[str]:
-    temp_path = None
-    target = url
+PROBE_LIMIT = 50 * 1024 * 1024
+
+def _total_size(r) -> Optional[int]:
+    # 206 answers carry the full size after the slash in Content-Range; a 200 means Content-Length is the file.
+    cr = r.headers.get("Content-Range") or ""
+    m = re.search(r"/(\d+)\s*$", cr)
+    if m:
+        return int(m.group(1))
+    cl = r.headers.get("Content-Length")
+    if r.status_code == 200 and cl and cl.isdigit():
+        return int(cl)
+    return None
+
+def _response_filename(r) -> Optional[str]:
+    cd = r.headers.get("Content-Disposition") or ""
+    m = re.search(r"filename\*\s*=\s*[^']*'[^']*'([^;]+)", cd, flags=re.IGNORECASE)
+    if m:
+        return urllib.parse.unquote(m.group(1).strip().strip('"'))
+    m = re.search(r'filename\s*=\s*"([^"]+)"', cd, flags=re.IGNORECASE) or re.search(r"filename\s*=\s*([^;]+)", cd, flags=re.IGNORECASE)
+    if m:
+        return m.group(1).strip()
+    name = urllib.parse.unquote(urllib.parse.urlparse(r.url).path.rsplit("/", 1)[-1])
+    return name if name and not name.endswith(":findpath") and name != "findpath" else None
+
+def download_head(url: str, limit: int = PROBE_LIMIT) -> Tuple[str, float, dict]:
+    """One ranged GET: metadata bytes to a temp file plus total size and filename from the same response.
+
+    Raises on connection/HTTP errors so callers can tell a bad source from a bad file.
+    """
+    with tracing.span("probe.download", host=urllib.parse.urlparse(url).netloc) as sp:
+        temp_path, ttfb, meta = _download_head(url, limit)
+        sp["bytes"], sp["ttfb_ms"] = meta["downloaded"], round(ttfb * 1000)
+        return temp_path, ttfb, meta
+
+def _download_head(url: str, limit: int) -> Tuple[str, float, dict]:
+    started = time.monotonic()
+    r = HTTP.get(url, headers={"Range": f"bytes=0-{limit - 1}"}, stream=True, timeout=60, verify=False)
     try:
-        if url.startswith("http://") or url.startswith("https://"):
-            r = requests.get(url, stream=True, timeout=60, verify=False)
-            r.raise_for_status()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as f:
-                temp_path = f.name
+        r.raise_for_status()
+        ttfb = time.monotonic() - started
+        meta = {"size": _total_size(r), "filename": _response_filename(r), "final_url": r.url}
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as f:
+            temp_path = f.name
+            try:
                 downloaded = 0
-                limit = 50 * 1024 * 1024
                 for chunk in r.iter_content(chunk_size=1024 * 1024):
                     if not chunk: break
                     f.write(chunk)
                     downloaded += len(chunk)
                     if downloaded >= limit:
                         break
-            target = temp_path
+            except Exception:
+                f.close()
+                os.remove(temp_path)
+                raise
+        meta["downloaded"] = downloaded
+        return temp_path, ttfb, meta
+    finally:
+        r.close()
 
-        out = subprocess.check_output(["mediainfo", target], stderr=subprocess.STDOUT)
+def mediainfo_from_path(path: str) -> Optional[str]:
+    try:
+        with tracing.span("mediainfo.exec"):
+            out = subprocess.check_output(["mediainfo", path], stderr=subprocess.STDOUT)
         return out.decode("utf-8", errors="ignore")
     except Exception as e:
         logger.warning(f"mediainfo failed: {e}")
         return None
+
+FAST_HEAD = 512 * 1024          # first read of the container fast path
+FAST_WINDOW = 256 * 1024        # size of each further ranged read (seek targets, a tail moov)
+FAST_READS = 8
+
+class _RangedFile:
+    """Ranged reads over HTTP for the container parser: the head from the first response, then windows on demand.
+
+    The first response asks for the whole probe range but only the head is read up front; if the parser gives up,
+    spill() continues that same response into a temp file for mediainfo instead of downloading the head again.
+    """
+
+    def __init__(self, url: str, limit: int = PROBE_LIMIT):
+        started = time.monotonic()
+        r = HTTP.get(url, headers={"Range": f"bytes=0-{limit - 1}"}, stream=True, timeout=60, verify=False)
+        try:
+            r.raise_for_status()
+            self.ttfb = time.monotonic() - started
+            self.meta = {"size": _total_size(r), "filename": _response_filename(r), "final_url": r.url}
+            self.ranged = r.status_code == 206
+            self._body = r.iter_content(chunk_size=64 * 1024)
+            head = bytearray()
+            for chunk in self._body:
+                head += chunk
+                if len(head) >= FAST_HEAD:
+                    break
+        except Exception:
+            r.close()
+            raise
+        self._response = r
+        self.url = r.url
+        self.limit = limit
+        self.chunks = [(0, bytes(head))]
+        self.downloaded = len(head)
+        self.reads = 0
+
+    def close(self):
+        self._response.close()
+
+    def spill(self) -> str:
+        """The head plus the rest of the first response (up to the probe limit) in a temp file; caller removes it."""
+        head = self.chunks[0][1]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as f:
+            temp_path = f.name
+            try:
+                f.write(head)
+                written = len(head)
+                while written < self.limit:
+                    chunk = next(self._body, b"")
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    written += len(chunk)
+            except Exception:
+                f.close()
+                os.remove(temp_path)
+                raise
+        self.downloaded += written - len(head)
+        return temp_path
+
+    def read(self, offset: int, n: int) -> bytes:
+        size = self.meta["size"]
+        if size is not None:
+            n = max(0, min(n, size - offset))
+        for start, data in self.chunks:
+            if start <= offset and offset + n <= start + len(data):
+                return data[offset - start:offset - start + n]
+        if not self.ranged or self.reads >= FAST_READS:
+            raise containers.Unsupported("ranged read budget spent")
+        self.reads += 1
+        want = max(n, FAST_WINDOW)
+        r = HTTP.get(self.url, headers={"Range": f"bytes={offset}-{offset + want - 1}"}, stream=True, timeout=60, verify=False)
+        try:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise containers.Unsupported("server ignored Range")
+            data = bytearray()
+            for chunk in r.iter_content(chunk_size=64 * 1024):
+                data += chunk
+                if len(data) >= want:
+                    break
+        finally:
+            r.close()
+        data = bytes(data[:want])
+        self.downloaded += len(data)
+        self.chunks.append((offset, data))
+        return data[:n]
+
+def _fast_probe(f: _RangedFile) -> Tuple[float, dict]:
+    meta = dict(f.meta, text=None, tracks=None)
+    with tracing.span("containers.parse") as sp:
+        try:
+            meta["tracks"] = [
+                _audio_record(i, t["channels"], t["bitrate"], t["language"], t["codec"])
+                for i, t in enumerate(containers.audio_tracks(f.read, f.meta["size"]), 1)
+            ]
+        except Exception as e:
+            sp["fallback"] = str(e)[:80]
+        sp["bytes"], sp["reads"] = f.downloaded, f.reads + 1
+    meta["downloaded"] = f.downloaded
+    return f.ttfb, meta
+
+def probe_head(url: str, fast: bool = True) -> Tuple[float, dict]:
+    """Size, filename and audio of a remote file: (ttfb, meta). Matroska/MP4 headers are parsed
+    in-process from a few ranged reads (meta["tracks"]); anything else, or anything the parser
+    can't vouch for, goes through the head download + mediainfo (meta["text"]).
+
+    Raises on connection/HTTP errors so callers can tell a bad source from a bad file.
+    """
+    if fast:
+        f = _RangedFile(url)
+        try:
+            ttfb, meta = _fast_probe(f)
+            if meta["tracks"]:
+                return ttfb, meta
+            # Keep going on the response that brought the head rather than fetching it again
+            with tracing.span("probe.download", host=urllib.parse.urlparse(url).netloc) as sp:
+                temp_path = f.spill()
+                sp["bytes"], sp["ttfb_ms"] = f.downloaded, round(ttfb * 1000)
+            meta = dict(f.meta, downloaded=f.downloaded)
+        finally:
+            f.close()
+    else:
+        temp_path, ttfb, meta = download_head(url)
+    try:
+        meta["text"] = mediainfo_from_path(temp_path)
     finally:
-        if temp_path and os.path.exists(temp_path):
-            try: os.remove(temp_path)
-            except Exception: pass
+        try: os.remove(temp_path)
+        except Exception: pass
+    return ttfb, meta
 
-def parse_audio_block(TEXT: str, ucer_format: bool) -> Tuple[str, Optional[str]]:
+def head_meta(url: str) -> dict:
+    """Size and filename from a HEAD request, for when the probe is skipped; falls back to the URL's last segment."""
+    meta = {"size": None, "filename": None}
+    try:
+        r = HTTP.head(url, timeout=10, verify=False, allow_redirects=True)
+        if r.ok:
+            meta = {"size": _total_size(r), "filename": _response_filename(r)}
+    except Exception as e:
+        logger.warning(f"HEAD failed: {e}")
+    if not meta["filename"]:
+        meta["filename"] = urllib.parse.unquote(urllib.parse.urlparse(url).path.rsplit("/", 1)[-1]) or None
+    return meta
+
+def probe_url(url: str, fast: bool = True) -> Optional[dict]:
+    """Size, filename and audio of a remote file; None when the source can't be read."""
+    try:
+        return probe_head(url, fast)[1]
+    except Exception as e:
+        logger.warning(f"probe failed: {e}")
+        return None
+
+def _audio_record(idx: int, ch: str, bitrate: str, lang: str, codec: str) -> dict:
+    ch = ch.replace(" channels", "")
+    ch = "2.0" if ch == "2" else "5.1" if ch == "6" else "7.1" if ch == "8" else ch
+    upper = codec.upper()
+    if not bitrate:
+        if "HE-AAC" in upper or "HE AAC" in upper:
+            bitrate = "96kb/s" if ch == "2.0" else "192kb/s" if ch == "5.1" else "256kb/s" if ch == "7.1" else ""
+        elif "AAC" in upper:
+            bitrate = "128kb/s" if ch == "2.0" else "320kb/s" if ch == "5.1" else "448kb/s" if ch == "7.1" else ""
+        elif "ATMOS" in upper:
+            bitrate = "768kb/s"
+        elif "DDP" in upper or "E-AC-3" in upper or "DD+" in upper:
+            if ch == "5.1":
+                bitrate = "640kb/s"
+    return {"ID": idx, "CHANNELS": ch, "BITRATE": bitrate, "LANGUAGE": lang, "CODEC": codec}
+
+def audio_records(TEXT: str) -> list:
+    """Audio track records from mediainfo text, in file order."""
     if not TEXT:
-        return "", None
+        return []
     blocks = TEXT.split("\n\n")
     output = []
     raw_blocks = []
@@ -79,15 +291,9 @@ def parse_audio_block(TEXT: str, ucer_format: bool) -> Tuple[str, Optional[str]]
             output.append(d)
             raw_blocks.append(b)
 
-    org_aud = None
     audios = []
-    idx = 1
     for i, d in enumerate(output):
         if "Channel(s)" in d:
-            raw = raw_blocks[i]
-            ch = d["Channel(s)"].replace(" channels", "")
-            ch = "2.0" if ch == "2" else "5.1" if ch == "6" else "7.1" if ch == "8" else ch
-
             bitrate = ""
             for k, v in d.items():
                 if "bit rate" in k.lower() or "bitrate" in k.lower():
@@ -96,32 +302,19 @@ def parse_audio_block(TEXT: str, ucer_format: bool) -> Tuple[str, Optional[str]]
                         bitrate = cand
                         break
             if not bitrate:
-                cand = _extract_bitrate_from_string(raw)
+                cand = _extract_bitrate_from_string(raw_blocks[i])
                 if cand: bitrate = cand
 
             lang = d.get("Language", "")
-            fmt = d.get("Commercial name") or d.get("Format") or ""
-            codec = _map_codec_name(fmt)
-
-            upper = codec.upper()
-            if not bitrate:
-                if "HE-AAC" in upper or "HE AAC" in upper:
-                    bitrate = "96kb/s" if ch == "2.0" else "192kb/s" if ch == "5.1" else "256kb/s" if ch == "7.1" else ""
-                elif "AAC" in upper:
-                    bitrate = "128kb/s" if ch == "2.0" else "320kb/s" if ch == "5.1" else "448kb/s" if ch == "7.1" else ""
-                elif "ATMOS" in upper:
-                    bitrate = "768kb/s"
-                elif "DDP" in upper or "E-AC-3" in upper or "DD+" in upper:
-                    if ch == "5.1":
-                        bitrate = "640kb/s"
-
-            aud = {"ID": idx, "CHANNELS": ch, "BITRATE": bitrate, "LANGUAGE": lang, "CODEC": codec}
-            audios.append(aud)
-            idx += 1
+            codec = _map_codec_name(d.get("Commercial name") or d.get("Format") or "")
+            audios.append(_audio_record(len(audios) + 1, d["Channel(s)"], bitrate, lang, codec))
+    return audios
 
+def render_audio(audios: list, ucer_format: bool) -> Tuple[str, Optional[str]]:
     if not audios:
         return "", None
 
+    org_aud = None
     if not ucer_format:
         lines = ["🎧 <b>Audio:</b>"]
         for a in audios:
@@ -143,4 +336,18 @@ def parse_audio_block(TEXT: str, ucer_format: bool) -> Tuple[str, Optional[str]]
         parts = [p for p in [a.get("CODEC"), a.get("CHANNELS"), br, a.get("LANGUAGE")] if p]
         rows.append(" | ".join(parts))
     block = "🔈 <b>Audio Tracks:</b>\n<b><blockquote>" + "\n".join(rows) + "</blockquote></b>"
-    return block, org_aud
\ No newline at end of file
+    return block, org_aud
+
+def parse_audio_block(TEXT: str, ucer_format: bool) -> Tuple[str, Optional[str]]:
+    return render_audio(audio_records(TEXT), ucer_format)
+
+def probe_audio_block(probe: Optional[dict], ucer_format: bool) -> Tuple[str, Optional[str]]:
+    """Audio block of a probe, whichever path produced it (parsed container tracks or mediainfo text)."""
+    if not probe:
+        return "", None
+    if probe.get("tracks"):
+        return render_audio(probe["tracks"], ucer_format)
+    return parse_audio_block(probe.get("text") or "", ucer_format)
+
+def probe_has_audio_info(probe: Optional[dict]) -> bool:
+    return bool(probe and (probe.get("tracks") or probe.get("text")))
@@ -1,11 +1,16 @@
 import logging
 import re
-import requests
 from typing import Optional, Tuple
+from app.cache import TTLCache
 from app.config import TMDB_API_KEY
+from app import tracing
+from app.services import tmdb_index
+from app.utils import HTTP
 
 logger = logging.getLogger(__name__)
 
+IMAGE_BASE = "https://image.tmdb.org/t/p"
+
 LANG_MAP = {
     "en": "English", "ta": "Tamil", "te": "Telugu", "ml": "Malayalam",
     "hi": "Hindi", "kn": "Kannada", "mr": "Marathi", "bn": "Bengali",
@@ -51,6 +56,12 @@ def extract_title_year_from_filename(filename: str) -> Tuple[str, str]:
     return title_part, year
 
 def strict_match(raw_title: str, year: str):
+    with tracing.span("tmdb.match", title=raw_title[:80]) as sp:
+        res = _strict_match(raw_title, year)
+        sp["hit"] = bool(res[4])
+        return res
+
+def _strict_match(raw_title: str, year: str):
     if not TMDB_API_KEY:
         logger.warning("TMDB_API_KEY not set")
         return None, None, None, None, None
@@ -69,7 +80,8 @@ def strict_match(raw_title: str, year: str):
         params = {"api_key": TMDB_API_KEY, "query": search_title, "include_adult": "false", "page": 1}
         if have_year: params["year"] = year
         try:
-            r = requests.get("https://api.themoviedb.org/3/search/movie", params=params, timeout=10)
+            with tracing.span("tmdb.search_movie"):
+                r = HTTP.get("https://api.themoviedb.org/3/search/movie", params=params, timeout=10)
             if r.status_code != 200: return []
             results = r.json().get("results") or []
             if not have_year: return results
@@ -81,7 +93,8 @@ def strict_match(raw_title: str, year: str):
         params = {"api_key": TMDB_API_KEY, "query": search_title, "include_adult": "false", "page": 1}
         if have_year: params["first_air_date_year"] = year
         try:
-            r = requests.get("https://api.themoviedb.org/3/search/tv", params=params, timeout=10)
+            with tracing.span("tmdb.search_tv"):
+                r = HTTP.get("https://api.themoviedb.org/3/search/tv", params=params, timeout=10)
             if r.status_code != 200: return []
             results = r.json().get("results") or []
             if not have_year: return results
@@ -89,6 +102,10 @@ def strict_match(raw_title: str, year: str):
         except Exception:
             return []
 
+    local = _local_match(search_title, year, have_year)
+    if local:
+        return local
+
     item, ctype = None, None
     m_results = search_movie()
     if m_results:
@@ -100,7 +117,8 @@ def strict_match(raw_title: str, year: str):
 
     if not item and not have_year:
         try:
-            r = requests.get("https://api.themoviedb.org/3/search/multi",
+            with tracing.span("tmdb.search_multi"):
+                r = HTTP.get("https://api.themoviedb.org/3/search/multi",
                              params={"api_key": TMDB_API_KEY, "query": search_title, "include_adult": "false", "page": 1},
                              timeout=10)
             if r.status_code == 200:
@@ -115,6 +133,21 @@ def strict_match(raw_title: str, year: str):
     if not item:
         return None, None, None, None, None
 
+    _learn(item, ctype)
+    return _result_from_item(item, ctype, search_title, year)
+
+def _learn(item: dict, ctype: str | None):
+    """Teach the offline index the English title of a title the API resolved (the exports only have originals)."""
+    name = item.get("title") or item.get("name")
+    if not name or not item.get("id") or name == (item.get("original_title") or item.get("original_name")):
+        return
+    try:
+        if tmdb_index.available():
+            tmdb_index.learn(ctype or "movie", int(item["id"]), [name])
+    except Exception as e:
+        logger.warning(f"TMDB local index learn failed: {e}")
+
+def _result_from_item(item: dict, ctype: str | None, search_title: str, year: str):
     tmdb_id = item.get("id")
     tmdb_title = item.get("title") or item.get("name") or search_title
     if item.get("release_date"):
@@ -137,22 +170,128 @@ def strict_match(raw_title: str, year: str):
 
     return tmdb_title, tmdb_year, lang_code, poster_url, tmdb_url
 
+def _details(ctype: str, tmdb_id: int) -> Optional[dict]:
+    try:
+        with tracing.span("tmdb.details", id=f"{ctype}:{tmdb_id}"):
+            r = HTTP.get(f"https://api.themoviedb.org/3/{ctype}/{tmdb_id}", params={"api_key": TMDB_API_KEY}, timeout=10)
+        return r.json() if r.status_code == 200 else None
+    except Exception:
+        return None
+
+def _local_match(search_title: str, year: str, have_year: bool):
+    """Resolve via the offline index; one details call replaces the movie/tv/multi searches."""
+    try:
+        if not tmdb_index.available():
+            return None
+        with tracing.span("tmdb.index"):
+            candidates = tmdb_index.confident(tmdb_index.lookup(search_title, limit=5), search_title, have_year)
+    except Exception as e:
+        logger.warning(f"TMDB local index lookup failed: {e}")
+        return None
+    for kind, tmdb_id, _, _ in candidates[:3]:
+        item = _details(kind, tmdb_id)
+        if not item:
+            continue
+        if have_year and (item.get("release_date") or item.get("first_air_date") or "")[:4] != year:
+            continue
+        _learn(item, kind)
+        return _result_from_item(item, kind, search_title, year)
+    return None
+
+IMAGE_KINDS = ("posters", "backdrops", "logos")
+IMAGES_CACHE = TTLCache(ttl=6 * 3600, max_entries=500)
+
+def parse_tmdb_url(tmdb_url: str | None) -> Optional[Tuple[str, str]]:
+    m = re.search(r"themoviedb\.org/(movie|tv)/(\d+)", tmdb_url or "")
+    return (m.group(1), m.group(2)) if m else None
+
+def images(ctype: str, tmdb_id) -> Optional[dict]:
+    """Every poster/backdrop/logo of a title (all languages), cached so galleries and replies share one call."""
+    key = f"{ctype}:{tmdb_id}"
+    cached = IMAGES_CACHE.get(key)
+    if cached is not None:
+        return cached
+    if not TMDB_API_KEY:
+        return None
+    try:
+        with tracing.span("tmdb.images", id=key):
+            r = HTTP.get(f"https://api.themoviedb.org/3/{ctype}/{tmdb_id}/images", params={"api_key": TMDB_API_KEY}, timeout=10)
+        if r.status_code != 200:
+            return None
+        js = r.json()
+    except Exception as e:
+        logger.warning(f"TMDB images failed for {key}: {e}")
+        return None
+    out = {
+        kind: [
+            {"path": i["file_path"], "lang": i.get("iso_639_1") or "", "w": i.get("width") or 0,
+             "h": i.get("height") or 0, "votes": i.get("vote_average") or 0}
+            for i in js.get(kind) or [] if i.get("file_path") and not i["file_path"].endswith(".svg")
+        ]
+        for kind in IMAGE_KINDS
+    }
+    IMAGES_CACHE.set(key, out)
+    return out
+
+def pick_image(imgs: dict | None, kind: str, lang: str = "en") -> Optional[str]:
+    """Preferred language first, then language-neutral art; art with text in any other language is never picked."""
+    items = (imgs or {}).get(kind) or []
+    chosen = next((i for i in items if i["lang"] == lang), None)
+    if not chosen:
+        chosen = next((i for i in items if i["lang"] in ("", "xx")), None)
+    return f"{IMAGE_BASE}/original{chosen['path']}" if chosen else None
+
 def backdrop_from_tmdb_url(tmdb_url: str | None) -> Optional[str]:
-    if not tmdb_url or not TMDB_API_KEY:
+    ref = parse_tmdb_url(tmdb_url)
+    if not ref or not TMDB_API_KEY:
         return None
-    m = re.search(r"themoviedb\.org/(movie|tv)/(\d+)", tmdb_url)
-    if not m: return None
-    ctype, tmdb_id = m.group(1), m.group(2)
+    return pick_image(images(*ref), "backdrops")
+
+def album_urls(tmdb_url: str | None, poster_url: str | None = None) -> list[str]:
+    """Poster, backdrop and logo (when TMDB has one) from a single /images call, poster first."""
+    ref = parse_tmdb_url(tmdb_url)
+    imgs = images(*ref) if ref else None
+    logo = pick_image(imgs, "logos")
+    urls = [poster_url or pick_image(imgs, "posters"), pick_image(imgs, "backdrops"),
+            logo.replace("/original/", "/w500/") if logo else None]
+    return [u for u in dict.fromkeys(urls) if u]
+
+def search_titles(query: str, limit: int = 20) -> list[dict]:
+    """Compact /search/multi results (movies and TV only) for list-style UIs."""
+    return search_page(query, limit)[0]
+
+def search_page(query: str, limit: int = 20) -> Tuple[list[dict], bool]:
+    """search_titles() plus whether those are all of TMDB's matches (its whole result set fit on page 1)."""
+    if not TMDB_API_KEY or not query.strip():
+        return [], False
     try:
-        api_url = f"https://api.themoviedb.org/3/{ctype}/{tmdb_id}/images"
-        r = requests.get(api_url, params={"api_key": TMDB_API_KEY, "include_image_language": "en,null"}, timeout=10)
-        if r.status_code != 200: return None
-        backdrops = r.json().get("backdrops") or []
-        if not backdrops: return None
-        chosen = next((b for b in backdrops if b.get("iso_639_1") == "en"), None)
-        if not chosen:
-            chosen = next((b for b in backdrops if b.get("iso_639_1") in (None, "", "xx")), backdrops[0])
-        fp = chosen.get("file_path")
-        return f"https://image.tmdb.org/t/p/original{fp}" if fp else None
-    except Exception:
-        return None
\ No newline at end of file
+        with tracing.span("tmdb.search"):
+            r = HTTP.get("https://api.themoviedb.org/3/search/multi",
+                         params={"api_key": TMDB_API_KEY, "query": query, "include_adult": "false", "page": 1},
+                         timeout=10)
+        if r.status_code != 200:
+            return [], False
+        js = r.json()
+        page = js.get("results") or []
+        out = []
+        complete = isinstance(js.get("total_results"), int) and js["total_results"] <= len(page)
+        for it in page:
+            mt = it.get("media_type")
+            if mt not in ("movie", "tv") or not it.get("id"):
+                continue
+            out.append({
+                "id": it["id"],
+                "type": mt,
+                "title": it.get("title") or it.get("name") or "Unknown",
+                "year": (it.get("release_date") or it.get("first_air_date") or "????")[:4] or "????",
+                "poster_path": it.get("poster_path"),
+                "lang": it.get("original_language") or "",
+                "popularity": it.get("popularity") or 0,
+            })
+            if len(out) >= limit:
+                complete = complete and it is page[-1]
+                break
+        return out, complete
+    except Exception as e:
+        logger.warning(f"TMDB search failed: {e}")
+        return [], False
@@ -0,0 +1,354 @@
+"""Optional offline TMDB title index built from the daily ID export dumps.
+
+Build / refresh (streams the .json.gz exports; unchanged titles are skipped):
+    python -m app.services.tmdb_index build                      # download latest exports
+    python -m app.services.tmdb_index build --movie m.json.gz --tv t.json.gz
+
+The exports only carry original titles, so English titles and aliases are added separately: titles the
+bot resolves through the API are learned as it runs, and the most popular ones can be filled up front:
+    python -m app.services.tmdb_index aliases --top 20000       # needs TMDB_API_KEY
+"""
+import argparse
+import datetime
+import difflib
+import gzip
+import io
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.config import TMDB_API_KEY, TMDB_INDEX_PATH
+from app.utils import HTTP
+
+logger = logging.getLogger(__name__)
+
+EXPORT_URL = "http://files.tmdb.org/p/exports/{name}_ids_{date}.json.gz"
+EXPORT_NAMES = {"movie": "movie", "tv": "tv_series"}
+BATCH = 5000
+CONFIDENT_SCORE = 0.86
+CONFIDENT_MARGIN = 0.04
+ALIAS_REGIONS = ("US", "GB", "IN")
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    kind TEXT NOT NULL, id INTEGER NOT NULL, title TEXT NOT NULL, norm TEXT NOT NULL,
+    popularity REAL NOT NULL DEFAULT 0, gen INTEGER NOT NULL, PRIMARY KEY (kind, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL, kind TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (token, kind, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS aliases (
+    kind TEXT NOT NULL, id INTEGER NOT NULL, norm TEXT NOT NULL, title TEXT NOT NULL, PRIMARY KEY (kind, id, norm)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower().replace("&", " and ")
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text)).strip()
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _reader(path: str | None = None) -> Optional[sqlite3.Connection]:
+    path = path or TMDB_INDEX_PATH
+    if not path or not os.path.exists(path):
+        return None
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != path:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        _local.conn, _local.path = conn, path
+    return conn
+
+def available() -> bool:
+    return _reader() is not None
+
+# ---- build ----
+
+def _iter_export(fileobj) -> Iterator[Tuple[int, str, float]]:
+    """(id, original title, popularity) per export line; the dumps carry no other titles."""
+    with gzip.GzipFile(fileobj=fileobj) as gz:
+        for line in io.TextIOWrapper(gz, encoding="utf-8"):
+            try:
+                js = json.loads(line)
+            except ValueError:
+                continue
+            if js.get("adult"):
+                continue
+            title = js.get("original_title") or js.get("original_name")
+            if js.get("id") and title:
+                yield int(js["id"]), title, float(js.get("popularity") or 0)
+
+def _add_aliases(conn: sqlite3.Connection, kind: str, tid: int, titles: Iterable[str]) -> int:
+    rows = {normalize(t): t for t in titles if t}
+    rows.pop("", None)
+    conn.executemany("INSERT OR IGNORE INTO aliases(kind, id, norm, title) VALUES (?,?,?,?)",
+                     [(kind, tid, norm, t) for norm, t in rows.items()])
+    conn.executemany("INSERT OR IGNORE INTO tokens(token, kind, id) VALUES (?,?,?)",
+                     [(tok, kind, tid) for tok in {w for norm in rows for w in norm.split()}])
+    return len(rows)
+
+def _ingest(conn: sqlite3.Connection, kind: str, rows: Iterable[Tuple[int, str, float]], gen: int) -> dict:
+    counts = {"seen": 0, "added": 0, "changed": 0}
+    batch = []
+
+    def flush():
+        existing = dict(conn.execute(
+            f"SELECT id, norm FROM titles WHERE kind=? AND id IN ({','.join('?' * len(batch))})",
+            [kind] + [r[0] for r in batch],
+        ).fetchall())
+        for tid, title, pop in batch:
+            norm = normalize(title)
+            old = existing.get(tid)
+            if old is not None and old == norm:
+                continue
+            # New or retitled: rewrite its token postings (keeping its aliases')
+            if old is not None:
+                conn.execute("DELETE FROM tokens WHERE kind=? AND id=?", (kind, tid))
+                names = [norm] + [r[0] for r in conn.execute("SELECT norm FROM aliases WHERE kind=? AND id=?", (kind, tid))]
+                counts["changed"] += 1
+            else:
+                names = [norm]
+                counts["added"] += 1
+            conn.executemany("INSERT OR IGNORE INTO tokens(token, kind, id) VALUES (?,?,?)",
+                             [(t, kind, tid) for t in {w for n in names for w in n.split()}])
+        conn.executemany(
+            "INSERT INTO titles(kind, id, title, norm, popularity, gen) VALUES (?,?,?,?,?,?) "
+            "ON CONFLICT(kind, id) DO UPDATE SET title=excluded.title, norm=excluded.norm, "
+            "popularity=excluded.popularity, gen=excluded.gen",
+            [(kind, tid, title, normalize(title), pop, gen) for tid, title, pop in batch],
+        )
+        conn.commit()
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        counts["seen"] += 1
+        if len(batch) >= BATCH:
+            flush()
+    if batch:
+        flush()
+
+    # Ids missing from this export were removed upstream
+    stale = [r[0] for r in conn.execute("SELECT id FROM titles WHERE kind=? AND gen<?", (kind, gen))]
+    for i in range(0, len(stale), BATCH):
+        chunk = stale[i:i + BATCH]
+        marks = ",".join("?" * len(chunk))
+        conn.execute(f"DELETE FROM tokens WHERE kind=? AND id IN ({marks})", [kind] + chunk)
+        conn.execute(f"DELETE FROM aliases WHERE kind=? AND id IN ({marks})", [kind] + chunk)
+        conn.execute(f"DELETE FROM titles WHERE kind=? AND id IN ({marks})", [kind] + chunk)
+    conn.commit()
+    counts["removed"] = len(stale)
+    return counts
+
+def build_from_file(path: str, kind: str, index_path: str | None = None, export_date: str | None = None) -> dict:
+    """Stream one export dump (local .json.gz) into the index."""
+    index_path = index_path or TMDB_INDEX_PATH
+    conn = _connect(index_path)
+    try:
+        gen = int(time.time())
+        with open(path, "rb") as f:
+            counts = _ingest(conn, kind, _iter_export(f), gen)
+        if export_date:
+            conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (f"export_{kind}", export_date))
+            conn.commit()
+        return counts
+    finally:
+        conn.close()
+
+def build_from_exports(index_path: str | None = None, date: datetime.date | None = None) -> dict:
+    """Download and ingest the latest movie and TV exports, skipping kinds already at that date."""
+    index_path = index_path or TMDB_INDEX_PATH
+    conn = _connect(index_path)
+    results = {}
+    try:
+        for kind, name in EXPORT_NAMES.items():
+            day = date or datetime.date.today()
+            for back in range(3):  # today's dump appears around 08:00 UTC
+                stamp = (day - datetime.timedelta(days=back)).strftime("%m_%d_%Y")
+                done = conn.execute("SELECT value FROM meta WHERE key=?", (f"export_{kind}",)).fetchone()
+                if done and done[0] == stamp:
+                    results[kind] = {"skipped": stamp}
+                    break
+                r = HTTP.get(EXPORT_URL.format(name=name, date=stamp), stream=True, timeout=60)
+                if r.status_code != 200:
+                    r.close()
+                    continue
+                try:
+                    r.raw.decode_content = False
+                    counts = _ingest(conn, kind, _iter_export(r.raw), int(time.time()))
+                finally:
+                    r.close()
+                conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (f"export_{kind}", stamp))
+                conn.commit()
+                results[kind] = dict(counts, export=stamp)
+                break
+    finally:
+        conn.close()
+    return results
+
+def learn(kind: str, tid: int, titles: Iterable[str], index_path: str | None = None) -> int:
+    """Add other names (English title, aliases) of an indexed title; returns how many were offered."""
+    index_path = index_path or TMDB_INDEX_PATH
+    if not index_path or not os.path.exists(index_path):
+        return 0
+    with _write_lock:
+        conn = _connect(index_path)
+        try:
+            if not conn.execute("SELECT 1 FROM titles WHERE kind=? AND id=?", (kind, tid)).fetchone():
+                return 0
+            n = _add_aliases(conn, kind, tid, titles)
+            conn.commit()
+            return n
+        finally:
+            conn.close()
+
+def _api_titles(kind: str, tid: int) -> List[str]:
+    """The English title plus the alternative titles TMDB lists for English-speaking regions."""
+    r = HTTP.get(f"https://api.themoviedb.org/3/{kind}/{tid}",
+                 params={"api_key": TMDB_API_KEY, "append_to_response": "alternative_titles"}, timeout=10)
+    if r.status_code != 200:
+        return []
+    js = r.json()
+    alt = js.get("alternative_titles") or {}
+    return [js.get("title") or js.get("name")] + [
+        a.get("title") for a in alt.get("titles") or alt.get("results") or [] if a.get("iso_3166_1") in ALIAS_REGIONS
+    ]
+
+def fill_aliases(top: int, index_path: str | None = None) -> dict:
+    """Fetch English titles/aliases for the `top` most popular titles that have none yet."""
+    index_path = index_path or TMDB_INDEX_PATH
+    conn = _connect(index_path)
+    try:
+        todo = conn.execute(
+            "SELECT kind, id, title FROM titles t WHERE NOT EXISTS "
+            "(SELECT 1 FROM aliases a WHERE a.kind=t.kind AND a.id=t.id) ORDER BY popularity DESC LIMIT ?", (top,),
+        ).fetchall()
+    finally:
+        conn.close()
+    counts = {"titles": 0, "aliases": 0, "failed": 0}
+    for kind, tid, original in todo:
+        try:
+            names = _api_titles(kind, tid)
+        except Exception as e:
+            logger.warning(f"TMDB aliases failed for {kind}:{tid}: {e}")
+            counts["failed"] += 1
+            continue
+        # The original goes in too, so a title known by no other name isn't fetched again next run
+        counts["aliases"] += learn(kind, tid, [original] + names, index_path)
+        counts["titles"] += 1
+    return counts
+
+# ---- lookup ----
+
+def lookup(title: str, kind: str | None = None, limit: int = 5, index_path: str | None = None) -> List[Tuple[str, int, str, float]]:
+    """Fuzzy/prefix candidates as (kind, id, best-matching title, score), best first."""
+    conn = _reader(index_path)
+    q = normalize(title)
+    if conn is None or not q:
+        return []
+    tokens = q.split()
+    clauses, params = [], []
+    for i, t in enumerate(tokens):
+        clauses.append("token = ?"); params.append(t)
+        # last token may be partial; short tokens get a prefix probe to absorb typos near the end
+        if i == len(tokens) - 1 or len(t) >= 6:
+            stem = t if i == len(tokens) - 1 else t[:5]
+            clauses.append("(token >= ? AND token < ?)"); params += [stem, stem + "\uffff"]
+    kind_sql = " AND kind = ?" if kind else ""
+    if kind:
+        params.append(kind)
+    rows = conn.execute(
+        f"SELECT kind, id, COUNT(*) AS c FROM tokens WHERE ({' OR '.join(clauses)}){kind_sql} "
+        "GROUP BY kind, id ORDER BY c DESC LIMIT 400",
+        params,
+    ).fetchall()
+    if not rows:
+        return []
+    pops, names = {}, {}
+    for i in range(0, len(rows), 500):
+        chunk = rows[i:i + 500]
+        where = " OR ".join("(kind=? AND id=?)" for _ in chunk)
+        params = [v for r in chunk for v in (r[0], r[1])]
+        for k, tid, t, norm, pop in conn.execute(f"SELECT kind, id, title, norm, popularity FROM titles WHERE {where}", params):
+            pops[(k, tid)] = pop
+            names.setdefault((k, tid), []).append((t, norm))
+        try:
+            for k, tid, t, norm in conn.execute(f"SELECT kind, id, title, norm FROM aliases WHERE {where}", params):
+                names.setdefault((k, tid), []).append((t, norm))
+        except sqlite3.OperationalError:
+            pass  # index built before aliases existed; the next build adds the table
+    scored = []
+    for key, pop in pops.items():
+        best = None
+        for t, norm in names[key]:
+            ratio = difflib.SequenceMatcher(None, q, norm).ratio()
+            words = norm.split()
+            coverage = sum(1 for tok in tokens if any(w.startswith(tok) for w in words)) / len(tokens)
+            extra = max(0, len(words) - len(tokens)) / max(len(words), 1)
+            score = 0.6 * ratio + 0.4 * coverage - 0.1 * extra + min(0.05, math.log1p(pop) / 200)
+            if best is None or score > best[1]:
+                best = (t, score)
+        scored.append((key[0], key[1], best[0], round(best[1], 4)))
+    scored.sort(key=lambda x: x[3], reverse=True)
+    return scored[:limit]
+
+def confident(candidates: List[Tuple[str, int, str, float]], query: str, have_year: bool = False) -> List[Tuple[str, int, str, float]]:
+    """Candidates good enough to skip the search API (still verified against details by the caller).
+
+    A high score alone isn't enough ("Maari" vs "Maari 2"): the title must match exactly once normalized,
+    unless the caller has a year to check the details against.
+    """
+    if not candidates or candidates[0][3] < CONFIDENT_SCORE:
+        return []
+    top, q = candidates[0][3], normalize(query)
+    return [c for c in candidates if c[3] >= CONFIDENT_SCORE and top - c[3] <= CONFIDENT_MARGIN
+            and (have_year or normalize(c[2]) == q)]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build the offline TMDB title index")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("--index", default=TMDB_INDEX_PATH or "tmdb_index.sqlite3")
+    b.add_argument("--movie", help="local movie_ids_*.json.gz")
+    b.add_argument("--tv", help="local tv_series_ids_*.json.gz")
+    a = sub.add_parser("aliases")
+    a.add_argument("--index", default=TMDB_INDEX_PATH or "tmdb_index.sqlite3")
+    a.add_argument("--top", type=int, default=20000, help="most popular titles without aliases to fill")
+    s = sub.add_parser("search")
+    s.add_argument("--index", default=TMDB_INDEX_PATH or "tmdb_index.sqlite3")
+    s.add_argument("title")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.cmd == "build":
+        started = time.monotonic()
+        if args.movie or args.tv:
+            out = {}
+            if args.movie: out["movie"] = build_from_file(args.movie, "movie", args.index)
+            if args.tv: out["tv"] = build_from_file(args.tv, "tv", args.index)
+        else:
+            out = build_from_exports(args.index)
+        print(json.dumps(out), f"in {time.monotonic() - started:.1f}s")
+    elif args.cmd == "aliases":
+        print(json.dumps(fill_aliases(args.top, args.index)))
+    else:
+        for row in lookup(args.title, index_path=args.index):
+            print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import logging
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional
+
+import requests
+
+from app import tracing
+from app.utils import HTTP
+
+from app.services.mediainfo import probe_head
+
+logger = logging.getLogger(__name__)
+
+RACE_TIMEOUT = 2           # a 1-byte ping; past this, rank on past stats rather than hold up the probe itself
+STATS_FRESH_FOR = 300      # seconds a latency sample is trusted before re-racing
+EWMA_ALPHA = 0.3
+COOLDOWN_BASE = 30         # first failure parks an index for 30s, doubling per streak
+COOLDOWN_MAX = 600
+SEARCH_DEADLINE = 6        # seconds; indexes slower than this are left out of the merged results
+SEARCH_PER_INDEX = 50
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+_stats_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=12, thread_name_prefix="index-race")
+
+# base -> {"ewma": seconds | None, "ok": int, "fail": int, "streak": int, "down_until": ts, "sampled_at": ts}
+INDEX_STATS: Dict[str, Dict[str, Any]] = {}
+
+def index_base(url: str) -> str:
+    p = urllib.parse.urlparse(url)
+    return f"{p.scheme}://{p.netloc}"
+
+def _entry(base: str) -> Dict[str, Any]:
+    return INDEX_STATS.setdefault(base, {"ewma": None, "ok": 0, "fail": 0, "streak": 0, "down_until": 0.0, "sampled_at": 0.0})
+
+def record_success(base: str, latency: float):
+    with _stats_lock:
+        st = _entry(base)
+        st["ewma"] = latency if st["ewma"] is None else (EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * st["ewma"])
+        st["ok"] += 1
+        st["streak"] = 0
+        st["down_until"] = 0.0
+        st["sampled_at"] = time.time()
+
+def record_failure(base: str):
+    with _stats_lock:
+        st = _entry(base)
+        st["fail"] += 1
+        st["streak"] += 1
+        st["down_until"] = time.time() + min(COOLDOWN_MAX, COOLDOWN_BASE * 2 ** (st["streak"] - 1))
+
+def is_healthy(base: str) -> bool:
+    st = INDEX_STATS.get(base)
+    return not st or st["down_until"] <= time.time()
+
+def _rank_key(url: str):
+    st = INDEX_STATS.get(index_base(url)) or {}
+    ewma = st.get("ewma")
+    return (0 if is_healthy(index_base(url)) else 1, ewma if ewma is not None else float("inf"))
+
+def _needs_race(urls: List[str]) -> bool:
+    now = time.time()
+    for u in urls:
+        st = INDEX_STATS.get(index_base(u))
+        if is_healthy(index_base(u)) and (not st or st["ewma"] is None or now - st["sampled_at"] > STATS_FRESH_FOR):
+            return True
+    return False
+
+def _ping(url: str) -> str:
+    base = index_base(url)
+    started = time.monotonic()
+    try:
+        r = HTTP.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=RACE_TIMEOUT, verify=False)
+        r.close()
+        if r.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {r.status_code}")
+    except Exception as e:
+        record_failure(base)
+        raise e
+    record_success(base, time.monotonic() - started)
+    return url
+
+def race(urls: List[str]) -> Optional[str]:
+    """Return the first candidate to answer a 1-byte ranged GET; stragglers still update stats."""
+    pending = {_executor.submit(_ping, u) for u in urls}
+    deadline = time.monotonic() + RACE_TIMEOUT
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            if fut.exception() is None:
+                return fut.result()
+    return None
+
+def order_sources(urls: List[str]) -> List[str]:
+    urls = list(dict.fromkeys(u for u in urls if u))
+    if len(urls) <= 1:
+        return urls
+    winner = race(urls) if _needs_race(urls) else None
+    ranked = sorted(urls, key=_rank_key)
+    if winner:
+        ranked.remove(winner)
+        ranked.insert(0, winner)
+    return ranked
+
+def probe_sources(urls: List[str], fast: bool = True) -> Optional[dict]:
+    """Probe the fastest healthy source, failing over to the next one on connection or HTTP errors."""
+    with tracing.span("index.order", sources=len(urls)):
+        ordered = order_sources(urls)
+    for url in ordered:
+        base = index_base(url)
+        try:
+            ttfb, meta = probe_head(url, fast)
+        except Exception as e:
+            logger.warning(f"Index {base} failed, trying next: {e}")
+            record_failure(base)
+            continue
+        record_success(base, ttfb)
+        return meta
+    return None
+
+def _search_one(url: str, query: str) -> List[dict]:
+    """One Google Drive Index search (POST {base}/N:search), files only."""
+    base = index_base(url)
+    started = time.monotonic()
+    try:
+        r = HTTP.post(url, json={"q": query, "page_token": None, "page_index": 0}, timeout=SEARCH_DEADLINE, verify=False)
+        r.raise_for_status()
+        files = ((r.json() or {}).get("data") or {}).get("files") or []
+    except Exception as e:
+        record_failure(base)
+        raise e
+    record_success(base, time.monotonic() - started)
+    return [{"id": f["id"], "name": f.get("name") or "", "size": int(f.get("size") or 0), "index": base}
+            for f in files[:SEARCH_PER_INDEX] if f.get("id") and f.get("mimeType") != FOLDER_MIME]
+
+def _words(text: str) -> List[str]:
+    return re.sub(r"[^\w]+", " ", text.lower()).split()
+
+def _match_score(name: str, terms: List[str]) -> float:
+    words = _words(name)
+    if not terms or not words:
+        return 0.0
+    whole = sum(1 for t in terms if t in words)
+    prefix = sum(1 for t in terms if any(w.startswith(t) for w in words))
+    phrase = " ".join(terms) in " ".join(words)
+    return (whole + 0.5 * (prefix - whole)) / len(terms) + 0.5 * phrase + 0.25 * (words[:len(terms)] == terms)
+
+def search(urls: List[str], query: str) -> tuple[List[dict], List[str]]:
+    """Search every index concurrently and merge by Drive ID, best name match first.
+
+    Returns (results, missed): each result lists the indexes that have it; missed are the indexes
+    that errored or were still answering at the deadline.
+    """
+    futures = {_executor.submit(_search_one, u, query): u for u in dict.fromkeys(urls)}
+    with tracing.span("index.search", indexes=len(futures)) as sp:
+        done, late = wait(futures, timeout=SEARCH_DEADLINE)
+        sp["late"] = len(late)
+    merged: Dict[str, dict] = {}
+    missed = [index_base(futures[f]) for f in late]
+    for fut in futures:
+        if fut not in done:
+            continue
+        if fut.exception() is not None:
+            logger.warning(f"Index search {index_base(futures[fut])} failed: {fut.exception()}")
+            missed.append(index_base(futures[fut]))
+            continue
+        for f in fut.result():
+            hit = merged.setdefault(f["id"], dict(f, indexes=[]))
+            hit["indexes"].append(f["index"])
+    terms = _words(query)
+    ranked = sorted(merged.values(), key=lambda f: (-_match_score(f["name"], terms), -len(f["indexes"]), f["name"].lower()))
+    return ranked, missed
+
+def index_stats() -> Dict[str, Dict[str, Any]]:
+    with _stats_lock:
+        return {b: dict(st) for b, st in INDEX_STATS.items()}
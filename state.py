@@ -2,13 +2,15 @@ import json
 import logging
 import os
 import threading
-from typing import Dict, Any, Set, List
-import requests
+from app import access, usersettings
 from app.config import STATE_REMOTE_URL
+from app.utils import HTTP
 
 logger = logging.getLogger(__name__)
 STATE_FILE = "bot_state.json"
-_state_lock = threading.Lock()
+_state_lock = threading.RLock()
+_SAVE_COUNT = [0]  # bumped on every save so a background reconcile can tell local edits happened
+_REMOTE_RECONCILED = threading.Event()
 
 # Runtime state
 BOT_STATS = {
@@ -17,9 +19,7 @@ BOT_STATS = {
 BOT_CONFIG = {
     "GDFLIX_GLOBAL": True  # default ON, toggle in /admin
 }
-ALLOWED_USERS: List[int] = []
-AUTHORIZED_CHATS: Set[int] = set()
-UCER_SETTINGS: Dict[int, Dict[str, Any]] = {}  # per-user config
+# Per-user UCER settings live in app.usersettings (disk-backed, only active users resident)
 
 def track_user(user_id: int):
     try:
@@ -28,51 +28,38 @@ def track_user(user_id: int):
         pass
 
 def _apply_state_dict(data: dict):
-    global UCER_SETTINGS, ALLOWED_USERS, AUTHORIZED_CHATS
     try:
-        UCER_SETTINGS = {int(k): v for k, v in (data.get("ucer_settings") or {}).items()}
-        for uid, cfg in UCER_SETTINGS.items():
-            cfg.setdefault("gdflix", None)
-            # migrate legacy index => indexes
-            idxs = cfg.get("indexes")
-            if not isinstance(idxs, list):
-                cfg["indexes"] = []
-                if isinstance(cfg.get("index"), str):
-                    cfg["indexes"].append(cfg["index"])
-            cfg["indexes"] = (cfg.get("indexes") or [])[:6]
-            cfg.setdefault("full_name", False)
-            cfg.setdefault("audio_format", False)
-
-        ALLOWED_USERS = [int(x) for x in (data.get("allowed_users") or [])]
-        AUTHORIZED_CHATS = set(int(x) for x in (data.get("authorized_chats") or []))
-        logger.info(f"State applied: users={len(ALLOWED_USERS)} groups={len(AUTHORIZED_CHATS)} ucer={len(UCER_SETTINGS)}")
+        usersettings.load(data.get("ucer_settings"))
+        # Grants live in app.access; older snapshots only have the flat allowed_users/authorized_chats lists.
+        access.load(data.get("access"), data.get("allowed_users"), data.get("authorized_chats"))
+        logger.info(f"State applied: users={len(access.USERS)} groups={len(access.CHATS)} ucer={usersettings.count()}")
     except Exception as e:
         logger.warning(f"Failed to apply state: {e}")
 
-def _load_state_remote() -> bool:
+def _fetch_state_remote() -> dict | None:
     if not STATE_REMOTE_URL:
-        return False
+        return None
     try:
-        r = requests.get(STATE_REMOTE_URL, timeout=10)
+        r = HTTP.get(STATE_REMOTE_URL, timeout=10)
         if r.status_code != 200:
             logger.warning(f"Remote state GET failed: HTTP {r.status_code}")
-            return False
+            return None
         js = r.json()
         if not isinstance(js, dict):
             logger.warning("Remote state invalid JSON")
-            return False
-        _apply_state_dict(js)
-        logger.info("State loaded from remote.")
-        return True
+            return None
+        return js
     except Exception as e:
         logger.warning(f"Remote state GET error: {e}")
-        return False
+        return None
 
-def _save_state_remote(data: dict) -> bool:
+def _save_state_remote() -> bool:
+    """Push the local snapshot file (streamed from disk, so the settings never sit in memory as one dict)."""
     if not STATE_REMOTE_URL:
         return False
     try:
-        r = requests.post(STATE_REMOTE_URL, json=data, timeout=10)
+        with open(STATE_FILE, "rb") as f:
+            r = HTTP.post(STATE_REMOTE_URL, data=f, headers={"Content-Type": "application/json"}, timeout=10)
         if r.status_code not in (200, 201, 204):
             logger.warning(f"Remote state POST failed: HTTP {r.status_code} {r.text[:200]}")
             return False
@@ -82,32 +69,98 @@ def _save_state_remote(data: dict) -> bool:
         logger.warning(f"Remote state POST error: {e}")
         return False
 
-def load_state():
-    if _load_state_remote():
-        return
+def load_local_state() -> bool:
     try:
         if os.path.exists(STATE_FILE):
             with open(STATE_FILE, "r", encoding="utf-8") as f:
                 data = json.load(f)
             _apply_state_dict(data)
             logger.info("State loaded from local file.")
+            return True
     except Exception as e:
         logger.warning(f"Failed to load local state: {e}")
+    access.load(None)
+    return False
+
+def _current_state_dict() -> dict:
+    """Everything but ucer_settings, which _write_state() streams from the settings store."""
+    acl = access.dump()
+    return {
+        "access": acl,
+        # flat lists kept so older deployments reading the same remote state still work
+        "allowed_users": [int(u) for u in acl["users"]],
+        "authorized_chats": [int(c) for c in acl["chats"]],
+    }
+
+def _write_state(data: dict):
+    """Write the snapshot with ucer_settings streamed record by record, then swap it in."""
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('{"ucer_settings": {')
+        for i, (uid, raw) in enumerate(usersettings.iter_records()):
+            f.write(f'{"," if i else ""}\n  {json.dumps(uid)}: {raw}')
+        f.write("\n}")
+        for k, v in data.items():
+            f.write(f",\n{json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}")
+        f.write("\n}\n")
+    os.replace(tmp, STATE_FILE)
+
+def _merge_state(remote: dict) -> dict:
+    ucer = {str(k): v for k, v in (remote.get("ucer_settings") or {}).items()}
+    ucer.update((uid, json.loads(raw)) for uid, raw in usersettings.iter_records())
+    # Access grants need no merge here: loading replays the local journal on top of the remote snapshot.
+    return {
+        "ucer_settings": ucer,
+        "access": remote.get("access"),
+        "allowed_users": remote.get("allowed_users") or [],
+        "authorized_chats": remote.get("authorized_chats") or [],
+    }
+
+def reconcile_remote_state():
+    """Pull the remote copy after startup; edits made locally meanwhile are merged on top and pushed back."""
+    try:
+        started_at = _SAVE_COUNT[0]
+        data = _fetch_state_remote()
+        if data is None:
+            return
+        with _state_lock:
+            changed = _SAVE_COUNT[0] != started_at
+            if changed:
+                data = _merge_state(data)
+            _apply_state_dict(data)
+            _REMOTE_RECONCILED.set()
+        if changed:
+            logger.info("Local edits during reconcile merged; pushing merged state.")
+        save_state(push_remote=changed)
+        logger.info("State reconciled from remote.")
+    finally:
+        _REMOTE_RECONCILED.set()
+
+def start_state_reconcile() -> threading.Thread | None:
+    if not STATE_REMOTE_URL:
+        _REMOTE_RECONCILED.set()
+        return None
+    t = threading.Thread(target=reconcile_remote_state, name="state-reconcile", daemon=True)
+    t.start()
+    return t
 
-def save_state():
+def save_state(push_remote: bool = True):
     try:
         with _state_lock:
-            data = {
-                "ucer_settings": UCER_SETTINGS,
-                "allowed_users": ALLOWED_USERS,
-                "authorized_chats": list(AUTHORIZED_CHATS),
-            }
+            _SAVE_COUNT[0] += 1
             try:
-                with open(STATE_FILE, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                _write_state(_current_state_dict())
+                saved = True
                 logger.info("State saved locally.")
             except Exception as e:
+                saved = False
                 logger.warning(f"Failed to save local state: {e}")
-            _save_state_remote(data)
+            # Until the startup reconcile finishes, the remote copy is newer than ours; don't clobber it,
+            # and keep the access journal: reconcile replays it on top of the remote snapshot.
+            if not _REMOTE_RECONCILED.is_set():
+                return
+            pushed = push_remote and saved and _save_state_remote()
+            if saved and (pushed or not STATE_REMOTE_URL):
+                access.truncate_journal()
     except Exception as e:
-        logger.warning(f"Failed to save state: {e}")
\ No newline at end of file
+        logger.warning(f"Failed to save state: {e}")
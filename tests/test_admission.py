@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app import admission
+
+@pytest.fixture
+def backlog(monkeypatch):
+    monkeypatch.setitem(admission.LIMITS, "soft_jobs", 6)
+    monkeypatch.setitem(admission.LIMITS, "hard_jobs", 16)
+    monkeypatch.setattr(admission, "_jobs", [1])   # the one job a sequential application is running
+    queue = asyncio.Queue()
+    admission.watch(queue)
+    yield queue
+    admission.watch(None)
+
+def _fill(queue, n):
+    for i in range(n):
+        queue.put_nowait(i)
+
+def test_idle_queue_admits_normally(backlog):
+    ticket = admission.admit()
+    assert not ticket.degraded
+    admission.release(ticket)
+
+def test_queued_updates_degrade_then_shed(backlog):
+    _fill(backlog, 6)
+    assert admission.level() == admission.LEVEL_DEGRADED
+    ticket = admission.admit()
+    assert ticket.degraded
+    admission.release(ticket)
+    with pytest.raises(admission.Overloaded):
+        admission.admit(degradable=False)
+
+    _fill(backlog, 10)
+    assert admission.level() == admission.LEVEL_REJECT
+    with pytest.raises(admission.Overloaded) as e:
+        admission.admit()
+    assert e.value.retry_after >= 5
+
+def test_draining_the_backlog_recovers(backlog):
+    _fill(backlog, 20)
+    assert admission.level() == admission.LEVEL_REJECT
+    while not backlog.empty():
+        backlog.get_nowait()
+    assert admission.level() == admission.LEVEL_OK
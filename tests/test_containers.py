@@ -0,0 +1,81 @@
+import random
+import struct
+
+import pytest
+
+from app.loadtest import _mkv_header
+from app.services import containers
+
+def _reader(data: bytes, reads: list | None = None):
+    def read(offset, n):
+        if reads is not None:
+            reads.append((offset, n))
+        return data[offset:offset + n]
+    return read
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+def _full_box(kind: bytes, payload: bytes) -> bytes:
+    return _box(kind, b"\0\0\0\0" + payload)
+
+def _esds(avg_bps: int, channels: int) -> bytes:
+    asc = ((2 << 11) | (3 << 7) | (channels << 3)).to_bytes(2, "big")     # AAC LC, 48 kHz
+    config = bytes([0x40, 0x15]) + b"\0\0\0" + struct.pack(">II", avg_bps, avg_bps) + bytes([5, len(asc)]) + asc
+    es = b"\0\x01\0" + bytes([4, len(config)]) + config
+    return _full_box(b"esds", bytes([3, len(es)]) + es)
+
+def _mp4(lang: str = "eng", channels: int = 2, avg_bps: int = 128_000, mdat: int = 256 * 1024) -> bytes:
+    packed = 0
+    for c in lang:
+        packed = (packed << 5) | (ord(c) - 0x60)
+    mdhd = _full_box(b"mdhd", struct.pack(">IIII", 0, 0, 48000, 0) + struct.pack(">HH", packed, 0))
+    hdlr = _full_box(b"hdlr", b"\0\0\0\0soun" + b"\0" * 12 + b"\0")
+    entry = b"\0" * 6 + b"\0\x01" + struct.pack(">HHIHHHHI", 0, 0, 0, channels, 16, 0, 0, 48000 << 16) + _esds(avg_bps, channels)
+    stsd = _full_box(b"stsd", struct.pack(">I", 1) + _box(b"mp4a", entry))
+    trak = _box(b"trak", _box(b"mdia", mdhd + hdlr + _box(b"minf", _box(b"stbl", stsd))))
+    ftyp = _box(b"ftyp", b"isom\0\0\x02\0isomiso2mp41")
+    return ftyp + _box(b"mdat", b"\0" * mdat) + _box(b"moov", trak)
+
+def test_mkv_unknown_size_segment_with_atmos_block():
+    data = _mkv_header(atmos=True, second_lang="tam")
+    assert containers.audio_tracks(_reader(data)) == [
+        {"channels": "6 channels", "bitrate": "640kb/s", "language": "Hindi", "codec": "DDPA"},
+        {"channels": "2 channels", "bitrate": "", "language": "Tamil", "codec": "AAC"},
+    ]
+
+def test_mkv_without_joc_is_plain_ddp():
+    tracks = containers.audio_tracks(_reader(_mkv_header(atmos=False, second_lang="eng")))
+    assert [t["codec"] for t in tracks] == ["DDP", "AAC"]
+
+def test_mp4_moov_after_mdat_reads_only_box_headers_of_mdat():
+    data = _mp4(lang="tam", channels=6, avg_bps=384_000)
+    reads = []
+    assert containers.audio_tracks(_reader(data, reads), len(data)) == [
+        {"channels": "6 channels", "bitrate": "384kb/s", "language": "Tamil", "codec": "AAC"},
+    ]
+    mdat_start = data.index(b"mdat") - 4
+    assert all(offset + n <= mdat_start + 16 or offset >= mdat_start + 8 + 256 * 1024 for offset, n in reads)
+
+def _cuts(data: bytes, step: int):
+    return list(range(0, len(data) - 1, step)) + [len(data) - 1]
+
+@pytest.mark.parametrize("cut", _cuts(_mkv_header(atmos=True, second_lang="eng"), 53))
+def test_truncated_mkv_is_unsupported(cut):
+    data = _mkv_header(atmos=True, second_lang="eng")[:cut]
+    with pytest.raises(containers.Unsupported):
+        containers.audio_tracks(_reader(data))
+
+@pytest.mark.parametrize("cut", [c for c in _cuts(_mp4(mdat=64), 7) if c > 0])
+def test_truncated_mp4_is_unsupported(cut):
+    data = _mp4(mdat=64)[:cut]
+    with pytest.raises(containers.Unsupported):
+        containers.audio_tracks(_reader(data), len(data))
+
+@pytest.mark.parametrize("seed", range(20))
+def test_garbage_is_unsupported(seed):
+    rnd = random.Random(seed)
+    prefix = rnd.choice((b"", b"\x1a\x45\xdf\xa3", b"\0\0\0\x20ftyp"))
+    data = prefix + rnd.randbytes(rnd.randint(0, 4096))
+    with pytest.raises(containers.Unsupported):
+        containers.audio_tracks(_reader(data), len(data))
@@ -0,0 +1,54 @@
+import gzip
+import os
+
+import pytest
+
+from app.services import tmdb, tmdb_index
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "tmdb_movie_ids.jsonl")
+
+@pytest.fixture
+def index(tmp_path):
+    dump = tmp_path / "movie_ids.json.gz"
+    with open(FIXTURE, "rb") as src, gzip.open(dump, "wb") as dst:
+        dst.write(src.read())
+    path = str(tmp_path / "index.sqlite3")
+    counts = tmdb_index.build_from_file(str(dump), "movie", path)
+    assert counts["added"] == 6  # the adult entry is skipped
+    return path
+
+def _confident(index, query, have_year=False):
+    return tmdb_index.confident(tmdb_index.lookup(query, index_path=index), query, have_year)
+
+def test_exact_title_is_confident(index):
+    assert [c[1] for c in _confident(index, "Maari 2")] == [552074]
+    assert [c[1] for c in _confident(index, "Vikram")] == [810693]
+
+def test_sequel_is_not_confident_for_the_bare_title(index):
+    top = tmdb_index.lookup("Maari", index_path=index)[0]
+    assert top[1] == 552074 and top[3] >= tmdb_index.CONFIDENT_SCORE
+    assert _confident(index, "Maari") == []
+    # With a year the caller checks the details, so the score alone may pass
+    assert [c[1] for c in _confident(index, "Maari", have_year=True)] == [552074]
+
+def test_english_title_comes_from_the_alias_fill(index, monkeypatch):
+    assert _confident(index, "The Crow's Egg") == []
+    monkeypatch.setattr(tmdb_index, "_api_titles", lambda kind, tid: ["The Crow's Egg"] if tid == 325358 else [])
+    counts = tmdb_index.fill_aliases(10, index_path=index)
+    assert counts["titles"] == 6 and counts["failed"] == 0
+    assert [c[1] for c in _confident(index, "The Crow's Egg")] == [325358]
+
+def test_english_title_of_an_api_match_is_learned(index, monkeypatch):
+    monkeypatch.setattr(tmdb_index, "TMDB_INDEX_PATH", index)
+    tmdb._learn({"id": 325358, "title": "The Crow's Egg", "original_title": "Kaaka Muttai"}, "movie")
+    assert [c[1] for c in _confident(index, "The Crow's Egg")] == [325358]
+
+def test_learned_alias_is_found_and_survives_a_rebuild(index, tmp_path):
+    assert _confident(index, "Parasite") == []
+    assert tmdb_index.learn("movie", 496243, ["Parasite"], index_path=index) == 1
+    assert [c[1:3] for c in _confident(index, "Parasite")] == [(496243, "Parasite")]
+    tmdb_index.build_from_file(str(tmp_path / "movie_ids.json.gz"), "movie", index)
+    assert [c[1] for c in _confident(index, "Parasite")] == [496243]
+
+def test_learn_ignores_titles_not_in_the_index(index):
+    assert tmdb_index.learn("movie", 1, ["Nothing"], index_path=index) == 0
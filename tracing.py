@@ -0,0 +1,187 @@
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+from app.config import TRACE_FILE, TRACE_SAMPLE_RATE, TRACE_SLOW_MS
+
+logger = logging.getLogger(__name__)
+
+RECENT_MAX = 500           # kept traces held in memory for /traces
+MAX_SPANS = 2000           # bulk jobs can emit thousands; the tail is dropped
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_recent: deque = deque(maxlen=RECENT_MAX)
+_trace_log = logging.getLogger("app.traces")
+_writer_lock = threading.Lock()
+
+class Trace:
+    __slots__ = ("id", "kind", "user_id", "chat_id", "started", "wall", "spans", "error", "ms", "pending")
+
+    def __init__(self, kind: str, user_id: Optional[int], chat_id: Optional[int]):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.started = time.perf_counter()
+        self.wall = time.time()
+        self.spans: list = []
+        self.error: Optional[str] = None
+        self.ms = 0.0
+        self.pending = 1           # the update itself, plus each task it hands work to
+
+    def to_dict(self) -> dict:
+        return {
+            "trace": self.id, "kind": self.kind, "user": self.user_id, "chat": self.chat_id,
+            "at": round(self.wall, 3), "ms": round(self.ms, 1), "error": self.error, "spans": self.spans,
+        }
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+def _update_kind(update: object) -> str:
+    if not isinstance(update, Update):
+        return type(update).__name__
+    if update.callback_query:
+        return "cb:" + (update.callback_query.data or "").split(":", 1)[0]
+    if update.inline_query:
+        return "inline"
+    msg = update.effective_message
+    text = (msg.text or msg.caption or "") if msg else ""
+    if text.startswith("/"):
+        return text.split()[0].split("@")[0]
+    if msg and msg.document:
+        return "document"
+    if msg and msg.photo:
+        return "photo"
+    return "message" if msg else "other"
+
+class TracedApplication(Application):
+    """Opens a trace around every update; handlers and services add spans through the context.
+
+    Tasks started while an update is being handled (non-blocking handlers, application.create_task() follow-ups)
+    inherit its trace, which is finished when the last of them completes rather than when the update returns.
+    """
+
+    async def process_update(self, update: object) -> None:
+        tr = start(update)
+        try:
+            await super().process_update(update)
+        finally:
+            release(tr)
+
+    def create_task(self, coroutine, update: object = None, *, name: str | None = None):
+        tr = _current.get()
+        if tr is None:
+            return super().create_task(coroutine, update, name=name)
+        tr.pending += 1
+        return super().create_task(_held(tr, coroutine), update, name=name)
+
+async def _held(tr: Trace, coroutine):
+    try:
+        return await coroutine
+    except Exception as e:
+        if not tr.error:
+            tr.error = repr(e)[:300]
+        raise
+    finally:
+        release(tr)
+
+def start(update: object) -> Trace:
+    user = getattr(update, "effective_user", None)
+    chat = getattr(update, "effective_chat", None)
+    tr = Trace(_update_kind(update), user.id if user else None, chat.id if chat else None)
+    _current.set(tr)
+    return tr
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times a stage of the current trace. Yields a dict the caller may add attributes to."""
+    tr = _current.get()
+    rec = dict(attrs)
+    if tr is None:
+        yield rec
+        return
+    t0 = time.perf_counter()
+    rec["name"] = name
+    rec["at"] = round((t0 - tr.started) * 1000, 1)
+    try:
+        yield rec
+    except BaseException as e:
+        rec["error"] = repr(e)[:200]
+        raise
+    finally:
+        rec["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        if len(tr.spans) < MAX_SPANS:
+            tr.spans.append(rec)
+
+def fail(exc: BaseException | str):
+    """Mark the current trace failed when a handler swallows the exception itself."""
+    tr = _current.get()
+    if tr is not None and not tr.error:
+        tr.error = (exc if isinstance(exc, str) else repr(exc))[:300]
+
+def release(tr: Trace):
+    """Drop one hold on the trace; the last one finishes it."""
+    _current.set(None)
+    tr.pending -= 1
+    if tr.pending <= 0:
+        finish(tr)
+
+def finish(tr: Trace):
+    _current.set(None)
+    tr.ms = (time.perf_counter() - tr.started) * 1000
+    if not tr.error:
+        tr.error = next((s["error"] for s in tr.spans if s.get("error")), None)
+    # Tail sampling: slow or failed traces are always kept, the rest at TRACE_SAMPLE_RATE.
+    if not (tr.error or tr.ms >= TRACE_SLOW_MS or random.random() < TRACE_SAMPLE_RATE):
+        return
+    data = tr.to_dict()
+    _recent.append(data)
+    _write(data)
+
+def _write(data: dict):
+    if not TRACE_FILE:
+        return
+    if not _trace_log.handlers:
+        with _writer_lock:
+            if not _trace_log.handlers:
+                try:
+                    h = RotatingFileHandler(TRACE_FILE, maxBytes=20 * 1024 * 1024, backupCount=3, encoding="utf-8")
+                except Exception as e:
+                    logger.warning(f"Trace log open failed: {e}")
+                    return
+                h.setFormatter(logging.Formatter("%(message)s"))
+                _trace_log.addHandler(h)
+                _trace_log.setLevel(logging.INFO)
+                _trace_log.propagate = False
+    _trace_log.info(json.dumps(data, separators=(",", ":"), default=str))
+
+def slowest(n: int = 10, kind: str | None = None) -> list:
+    rows = [t for t in list(_recent) if not kind or t["kind"] == kind]
+    return sorted(rows, key=lambda t: t["ms"], reverse=True)[:n]
+
+def find(trace_id: str) -> Optional[dict]:
+    return next((t for t in reversed(_recent) if t["trace"].startswith(trace_id)), None)
+
+def render(t: dict) -> str:
+    """Plain-text span timeline of one trace."""
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t["at"]))
+    lines = [f"trace {t['trace']}  {t['kind']}  {t['ms']:.0f} ms  user={t['user']} chat={t['chat']}  {when}"]
+    if t.get("error"):
+        lines.append(f"error: {t['error']}")
+    for s in sorted(t["spans"], key=lambda s: s["at"]):
+        extra = " ".join(f"{k}={v}" for k, v in s.items() if k not in ("name", "at", "ms", "error"))
+        err = f"  !! {s['error']}" if s.get("error") else ""
+        lines.append(f"  +{s['at']:>8.0f} ms  {s['ms']:>8.0f} ms  {s['name']}  {extra}{err}".rstrip())
+    return "\n".join(lines)
@@ -0,0 +1,143 @@
+import dbm
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, replace
+from typing import Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = "ucer_settings.db"
+RESIDENT_MAX = 2048        # records kept in memory; everyone else stays on disk until they show up
+MAX_INDEXES = 6
+
+@dataclass(frozen=True, slots=True)
+class UcerSettings:
+    gdflix: Optional[str] = None
+    indexes: Tuple[str, ...] = ()
+    full_name: bool = False
+    audio_format: bool = False
+    album: bool = False
+
+    @classmethod
+    def from_dict(cls, cfg: dict) -> "UcerSettings":
+        idxs = cfg.get("indexes")
+        if not isinstance(idxs, list):
+            # legacy single "index" field
+            idxs = [cfg["index"]] if isinstance(cfg.get("index"), str) else []
+        return cls(
+            gdflix=cfg.get("gdflix") or None,
+            indexes=tuple(idxs[:MAX_INDEXES]),
+            full_name=bool(cfg.get("full_name", False)),
+            audio_format=bool(cfg.get("audio_format", False)),
+            album=bool(cfg.get("album", False)),
+        )
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["indexes"] = list(self.indexes)
+        return d
+
+# Shared, immutable: read paths hand this out instead of allocating a default per lookup.
+DEFAULT = UcerSettings()
+
+_lock = threading.RLock()
+_resident: "OrderedDict[int, UcerSettings]" = OrderedDict()
+_db: list = [None]
+
+def _open():
+    if _db[0] is None:
+        _db[0] = dbm.open(DB_FILE, "c")
+    return _db[0]
+
+def _remember(user_id: int, cfg: UcerSettings):
+    _resident[user_id] = cfg
+    _resident.move_to_end(user_id)
+    while len(_resident) > RESIDENT_MAX:
+        _resident.popitem(last=False)
+
+def _encode(cfg: UcerSettings) -> str:
+    return json.dumps(cfg.to_dict(), separators=(",", ":"))
+
+def get(user_id: int) -> UcerSettings:
+    with _lock:
+        cfg = _resident.get(user_id)
+        if cfg is not None:
+            _resident.move_to_end(user_id)
+            return cfg
+        try:
+            raw = _open().get(str(user_id))
+        except Exception as e:
+            logger.warning(f"UCER store read failed for {user_id}: {e}")
+            return DEFAULT
+        cfg = UcerSettings.from_dict(json.loads(raw)) if raw else DEFAULT
+        _remember(user_id, cfg)
+        return cfg
+
+def update(user_id: int, **changes) -> UcerSettings:
+    """Write-through update; records equal to the default are dropped instead of stored."""
+    if "indexes" in changes:
+        changes["indexes"] = tuple(changes["indexes"] or ())[:MAX_INDEXES]
+    with _lock:
+        cfg = replace(get(user_id), **changes)
+        db = _open()
+        if cfg == DEFAULT:
+            if str(user_id) in db:
+                del db[str(user_id)]
+        else:
+            db[str(user_id)] = _encode(cfg)
+        _remember(user_id, cfg)
+    return cfg
+
+def count() -> int:
+    with _lock:
+        return len(_open())
+
+def stats() -> dict:
+    return {"stored": count(), "resident": len(_resident), "resident_max": RESIDENT_MAX}
+
+def iter_settings() -> Iterator[Tuple[int, UcerSettings]]:
+    with _lock:
+        keys = list(_open().keys())
+    for k in keys:
+        yield int(k), _peek(k)
+
+def _peek(key: bytes) -> UcerSettings:
+    """Disk read that doesn't churn the resident set (bulk scans)."""
+    with _lock:
+        raw = _open().get(key)
+    return UcerSettings.from_dict(json.loads(raw)) if raw else DEFAULT
+
+def iter_records() -> Iterator[Tuple[str, str]]:
+    """(user id, stored JSON) one record at a time, straight from the store, for streaming into the state snapshot."""
+    with _lock:
+        keys = list(_open().keys())
+    for k in keys:
+        with _lock:
+            raw = _open().get(k)
+        if raw:
+            yield k.decode(), raw.decode()
+
+def load(data: dict | None):
+    """Bring the store in line with a state snapshot's ucer_settings (already-migrated or legacy dicts),
+    writing only the records that differ."""
+    incoming = {}
+    for k, v in (data or {}).items():
+        cfg = UcerSettings.from_dict(v or {})
+        if cfg != DEFAULT:
+            incoming[str(int(k))] = _encode(cfg).encode()
+    with _lock:
+        db = _open()
+        changed = [k.decode() for k in db.keys() if k.decode() not in incoming]
+        for k in changed:
+            del db[k]
+        for k, raw in incoming.items():
+            if db.get(k) != raw:
+                db[k] = raw
+                changed.append(k)
+        for k in changed:
+            _resident.pop(int(k), None)
+        if changed:
+            if hasattr(db, "sync"):
+                db.sync()
@@ -4,16 +4,45 @@ import os
 import re
 import tempfile
 import subprocess
+import threading
+import time
 import urllib.parse
 from io import BytesIO
 from typing import Optional
 
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logger = logging.getLogger(__name__)
 
+# Shared keep-alive pools for all upstream calls (TMDB, GDFlix, workers, scrapers)
+HTTP = requests.Session()
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+HTTP.mount("https://", _adapter)
+HTTP.mount("http://", _adapter)
+
+def _warm_one(url: str):
+    started = time.monotonic()
+    try:
+        HTTP.head(url, timeout=10, verify=False, allow_redirects=False)
+        logger.info(f"Pre-warmed {url} in {(time.monotonic() - started) * 1000:.0f} ms")
+    except Exception as e:
+        logger.info(f"Pre-warm {url} failed: {e}")
+
+def prewarm(urls) -> None:
+    """Open pooled TLS connections to upstream hosts in the background (DNS + handshake off the hot path)."""
+    seen = set()
+    for u in urls:
+        if not u:
+            continue
+        p = urllib.parse.urlparse(u)
+        if not p.scheme or not p.netloc or p.netloc in seen:
+            continue
+        seen.add(p.netloc)
+        threading.Thread(target=_warm_one, args=(f"{p.scheme}://{p.netloc}/",), name=f"prewarm-{p.netloc}", daemon=True).start()
+
 def html_bold_lines(text: str) -> str:
     if not text:
         return ""
@@ -93,21 +122,11 @@ def strip_extension(name: str) -> str:
         return m.group(1)
     return base
 
-def get_remote_size(url: str):
-    try:
-        r = requests.head(url, allow_redirects=True, timeout=20, verify=False)
-        cl = r.headers.get("content-length") or r.headers.get("Content-Length")
-        if cl:
-            return int(cl)
-    except Exception as e:
-        logger.warning(f"HEAD size failed: {e}")
-    return None
-
 def download_bytes(url: str) -> Optional[bytes]:
     if not url:
         return None
     try:
-        r = requests.get(url, timeout=20)
+        r = HTTP.get(url, timeout=20)
         if r.status_code == 200 and r.content:
             return r.content
         logger.warning(f"Download HTTP {r.status_code} for {url}")